@@ -14,6 +14,7 @@ from datetime import timedelta
 from pathlib import Path
 import os
 from decouple import config, Csv # type: ignore
+from corsheaders.defaults import default_headers
 
 
 
@@ -53,6 +54,8 @@ REST_FRAMEWORK = {
 
 ALLOWED_HOSTS = config('DJANGO_ALLOWED_HOSTS', cast=Csv())
 CORS_ALLOWED_ORIGINS = config('DJANGO_CORS_ORIGINS', cast=Csv())
+CORS_ALLOW_HEADERS = (*default_headers, 'idempotency-key', 'if-match')
+CORS_EXPOSE_HEADERS = ['Idempotent-Replayed', 'ETag']
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(hours=1),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
@@ -75,10 +78,14 @@ INSTALLED_APPS = [
     'corsheaders',  # For handling CORS
     'rest_framework_simplejwt.token_blacklist',
     'drf_spectacular',  # For API documentation
+    'django_filters',  # Query-string filtering for list endpoints
 ]
 
 
 MIDDLEWARE = [
+    'budgetapp.middleware.ServerTimingMiddleware',  # First, so its total covers everything below
+    'budgetapp.middleware.ProfilingMiddleware',  # Only acts on requests carrying a profiling token
+    'budgetapp.middleware.QueryWatchMiddleware',  # N+1/slow-query reports; loaded only when QUERYWATCH_ENABLED
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -88,8 +95,56 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'budgetapp.middleware.NoCacheMiddleware',  # Custom middleware to disable caching
+    'budgetapp.middleware.ReplicaRoutingMiddleware',  # Read-replica routing; loaded only when replicas are configured
 ]
 
+# Per-request timings: always logged on "budgetapp.timing", also sent as a Server-Timing header unless disabled
+SERVER_TIMING_HEADER = config('SERVER_TIMING_HEADER', default=True, cast=bool)
+
+# On-demand request profiling (see budgetapp.profiling)
+PROFILE_DIR = config('PROFILE_DIR', default=str(BASE_DIR / 'profiles'))
+PROFILE_MIN_INTERVAL = config('PROFILE_MIN_INTERVAL', default=10, cast=int)  # seconds between profiled requests
+PROFILE_TOKEN_MAX_AGE = config('PROFILE_TOKEN_MAX_AGE', default=300, cast=int)
+PROFILE_KEEP = config('PROFILE_KEEP', default=200, cast=int)  # newest profiles kept on disk
+
+# N+1 and slow-query detection for development/staging (see budgetapp.querywatch)
+QUERYWATCH_ENABLED = config('QUERYWATCH_ENABLED', default=DEBUG, cast=bool)
+QUERYWATCH_RAISE = config('QUERYWATCH_RAISE', default=False, cast=bool)  # fail the request (and test) on violations
+QUERYWATCH_REPEAT_THRESHOLD = config('QUERYWATCH_REPEAT_THRESHOLD', default=5, cast=int)
+QUERYWATCH_SLOW_MS = config('QUERYWATCH_SLOW_MS', default=100, cast=float)
+QUERYWATCH_REPORT_FILE = config('QUERYWATCH_REPORT_FILE', default='') or None  # JSON lines, one per flagged request
+
+# Public progress pages (see budgetapp.sharing): browser and shared-cache (nginx/CDN) lifetimes in seconds
+PUBLIC_PROGRESS_MAX_AGE = config('PUBLIC_PROGRESS_MAX_AGE', default=5, cast=int)
+PUBLIC_PROGRESS_S_MAXAGE = config('PUBLIC_PROGRESS_S_MAXAGE', default=15, cast=int)
+PUBLIC_TOKEN_TTL = config('PUBLIC_TOKEN_TTL', default=300, cast=int)  # token -> event lookups; revoking clears it at once
+PUBLIC_SNAPSHOT_TTL = config('PUBLIC_SNAPSHOT_TTL', default=60, cast=int)  # also keyed on the event version
+
+# Idempotency-Key on creates (see budgetapp.idempotency), in seconds
+IDEMPOTENCY_TTL = config('IDEMPOTENCY_TTL', default=86400, cast=int)  # how long responses are replayed
+IDEMPOTENCY_IN_FLIGHT_TTL = config('IDEMPOTENCY_IN_FLIGHT_TTL', default=60, cast=int)
+
+# Deferred work (see budgetapp.jobs); eager runs jobs inline, turn it off where a `run_jobs` worker is deployed
+JOBS_EAGER = config('JOBS_EAGER', default=True, cast=bool)
+JOBS_LEASE = config('JOBS_LEASE', default=300, cast=int)  # seconds before a running job from a dead worker is retried
+JOBS_RETRY_BASE = config('JOBS_RETRY_BASE', default=10, cast=int)  # first retry delay, doubled per attempt
+JOBS_RETRY_MAX = config('JOBS_RETRY_MAX', default=3600, cast=int)
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'budgetapp.timing': {
+            'handlers': ['console'],
+            'level': config('TIMING_LOG_LEVEL', default='INFO'),
+            'propagate': False,
+        },
+    },
+}
+
 ROOT_URLCONF = 'backend.urls'
 
 TEMPLATES = [
@@ -117,16 +172,46 @@ WSGI_APPLICATION = 'backend.wsgi.application'
 # Use environment variables for sensitive information
 print("DB_NAME from env:", config("DB_NAME", default="not found"))
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.mysql',
-        'NAME': config('DB_NAME'),
-        'USER': config('DB_USER'),
-        'PASSWORD': config('DB_PASSWORD'),
-        'HOST': config('DB_HOST', default='localhost'),
-        'PORT': config('DB_PORT'),
+DB_ENGINE = config('DB_ENGINE', default='mysql')  # 'sqlite3' for local runs: DB_NAME is then a file in BASE_DIR
+if DB_ENGINE == 'sqlite3':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / config('DB_NAME', default='db.sqlite3'),
+        }
     }
-}
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.mysql',
+            'NAME': config('DB_NAME'),
+            'USER': config('DB_USER'),
+            'PASSWORD': config('DB_PASSWORD'),
+            'HOST': config('DB_HOST', default='localhost'),
+            'PORT': config('DB_PORT'),
+        }
+    }
+
+# Read replicas (see budgetapp.db_router): safe requests read from them unless the client just wrote.
+# MySQL: hosts replicating the primary, same credentials. SQLite: file names of copies of the primary.
+DB_REPLICAS = config('DB_REPLICAS', default='', cast=Csv())
+REPLICA_DATABASES = []
+for index, location in enumerate(DB_REPLICAS, 1):
+    replica = {
+        **DATABASES['default'],
+        # tests read the test database through the replica alias too
+        'TEST': {'MIRROR': 'default'},
+    }
+    if DB_ENGINE == 'sqlite3':
+        replica['NAME'] = BASE_DIR / location
+    else:
+        replica['HOST'] = location
+    DATABASES[f'replica{index}'] = replica
+    REPLICA_DATABASES.append(f'replica{index}')
+DATABASE_ROUTERS = ['budgetapp.db_router.ReplicaRouter']
+REPLICA_PIN_SECONDS = config('REPLICA_PIN_SECONDS', default=5, cast=int)  # a client reads from the primary this long after writing
+REPLICA_MAX_LAG = config('REPLICA_MAX_LAG', default=2, cast=float)  # seconds behind before falling back to the primary
+REPLICA_CHECK_INTERVAL = config('REPLICA_CHECK_INTERVAL', default=5, cast=float)  # health checks reused this long per process
 
 
 
@@ -134,7 +219,17 @@ CACHES = {
     "default": {
         "BACKEND": "django_redis.cache.RedisCache",
         "LOCATION": "redis://redis:6379/1",
-        "OPTIONS": {"CLIENT_CLASS": "django_redis.client.DefaultClient"},
+        "OPTIONS": {
+            "CLIENT_CLASS": "django_redis.client.DefaultClient",
+            # msgpack with Decimal/date extension types instead of pickle,
+            # compressed only once a payload is big enough to benefit
+            "SERIALIZER": "budgetapp.cache.MsgPackSerializer",
+            "COMPRESSOR": "budgetapp.cache.ThresholdCompressor",
+            "COMPRESS_MIN_LENGTH": config("CACHE_COMPRESS_MIN_LENGTH", default=1024, cast=int),
+            "COMPRESS_ALGORITHM": config("CACHE_COMPRESS_ALGORITHM", default="zlib"),
+        },
+        # bumped when the stored format changed (pickle -> msgpack) so old entries are ignored
+        "VERSION": 2,
     }
 }
 
@@ -142,6 +237,7 @@ CACHES = {
 # Throttling settings
 
 REST_FRAMEWORK = {
+    "DEFAULT_FILTER_BACKENDS": ["django_filters.rest_framework.DjangoFilterBackend"],
     "DEFAULT_THROTTLE_CLASSES": [
         "rest_framework.throttling.AnonRateThrottle",
         "rest_framework.throttling.UserRateThrottle",
@@ -160,9 +256,16 @@ REST_FRAMEWORK = {
         "event_write": "20/min",          # writes on event resources
         "pledge_per_event": "10/min",     # per-user-per-event pledge limits
         "mpesa_callback": "1000/min",     # high limit for mpesa callbacks (or whitelist)
+        "export": "10/min",               # full-table CSV/NDJSON exports
+        "public_progress": "300/min",     # per IP; most viewers are served by nginx's cache instead
     },
 }
 
+# e.g. THROTTLE_RATE_OVERRIDES="user=100000/day,pledge_per_event=600/min" for load-test servers
+REST_FRAMEWORK["DEFAULT_THROTTLE_RATES"].update(
+    item.split("=", 1) for item in config("THROTTLE_RATE_OVERRIDES", default="", cast=Csv())
+)
+
 
 
 # Password validation
@@ -1,37 +1,171 @@
 from django.contrib import admin
+from django.contrib.admin.views.main import PAGE_VAR
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils import timezone
+from django.utils.functional import cached_property
 from .models import (Event, BudgetItem, Pledge, MpesaPayment, ManualPayment, 
-                     MpesaInfo, Task, VendorPayment, ServiceProvider, UserSettings)
-from django.db.models import Sum
+                     MpesaInfo, Task, VendorPayment, ServiceProvider, UserSettings, Job)
+from django.db.models import Case, DecimalField, F, Sum, Value, When
+from django.db.models.functions import Coalesce, Greatest
 from django.utils.translation import gettext_lazy as _
 from django.contrib.auth.models import User
+from . import recompute
+
+
+def _zero():
+    return Value(0, output_field=DecimalField())
+
+
+def _money(expression):
+    """A summed column that is 0 rather than NULL when there are no rows."""
+    return Coalesce(expression, _zero(), output_field=DecimalField())
+
+
+# Below this many rows an exact COUNT(*) is cheap enough to keep
+ESTIMATE_THRESHOLD = 100_000
+
+
+def estimated_row_count(model, using="default"):
+    """The database's own row estimate for the model's table, or None where there isn't one."""
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == "mysql":
+            cursor.execute(
+                "SELECT TABLE_ROWS FROM information_schema.TABLES WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+                [table],
+            )
+        elif connection.vendor == "postgresql":
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE relname = %s", [table])
+        else:
+            return None
+        row = cursor.fetchone()
+    return int(row[0]) if row and row[0] is not None else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Unfiltered changelists of big tables use the table statistics instead of
+    COUNT(*), which is a full index scan on InnoDB. Filtered lists, and small
+    tables, are counted exactly.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimated_row_count(queryset.model, queryset.db)
+            if estimate is not None and estimate >= ESTIMATE_THRESHOLD:
+                return estimate
+        return super().count
+
+
+class InputFilter(admin.SimpleListFilter):
+    """
+    Sidebar filter with a text box instead of a list of every distinct value,
+    which needs a DISTINCT scan to build. Subclasses set `lookup`, the
+    (indexed) ORM lookup the typed value is matched with.
+    """
+    template = 'admin/budgetapp/input_filter.html'
+    lookup = None
+
+    def lookups(self, request, model_admin):
+        return ()
+
+    def has_output(self):
+        return True
+
+    def choices(self, changelist):
+        # the other active filters and search travel along as hidden inputs
+        yield {
+            'query_parts': [
+                (name, value)
+                for name, values in changelist.params.items() if name not in (self.parameter_name, PAGE_VAR)
+                for value in (values if isinstance(values, list) else [values])
+            ],
+        }
+
+    def queryset(self, request, queryset):
+        value = (self.value() or '').strip()
+        if value:
+            return queryset.filter(**{self.lookup: value})
+        return queryset
+
+
+class UsernameFilter(InputFilter):
+    title = _('user')
+    parameter_name = 'username'
+    lookup = 'user__username'
+
+
+class ProviderNameFilter(InputFilter):
+    title = _('name starts with')
+    parameter_name = 'name'
+    lookup = 'name__startswith'
+
+
+class CategoryFilter(InputFilter):
+    title = _('budget item category starts with')
+    parameter_name = 'category'
+    lookup = 'budget_item__category__startswith'
+
+
+class ScalableAdmin(admin.ModelAdmin):
+    """
+    Defaults for changelists over tables with millions of rows: no second,
+    unfiltered COUNT for the "N total" link and estimated counts for paging.
+    """
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
 
 
 
 
 @admin.register(Event)
-class EventAdmin(admin.ModelAdmin):
+class EventAdmin(ScalableAdmin):
     exclude = ('user',)
     list_display = ('name',  'venue', 'event_date','total_budget', 'total_pledged', 'total_received', 'percentage_covered', 'outstanding_balance', 'is_funded', 'excess_amount', 'created_on')
     readonly_fields = ('created_on',)
-    search_fields = ('name', 'venue', 'user__username')
+    search_fields = ('^name', '^venue', '=user__username')
     readonly_fields = ('total_pledged', 'total_received', 'percentage_covered', 'outstanding_balance', 'is_funded', 'excess_amount')
-    list_filter = ('event_date', 'user')
+    list_filter = ('event_date', UsernameFilter)
+    actions = ('recompute_derived',)
+
+    def get_queryset(self, request):
+        # the money columns come from annotations, so a changelist page is a fixed number of queries
+        qs = super().get_queryset(request).with_totals()
+        pledged = _money(F('_total_pledged'))
+        received = _money(F('_total_mpesa')) + _money(F('_total_manual'))
+        return qs.annotate(
+            _received=received,
+            _percentage=Case(
+                When(_total_pledged__gt=0, then=received * Value(100, output_field=DecimalField()) / pledged),
+                default=_zero(), output_field=DecimalField(),
+            ),
+            _outstanding=Greatest(pledged - received, _zero()),
+            _excess=Greatest(received - F('total_budget'), _zero()),
+        )
 
     def total_pledged(self, obj):
         return obj.total_pledged()
     total_pledged.short_description = _('Total Pledged')
+    total_pledged.admin_order_field = '_total_pledged'
 
     def total_received(self, obj):
         return obj.total_received()
     total_received.short_description = _('Total Received')
+    total_received.admin_order_field = '_received'
 
     def percentage_covered(self, obj):
         return obj.percentage_covered()
     percentage_covered.short_description = _('Percentage Covered')
+    percentage_covered.admin_order_field = '_percentage'
 
     def outstanding_balance(self, obj):
         return obj.outstanding_balance()
     outstanding_balance.short_description = _('Outstanding Balance')
+    outstanding_balance.admin_order_field = '_outstanding'
 
     def save_model(self, request, obj, form, change):
         if not change or not obj.user_id:
@@ -41,30 +175,53 @@ class EventAdmin(admin.ModelAdmin):
     def excess_amount(self, obj):
         return obj.overpaid_amount()
     excess_amount.short_description = _('Excess Amount')
+    excess_amount.admin_order_field = '_excess'
+
+    @admin.action(description=_('Recompute funding status and pledge totals'))
+    def recompute_derived(self, request, queryset):
+        events = Event.objects.filter(pk__in=queryset.values('pk'))
+        fixed_events = recompute.recompute('events', queryset=events)
+        fixed_pledges = recompute.recompute('pledges', queryset=Pledge.objects.filter(event__in=events))
+        fixed_items = recompute.recompute('budget-items', queryset=BudgetItem.objects.filter(event__in=events))
+        self.message_user(request, _('Fixed %(events)d events, %(pledges)d pledges and %(items)d budget items.') % {
+            'events': fixed_events, 'pledges': fixed_pledges, 'items': fixed_items,
+        })
 
 
 @admin.register(BudgetItem)
-class BudgetItemAdmin(admin.ModelAdmin):
+class BudgetItemAdmin(ScalableAdmin):
     # exclude = ('user',)
-    list_display = ('event', 'category', 'estimated_budget', 'is_funded')
-    search_fields = ('event__name', 'category')
+    raw_id_fields = ('user',)
+    autocomplete_fields = ('event',)
+    list_display = ('event', 'category', 'estimated_budget', 'total_vendor_payments', 'remaining_budget', 'is_funded')
+    search_fields = ('^event__name', '^category')
     list_filter = ('is_funded',)
+    actions = ('recompute_funding_status',)
 
 
     def total_vendor_payments(self, obj):
         return obj.total_vendor_payments
     total_vendor_payments.short_description = _('Total Vendor Payments')
+    total_vendor_payments.admin_order_field = '_total_vendor_payments'
 
     def remaining_budget(self, obj):
         return obj.remaining_budget
     remaining_budget.short_description = _('Remaining Budget')
+    remaining_budget.admin_order_field = '_remaining'
+
+    @admin.action(description=_('Recompute funding status'))
+    def recompute_funding_status(self, request, queryset):
+        fixed = recompute.recompute('budget-items', queryset=BudgetItem.objects.filter(pk__in=queryset.values('pk')))
+        self.message_user(request, _('Fixed %(count)d budget items.') % {'count': fixed})
 
     def is_fully_paid(self, obj):
         return obj.is_fully_paid
     is_fully_paid.short_description = _('Is Fully Paid')
 
     def get_queryset(self, request):
-        qs = super().get_queryset(request)
+        qs = super().get_queryset(request).select_related('event').with_totals().annotate(
+            _remaining=Greatest(F('estimated_budget') - _money(F('_total_vendor_payments')), _zero()),
+        )
         if request.user.is_superuser:
             return qs
         return qs.filter(user=request.user)
@@ -80,17 +237,24 @@ class BudgetItemAdmin(admin.ModelAdmin):
 
 
 @admin.register(Pledge)
-class PledgeAdmin(admin.ModelAdmin):
+class PledgeAdmin(ScalableAdmin):
     exclude = ('user',)
     list_display = ('event', 'name', 'phone_number', 'amount_pledged', 'is_fulfilled', 'total_paid')
-    search_fields = ('event__name', 'name', 'phone_number')
+    search_fields = ('^event__name', '^name', '^phone_number')
+    autocomplete_fields = ('event',)
     readonly_fields = ('balance','total_paid', 'is_fulfilled',)
     list_filter = ('is_fulfilled',)
+    actions = ('recompute_payment_totals',)
 
     def balance(self, obj):
         return obj.balance()
     balance.short_description = _('Balance')
 
+    @admin.action(description=_('Recompute total paid and fulfilment'))
+    def recompute_payment_totals(self, request, queryset):
+        fixed = recompute.recompute('pledges', queryset=queryset)
+        self.message_user(request, _('Fixed %(count)d pledges.') % {'count': fixed})
+
 
     def save_model(self, request, obj, form, change):
         if not obj.user_id:
@@ -100,11 +264,12 @@ class PledgeAdmin(admin.ModelAdmin):
 
 
 @admin.register(Task)
-class TaskAdmin(admin.ModelAdmin):
+class TaskAdmin(ScalableAdmin):
     exclude = ('user',)
     list_display = ('budget_item', 'title', 'description','allocated_amount', 'amount_paid')
-    search_fields = ('budget_item__category', 'title')
-    list_filter = ('budget_item__category',)
+    search_fields = ('^budget_item__category', '^title')
+    list_filter = (CategoryFilter,)
+    autocomplete_fields = ('budget_item',)
 
 
 
@@ -114,10 +279,11 @@ class TaskAdmin(admin.ModelAdmin):
         super().save_model(request, obj, form, change)
 
 @admin.register(ManualPayment)
-class ManualPaymentAdmin(admin.ModelAdmin):
+class ManualPaymentAdmin(ScalableAdmin):
     exclude = ('user',)
     list_display = ('pledge', 'amount',  'date')
-    search_fields = ('event__name',)
+    search_fields = ('^event__name',)
+    autocomplete_fields = ('event', 'pledge')
     readonly_fields = ('date',)
     list_filter = ('date',)
 
@@ -131,10 +297,11 @@ class ManualPaymentAdmin(admin.ModelAdmin):
 
 
 @admin.register(MpesaPayment)
-class MpesaPaymentAdmin(admin.ModelAdmin):
+class MpesaPaymentAdmin(ScalableAdmin):
     exclude = ('user',)
     list_display = ('pledge', 'amount', 'transaction_id', 'timestamp')
-    search_fields = ('event__name',  'transaction_id')
+    search_fields = ('^event__name', '=transaction_id')
+    autocomplete_fields = ('event', 'pledge')
     list_filter = ('timestamp',)
 
     def save_model(self, request, obj, form, change):
@@ -143,12 +310,27 @@ class MpesaPaymentAdmin(admin.ModelAdmin):
         super().save_model(request, obj, form, change)
 
 @admin.register(VendorPayment)
-class VendorPaymentAdmin(admin.ModelAdmin):
+class VendorPaymentAdmin(ScalableAdmin):
     exclude = ('user',)
     list_display = ('budget_item', 'service_provider', 'amount', 'payment_method', 'date_paid','total_paid', 'confirmed')
-    search_fields = ('budget_item__category', 'service_provider__name')
+    search_fields = ('^budget_item__category', '^service_provider__name', '=transaction_code')
+    autocomplete_fields = ('budget_item', 'service_provider')
     list_filter = ('payment_method', 'date_paid', 'confirmed')
+    actions = ('confirm_payments',)
     readonly_fields = ('date_paid','total_paid',)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('budget_item', 'service_provider').with_totals()
+
+    def total_paid(self, obj):
+        return obj.total_paid
+    total_paid.short_description = _('Total Paid')
+    total_paid.admin_order_field = '_item_total_paid'
+
+    @admin.action(description=_('Mark selected payments as confirmed'))
+    def confirm_payments(self, request, queryset):
+        confirmed = recompute.confirm_vendor_payments(queryset)
+        self.message_user(request, _('Confirmed %(count)d vendor payments.') % {'count': confirmed})
     
     def save_model(self, request, obj, form, change):
         if not obj.user_id:
@@ -161,11 +343,12 @@ class VendorPaymentAdmin(admin.ModelAdmin):
 
 
 @admin.register(ServiceProvider)
-class ServiceProviderAdmin(admin.ModelAdmin):
+class ServiceProviderAdmin(ScalableAdmin):
     exclude = ('user',)
-    list_display = ('budget_item','name', 'phone_number', 'email', 'amount_charged', 'service_type')
-    search_fields = ('name', 'phone_number', 'email')
-    list_filter = ('name',)
+    list_display = ('budget_item','name', 'phone_number', 'email', 'amount_charged', 'total_received', 'balance_due', 'service_type')
+    search_fields = ('^name', '^phone_number', '^email')
+    list_filter = (ProviderNameFilter,)
+    autocomplete_fields = ('budget_item',)
 
     def save_model(self, request, obj, form, change):
         if not obj.user_id:
@@ -173,23 +356,45 @@ class ServiceProviderAdmin(admin.ModelAdmin):
         super().save_model(request, obj, form, change)
 
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('budget_item').with_totals().annotate(
+            _balance_due=Greatest(F('amount_charged') - _money(F('_total_received')), _zero()),
+        )
+
     def total_received(self, obj):
         return obj.total_received
     total_received.short_description = _('Total Received')
+    total_received.admin_order_field = '_total_received'
 
     def balance_due(self, obj):
         return obj.balance_due
     balance_due.short_description = _('Balance Due')
+    balance_due.admin_order_field = '_balance_due'
 
 
 @admin.register(UserSettings)
-class UserSettingsAdmin(admin.ModelAdmin):
+class UserSettingsAdmin(ScalableAdmin):
     exclude = ('user',)
     list_display = ('user', 'preferred_currency', 'notifications_enabled')
-    search_fields = ('user__username', 'currency')
+    search_fields = ('=user__username',)
     list_filter = ('preferred_currency', 'notifications_enabled')
 
     def save_model(self, request, obj, form, change):
         if not obj.user_id:
             obj.user = request.user
-        super().save_model(request, obj, form, change)
\ No newline at end of file
+        super().save_model(request, obj, form, change)
+
+
+@admin.register(Job)
+class JobAdmin(ScalableAdmin):
+    list_display = ('id', 'kind', 'status', 'attempts', 'run_after', 'locked_by', 'created_at')
+    list_filter = ('status', 'kind')
+    readonly_fields = ('kind', 'payload', 'dedupe_key', 'attempts', 'locked_by', 'locked_at', 'last_error', 'created_at')
+    actions = ('retry_jobs',)
+
+    @admin.action(description=_('Retry selected failed jobs now'))
+    def retry_jobs(self, request, queryset):
+        retried = queryset.filter(status=Job.FAILED).update(
+            status=Job.QUEUED, attempts=0, run_after=timezone.now(), last_error='',
+        )
+        self.message_user(request, _('Queued %(count)d job(s) again.') % {'count': retried})
@@ -0,0 +1,286 @@
+# cache.py
+import datetime
+import logging
+import math
+import pickle
+import random
+import time
+import uuid
+import zlib
+from decimal import Decimal
+
+import msgpack
+from django.conf import settings
+from django.core.cache import cache
+from django_redis.compressors.base import BaseCompressor
+from django_redis.exceptions import CompressorError
+from django_redis.serializers.base import BaseSerializer
+
+from .instrumentation import record_cache
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, zlib is always available
+    brotli = None
+
+
+logger = logging.getLogger(__name__)
+
+# How long a recompute may hold the lock before another worker is allowed in.
+LOCK_TIMEOUT = 10
+# How long a logically expired value is kept around to be served while refreshing.
+STALE_GRACE = 300
+# How long a cold-miss reader waits for the lock holder before computing itself.
+COLD_WAIT = 2.0
+
+
+# Deletes the lock only if it still holds the caller's token
+RELEASE_LOCK = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+def _lock_key(key):
+    return f"lock:{key}"
+
+
+def _redis():
+    if "django_redis" not in settings.CACHES["default"]["BACKEND"]:
+        return None
+    from django_redis import get_redis_connection
+    return get_redis_connection("default")
+
+
+def _acquire(lock_key, timeout):
+    """A token for the caller if it got the lock, else None."""
+    token = uuid.uuid4().hex
+    redis = _redis()
+    if redis is not None:
+        # raw SET NX, so the release script can compare the stored token byte for byte
+        acquired = redis.set(cache.make_key(lock_key), token, nx=True, ex=timeout)
+    else:
+        acquired = cache.add(lock_key, token, timeout)
+    return token if acquired else None
+
+
+def _release(lock_key, token):
+    """
+    Release the lock if the caller still holds it. A compute that outlived the
+    lock timeout must not delete the lock another worker has taken since.
+    """
+    redis = _redis()
+    if redis is not None:
+        redis.eval(RELEASE_LOCK, 1, cache.make_key(lock_key), token)
+    elif cache.get(lock_key) == token:
+        cache.delete(lock_key)
+
+
+def _store(key, compute, ttl, stale_grace):
+    started = time.monotonic()
+    value = compute()
+    delta = time.monotonic() - started
+    cache.set(key, (value, time.time() + ttl, delta), ttl + stale_grace)
+    return value
+
+
+def get_or_compute(key, compute, ttl, beta=1.0, lock_timeout=LOCK_TIMEOUT,
+                   stale_grace=STALE_GRACE, cold_wait=COLD_WAIT):
+    """
+    Single-flight get-or-compute for expensive cached payloads.
+
+    - The cache entry carries the value, its logical expiry and how long it took to
+      compute, and physically outlives the logical expiry by `stale_grace` seconds.
+    - Readers refresh early with a probability that grows as expiry approaches
+      (scaled by `beta` and the compute time), so hot keys rarely expire at all.
+    - Only the worker that wins a short lock (SET NX in Redis) recomputes;
+      everyone else keeps serving the stale value meanwhile. The winner only
+      releases the lock while it still holds it.
+    """
+    entry = cache.get(key)
+    lock_key = _lock_key(key)
+
+    if entry is not None:
+        value, expires_at, delta = entry
+        # 1 - random() is in (0, 1], so log() is always defined
+        if time.time() - delta * beta * math.log(1.0 - random.random()) < expires_at:
+            record_cache(hit=True)
+            return value
+        token = _acquire(lock_key, lock_timeout)
+        if token is None:
+            record_cache(hit=True)
+            return value
+        record_cache(hit=False)
+        try:
+            return _store(key, compute, ttl, stale_grace)
+        finally:
+            _release(lock_key, token)
+
+    record_cache(hit=False)
+    token = _acquire(lock_key, lock_timeout)
+    if token is not None:
+        try:
+            return _store(key, compute, ttl, stale_grace)
+        finally:
+            _release(lock_key, token)
+
+    # Cold miss while another worker computes: wait briefly for its result
+    deadline = time.monotonic() + cold_wait
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry[0]
+
+    logger.warning(f"Timed out waiting for cache key {key}; computing without lock")
+    return compute()
+
+
+def invalidate(key):
+    cache.delete(key)
+
+
+def _version_key(namespace, ident):
+    return f"version:{namespace}:{ident}"
+
+
+def get_version(namespace, ident):
+    """
+    Current version number of a cached object, for building cache keys.
+
+    Versions start from the current time in milliseconds, so a counter that was
+    evicted never restarts below a value an older cache key was built from.
+    """
+    key = _version_key(namespace, ident)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, int(time.time() * 1000), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(namespace, ident):
+    """Invalidate every cache key built from the object's version."""
+    key = _version_key(namespace, ident)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        cache.add(key, int(time.time() * 1000), None)
+        return cache.get(key)
+
+
+# msgpack extension type codes used by MsgPackSerializer
+EXT_DECIMAL = 1
+EXT_DATE = 2
+EXT_DATETIME = 3
+EXT_TIME = 4
+EXT_UUID = 5
+EXT_PICKLE = 127
+
+
+def _encode_isoformat(code):
+    return lambda obj: msgpack.ExtType(code, obj.isoformat().encode())
+
+
+# exact-type dispatch keeps the per-value hook cheap on payloads with thousands of Decimals
+_MSGPACK_ENCODERS = {
+    Decimal: lambda obj: msgpack.ExtType(EXT_DECIMAL, str(obj).encode()),
+    datetime.datetime: _encode_isoformat(EXT_DATETIME),
+    datetime.date: _encode_isoformat(EXT_DATE),
+    datetime.time: _encode_isoformat(EXT_TIME),
+    uuid.UUID: lambda obj: msgpack.ExtType(EXT_UUID, obj.bytes),
+}
+
+_MSGPACK_DECODERS = {
+    EXT_DECIMAL: lambda data: Decimal(data.decode()),
+    EXT_DATETIME: lambda data: datetime.datetime.fromisoformat(data.decode()),
+    EXT_DATE: lambda data: datetime.date.fromisoformat(data.decode()),
+    EXT_TIME: lambda data: datetime.time.fromisoformat(data.decode()),
+    EXT_UUID: lambda data: uuid.UUID(bytes=data),
+    EXT_PICKLE: pickle.loads,
+}
+
+
+def _msgpack_default(obj):
+    encoder = _MSGPACK_ENCODERS.get(type(obj))
+    if encoder is not None:
+        return encoder(obj)
+    # subclasses; datetime is a subclass of date, so it has to be checked first
+    for cls in (Decimal, datetime.datetime, datetime.date, datetime.time, uuid.UUID):
+        if isinstance(obj, cls):
+            return _MSGPACK_ENCODERS[cls](obj)
+    # anything else (model instances, sets, ...) still round-trips, just less compactly
+    return msgpack.ExtType(EXT_PICKLE, pickle.dumps(obj, pickle.HIGHEST_PROTOCOL))
+
+
+def _msgpack_ext_hook(code, data):
+    decoder = _MSGPACK_DECODERS.get(code)
+    if decoder is None:
+        return msgpack.ExtType(code, data)
+    return decoder(data)
+
+
+class MsgPackSerializer(BaseSerializer):
+    """
+    django_redis serializer that stores values as msgpack.
+
+    Decimal, date, datetime, time and UUID get compact extension types so
+    dashboard payloads round-trip with their original types. Tuples come back
+    as lists.
+    """
+
+    def dumps(self, value):
+        return msgpack.packb(value, default=_msgpack_default, use_bin_type=True)
+
+    def loads(self, value):
+        return msgpack.unpackb(value, ext_hook=_msgpack_ext_hook, raw=False)
+
+
+# one-byte header written by ThresholdCompressor in front of every payload
+CODEC_NONE = b"\x00"
+CODEC_ZLIB = b"\x01"
+CODEC_BROTLI = b"\x02"
+
+
+class ThresholdCompressor(BaseCompressor):
+    """
+    django_redis compressor that only compresses payloads above a size threshold.
+
+    Options (from the cache OPTIONS dict):
+    - COMPRESS_MIN_LENGTH: payloads shorter than this are stored as-is (default 1024).
+    - COMPRESS_ALGORITHM: "zlib" (default) or "brotli"; falls back to zlib if the
+      brotli module is not installed.
+    - COMPRESS_LEVEL: codec level, defaults to 6 for zlib and 5 for brotli.
+    """
+
+    def __init__(self, options):
+        super().__init__(options)
+        self.min_length = int(options.get("COMPRESS_MIN_LENGTH", 1024))
+        algorithm = options.get("COMPRESS_ALGORITHM", "zlib")
+        if algorithm == "brotli" and brotli is None:
+            logger.warning("brotli is not installed; falling back to zlib cache compression")
+            algorithm = "zlib"
+        self.algorithm = algorithm
+        self.level = int(options.get("COMPRESS_LEVEL", 5 if algorithm == "brotli" else 6))
+
+    def compress(self, value):
+        if len(value) < self.min_length:
+            return CODEC_NONE + value
+        if self.algorithm == "brotli":
+            return CODEC_BROTLI + brotli.compress(value, quality=self.level)
+        return CODEC_ZLIB + zlib.compress(value, self.level)
+
+    def decompress(self, value):
+        codec, body = value[:1], value[1:]
+        try:
+            if codec == CODEC_NONE:
+                return body
+            if codec == CODEC_ZLIB:
+                return zlib.decompress(body)
+            if codec == CODEC_BROTLI and brotli is not None:
+                return brotli.decompress(body)
+        except Exception as e:
+            raise CompressorError(e)
+        raise CompressorError(f"Unknown cache compression codec {codec!r}")
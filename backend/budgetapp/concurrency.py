@@ -0,0 +1,72 @@
+# concurrency.py
+from django.db import transaction
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import VersionConflict
+
+
+# Never a real version (they start at 1): an unparseable If-Match can't match
+NO_MATCH = 0
+
+
+def etag(instance):
+    return f'"v{instance.version}"'
+
+
+def parse_if_match(value):
+    """
+    Version the client's If-Match names, None for `*` (any version), NO_MATCH if
+    it names none we could have issued. Of several tags only the first counts.
+    If-Match compares strongly (RFC 9110 13.1.1), so a weak tag never matches.
+    """
+    tag = value.split(",")[0].strip()
+    if tag == "*":
+        return None
+    if tag.startswith("W/"):
+        return NO_MATCH
+    tag = tag.strip('"')
+    if tag.startswith("v") and tag[1:].isdigit():
+        return int(tag[1:])
+    return NO_MATCH
+
+
+class ConditionalUpdateMixin:
+    """
+    ETag/If-Match for a viewset over a `VersionedModel`.
+
+    Single-object responses carry the object's version as an ETag. An update
+    (PUT/PATCH) sent with `If-Match` only applies if the row is still at that
+    version, which the UPDATE statement itself checks, and fails with 412
+    Precondition Failed otherwise. Updates without If-Match are checked
+    against the version read at the start of the request.
+    """
+
+    def get_object(self):
+        self._versioned_object = super().get_object()
+        return self._versioned_object
+
+    def perform_update(self, serializer):
+        if_match = self.request.headers.get("If-Match")
+        if if_match is not None:
+            expected = parse_if_match(if_match)
+            if expected is not None:
+                serializer.instance.version = expected
+        super().perform_update(serializer)
+
+    def update(self, request, *args, **kwargs):
+        try:
+            # a savepoint, so the failed save doesn't poison an enclosing transaction
+            with transaction.atomic():
+                return super().update(request, *args, **kwargs)
+        except VersionConflict:
+            return Response(
+                {"detail": "This record was changed by someone else. Reload it and try again."},
+                status=status.HTTP_412_PRECONDITION_FAILED,
+            )
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        instance = getattr(self, "_versioned_object", None)
+        if instance is not None and status.is_success(response.status_code) and request.method != "DELETE":
+            response["ETag"] = etag(instance)
+        return super().finalize_response(request, response, *args, **kwargs)
@@ -0,0 +1,159 @@
+# db_router.py
+import logging
+import random
+import threading
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+logger = logging.getLogger(__name__)
+
+
+def replicas():
+    return list(settings.REPLICA_DATABASES)
+
+
+class RoutingState:
+    """Per-request routing decision, set by ReplicaRoutingMiddleware."""
+
+    __slots__ = ("use_replica", "wrote", "replica")
+
+    def __init__(self, use_replica):
+        self.use_replica = use_replica
+        self.wrote = False
+        # picked on the first read and kept, so a page and its count see the same replica
+        self.replica = None
+
+
+_state = ContextVar("db_routing", default=None)
+
+
+def start(use_replica):
+    """Route the current request's reads; pass the token to `stop()`."""
+    state = RoutingState(use_replica)
+    return state, _state.set(state)
+
+
+def stop(token):
+    _state.reset(token)
+
+
+_health = {}
+_health_lock = threading.Lock()
+
+
+def _replica_lag(alias):
+    """Seconds the replica is behind, 0 where the backend can't tell (e.g. SQLite); raises if it is down."""
+    connection = connections[alias]
+    with connection.cursor() as cursor:
+        if connection.vendor != "mysql":
+            cursor.execute("SELECT 1")
+            return 0
+        cursor.execute("SHOW REPLICA STATUS")
+        row = cursor.fetchone()
+        if row is None:
+            return 0  # not replicating, e.g. a local copy used for testing
+        columns = [column[0] for column in cursor.description]
+        status = dict(zip(columns, row))
+        lag = status.get("Seconds_Behind_Source")
+        # NULL while the replication threads are stopped: as good as down
+        return float("inf") if lag is None else lag
+
+
+def replica_ok(alias):
+    """Whether `alias` is reachable and within REPLICA_MAX_LAG, checked at most every REPLICA_CHECK_INTERVAL."""
+    now = time.monotonic()
+    with _health_lock:
+        checked = _health.get(alias)
+    if checked and now - checked[0] < settings.REPLICA_CHECK_INTERVAL:
+        return checked[1]
+    try:
+        lag = _replica_lag(alias)
+        ok = lag <= settings.REPLICA_MAX_LAG
+        if not ok:
+            logger.warning(f"Replica {alias} is {lag}s behind; reading from the primary")
+    except Exception as e:
+        ok = False
+        logger.warning(f"Replica {alias} is unavailable; reading from the primary: {e}")
+    with _health_lock:
+        _health[alias] = (now, ok)
+    return ok
+
+
+def reset_health():
+    with _health_lock:
+        _health.clear()
+
+
+class ReplicaRouter:
+    """
+    Reads go to a healthy replica, the same one for the whole request, only
+    inside a request that opted in (safe method, client not pinned) and
+    hasn't written yet, and never inside a transaction on the primary, whose
+    own uncommitted writes a replica can't see. Everything else, including
+    management commands and the job worker, uses the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state is None or not state.use_replica or state.wrote:
+            return DEFAULT_DB_ALIAS
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        if state.replica is None:
+            healthy = [alias for alias in replicas() if replica_ok(alias)]
+            state.replica = random.choice(healthy) if healthy else DEFAULT_DB_ALIAS
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # replicas hold the same rows as the primary
+        databases = {DEFAULT_DB_ALIAS, *replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # replicas get their schema through replication
+        return db not in replicas()
+
+
+def _pin_key(identity):
+    return f"db_pin:{identity}"
+
+
+def client_identity(request):
+    """
+    Who to pin after a write, worked out without touching the database: the
+    user id in a valid JWT, else the session cookie, else the client address.
+    """
+    header = request.headers.get("Authorization", "")
+    if header.startswith("Bearer "):
+        from rest_framework_simplejwt.exceptions import TokenError
+        from rest_framework_simplejwt.settings import api_settings
+        from rest_framework_simplejwt.tokens import AccessToken
+        try:
+            return f"user:{AccessToken(header[7:])[api_settings.USER_ID_CLAIM]}"
+        except (TokenError, KeyError):
+            pass
+    session = request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+    if session:
+        return f"session:{session}"
+    return f"addr:{request.META.get('REMOTE_ADDR', '')}"
+
+
+def is_pinned(identity):
+    return cache.get(_pin_key(identity)) is not None
+
+
+def pin(identity):
+    cache.set(_pin_key(identity), 1, settings.REPLICA_PIN_SECONDS)
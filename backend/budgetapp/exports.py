@@ -0,0 +1,132 @@
+# exports.py
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import Pledge, MpesaPayment, ManualPayment, VendorPayment
+
+
+# Rows are fetched in primary-key batches of this size.
+CHUNK_SIZE = 2000
+# Leading characters that make Excel/Sheets treat a CSV cell as a formula
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+class ExportSpec:
+    def __init__(self, model, columns, event_lookup):
+        self.model = model
+        # (header, values_list lookup) pairs
+        self.columns = columns
+        self.event_lookup = event_lookup
+
+    @property
+    def headers(self):
+        return [header for header, _ in self.columns]
+
+    @property
+    def lookups(self):
+        return [lookup for _, lookup in self.columns]
+
+
+EXPORTS = {
+    "pledges": ExportSpec(Pledge, [
+        ("id", "id"),
+        ("event_id", "event_id"),
+        ("event", "event__name"),
+        ("name", "name"),
+        ("phone_number", "phone_number"),
+        ("amount_pledged", "amount_pledged"),
+        ("total_paid", "total_paid"),
+        ("is_fulfilled", "is_fulfilled"),
+    ], "event_id"),
+    "mpesa-payments": ExportSpec(MpesaPayment, [
+        ("id", "id"),
+        ("event_id", "event_id"),
+        ("pledge_id", "pledge_id"),
+        ("pledger", "pledge__name"),
+        ("amount", "amount"),
+        ("transaction_id", "transaction_id"),
+        ("timestamp", "timestamp"),
+    ], "event_id"),
+    "manual-payments": ExportSpec(ManualPayment, [
+        ("id", "id"),
+        ("event_id", "event_id"),
+        ("pledge_id", "pledge_id"),
+        ("pledger", "pledge__name"),
+        ("phone_number", "pledge__phone_number"),
+        ("amount", "amount"),
+        ("date", "date"),
+    ], "event_id"),
+    "vendor-payments": ExportSpec(VendorPayment, [
+        ("id", "id"),
+        ("event_id", "budget_item__event_id"),
+        ("budget_item_id", "budget_item_id"),
+        ("category", "budget_item__category"),
+        ("service_provider_id", "service_provider_id"),
+        ("service_provider", "service_provider__name"),
+        ("payment_method", "payment_method"),
+        ("transaction_code", "transaction_code"),
+        ("amount", "amount"),
+        ("confirmed", "confirmed"),
+        ("date_paid", "date_paid"),
+    ], "budget_item__event_id"),
+}
+
+
+def export_rows(spec, user, event_id=None, chunk_size=CHUNK_SIZE):
+    """
+    Yield value tuples for one export, in primary-key order.
+
+    Batches are keyed on the last primary key seen instead of using
+    `QuerySet.iterator()`, because MySQL drivers buffer the whole result set
+    client-side; this keeps memory flat for any row count on every backend.
+    """
+    queryset = spec.model.objects.filter(user=user)
+    if event_id is not None:
+        queryset = queryset.filter(**{spec.event_lookup: event_id})
+    queryset = queryset.order_by("pk").values_list("pk", *spec.lookups)
+
+    last_pk = 0
+    while True:
+        batch = list(queryset.filter(pk__gt=last_pk)[:chunk_size])
+        if not batch:
+            return
+        for row in batch:
+            yield row[1:]
+        last_pk = batch[-1][0]
+        if len(batch) < chunk_size:
+            return
+
+
+class _Echo:
+    """File-like object whose write() just hands the line back to csv.writer's caller."""
+
+    def write(self, value):
+        return value
+
+
+def _csv_safe(value):
+    """Quote text a spreadsheet would run as a formula (names like "=HYPERLINK(...)")."""
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return f"'{value}"
+    return value
+
+
+def stream_csv(spec, rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(spec.headers)
+    for row in rows:
+        yield writer.writerow([_csv_safe(value) for value in row])
+
+
+def stream_ndjson(spec, rows):
+    headers = spec.headers
+    for row in rows:
+        yield json.dumps(dict(zip(headers, row)), cls=DjangoJSONEncoder) + "\n"
+
+
+FORMATS = {
+    "csv": ("text/csv", stream_csv),
+    "ndjson": ("application/x-ndjson", stream_ndjson),
+}
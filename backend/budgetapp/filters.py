@@ -0,0 +1,113 @@
+# filters.py
+import django_filters
+from django_filters.constants import EMPTY_VALUES
+
+from .models import (
+    Event, BudgetItem, Pledge, MpesaPayment, ManualPayment,
+    VendorPayment, ServiceProvider, Task
+)
+
+
+# Every filter here is served by a composite index that starts with `user`
+# (see the models' Meta.indexes), because every list is already scoped to the
+# requesting user. Parent ids are plain number filters so they don't run a
+# validation query against the parent table.
+
+
+class IndexedBooleanFilter(django_filters.BooleanFilter):
+    """
+    Boolean filter compiled as `col IN (true)` instead of Django's bare `col` /
+    `NOT col`, which neither SQLite nor MySQL will look up in a composite index.
+    """
+
+    def filter(self, qs, value):
+        if value in EMPTY_VALUES:
+            return qs
+        return self.get_method(qs)(**{f"{self.field_name}__in": [value]})
+
+
+class EventFilter(django_filters.FilterSet):
+    event_date = django_filters.DateFromToRangeFilter()
+    is_funded = IndexedBooleanFilter()
+    min_budget = django_filters.NumberFilter(field_name='total_budget', lookup_expr='gte')
+    max_budget = django_filters.NumberFilter(field_name='total_budget', lookup_expr='lte')
+
+    class Meta:
+        model = Event
+        fields = ['event_date', 'is_funded']
+
+
+class BudgetItemFilter(django_filters.FilterSet):
+    event = django_filters.NumberFilter(field_name='event_id')
+    is_funded = IndexedBooleanFilter()
+    min_budget = django_filters.NumberFilter(field_name='estimated_budget', lookup_expr='gte')
+    max_budget = django_filters.NumberFilter(field_name='estimated_budget', lookup_expr='lte')
+
+    class Meta:
+        model = BudgetItem
+        fields = ['event', 'is_funded']
+
+
+class PledgeFilter(django_filters.FilterSet):
+    event = django_filters.NumberFilter(field_name='event_id')
+    is_fulfilled = IndexedBooleanFilter()
+    min_amount = django_filters.NumberFilter(field_name='amount_pledged', lookup_expr='gte')
+    max_amount = django_filters.NumberFilter(field_name='amount_pledged', lookup_expr='lte')
+
+    class Meta:
+        model = Pledge
+        fields = ['event', 'is_fulfilled']
+
+
+class MpesaPaymentFilter(django_filters.FilterSet):
+    event = django_filters.NumberFilter(field_name='event_id')
+    pledge = django_filters.NumberFilter(field_name='pledge_id')
+    timestamp = django_filters.IsoDateTimeFromToRangeFilter()
+    min_amount = django_filters.NumberFilter(field_name='amount', lookup_expr='gte')
+    max_amount = django_filters.NumberFilter(field_name='amount', lookup_expr='lte')
+
+    class Meta:
+        model = MpesaPayment
+        fields = ['event', 'pledge', 'timestamp']
+
+
+class ManualPaymentFilter(django_filters.FilterSet):
+    event = django_filters.NumberFilter(field_name='event_id')
+    pledge = django_filters.NumberFilter(field_name='pledge_id')
+    date = django_filters.DateFromToRangeFilter()
+    min_amount = django_filters.NumberFilter(field_name='amount', lookup_expr='gte')
+    max_amount = django_filters.NumberFilter(field_name='amount', lookup_expr='lte')
+
+    class Meta:
+        model = ManualPayment
+        fields = ['event', 'pledge', 'date']
+
+
+class VendorPaymentFilter(django_filters.FilterSet):
+    budget_item = django_filters.NumberFilter(field_name='budget_item_id')
+    service_provider = django_filters.NumberFilter(field_name='service_provider_id')
+    confirmed = IndexedBooleanFilter()
+    date_paid = django_filters.IsoDateTimeFromToRangeFilter()
+    min_amount = django_filters.NumberFilter(field_name='amount', lookup_expr='gte')
+    max_amount = django_filters.NumberFilter(field_name='amount', lookup_expr='lte')
+
+    class Meta:
+        model = VendorPayment
+        fields = ['budget_item', 'service_provider', 'confirmed', 'date_paid']
+
+
+class ServiceProviderFilter(django_filters.FilterSet):
+    budget_item = django_filters.NumberFilter(field_name='budget_item_id')
+    service_type = django_filters.CharFilter()
+
+    class Meta:
+        model = ServiceProvider
+        fields = ['budget_item', 'service_type']
+
+
+class TaskFilter(django_filters.FilterSet):
+    budget_item = django_filters.NumberFilter(field_name='budget_item_id')
+
+    class Meta:
+        model = Task
+        fields = ['budget_item']
@@ -0,0 +1,150 @@
+# forecasting.py
+import datetime
+from decimal import ROUND_HALF_UP, Decimal
+
+import numpy as np
+from django.db.models import Sum
+from django.utils import timezone
+
+from .cache import get_or_compute, get_version
+from .models import DailyEventTotals, Event, Pledge
+
+
+# How many of the user's most recent past events feed the collection curve.
+HISTORY_EVENTS = 50
+FORECAST_TTL = 60 * 60
+
+
+CENTS = Decimal("0.01")
+
+
+def _money(value):
+    return Decimal(value).quantize(CENTS, ROUND_HALF_UP)
+
+
+def _share(fraction, amount):
+    """`amount` (Decimal) times a float fraction from the curve, rounded to cents."""
+    return _money(amount * Decimal(float(fraction)))
+
+
+def collection_curve(user, exclude_event_id=None, today=None):
+    """
+    Historical collection curve from the user's past events.
+
+    Returns `(horizons, collected)` where `collected[i]` is the fraction of all
+    pledged money that had been paid with at least `horizons[i]` days still
+    left before the event, plus the pledged total it is based on. Uses the
+    DailyEventTotals rollup, so it reads one row per event per day.
+    """
+    today = today or timezone.localdate()
+    past = Event.objects.filter(user=user, event_date__lt=today)
+    if exclude_event_id:
+        past = past.exclude(pk=exclude_event_id)
+    past = dict(past.order_by("-event_date").values_list("id", "event_date")[:HISTORY_EVENTS])
+    if not past:
+        return None, None, Decimal("0")
+
+    pledged = Pledge.objects.filter(event_id__in=past).aggregate(total=Sum("amount_pledged"))["total"] or 0
+    if not pledged:
+        return None, None, Decimal("0")
+
+    rows = list(DailyEventTotals.objects.filter(event_id__in=past).values_list("event_id", "day", "total_amount"))
+    if not rows:
+        return np.array([0]), np.array([0.0]), pledged
+
+    event_ids, days, amounts = zip(*rows)
+    event_ordinals = np.fromiter((past[e].toordinal() for e in event_ids), dtype=np.int64, count=len(rows))
+    day_ordinals = np.fromiter((d.toordinal() for d in days), dtype=np.int64, count=len(rows))
+    amounts = np.asarray(amounts, dtype=np.float64)
+
+    # payments made after the event count as "not collected by event date"
+    days_before = event_ordinals - day_ordinals
+    on_time = days_before >= 0
+    days_before, amounts = days_before[on_time], amounts[on_time]
+
+    order = np.argsort(-days_before, kind="stable")
+    horizons = days_before[order]
+    collected = np.cumsum(amounts[order]) / float(pledged)
+    return horizons, collected, pledged
+
+
+def _collected_by(horizons, collected, days_left):
+    """Vectorized C(h): fraction collected with at least h days left, for an array of h."""
+    # horizons are sorted descending; count entries with horizon >= h
+    n = np.searchsorted(-horizons, -np.asarray(days_left), side="right")
+    return np.where(n > 0, collected[np.maximum(n - 1, 0)], 0.0)
+
+
+def forecast_event(event, today=None):
+    """
+    Project how much of the event's outstanding pledge balance will be paid by
+    `event_date`, from how the user's past events collected over the same
+    remaining window.
+    """
+    today = today or timezone.localdate()
+    # money stays Decimal; only the curve's fractions are floats
+    rows = list(Pledge.objects.filter(event=event).values_list("amount_pledged", "total_paid"))
+    total_pledged = sum((pledged for pledged, _ in rows), Decimal("0"))
+    total_paid = sum((paid for _, paid in rows), Decimal("0"))
+    total_outstanding = sum((max(pledged - paid, Decimal("0")) for pledged, paid in rows), Decimal("0"))
+    days_left = (event.event_date - today).days
+
+    result = {
+        "event": event.id,
+        "as_of": today,
+        "event_date": event.event_date,
+        "days_remaining": max(days_left, 0),
+        "pledge_count": int(len(rows)),
+        "total_pledged": _money(total_pledged),
+        "total_paid": _money(total_paid),
+        "outstanding": _money(total_outstanding),
+        "collection_rate": None,
+        "projected_collection": None,
+        "projected_total_paid": None,
+        "series": [],
+        "basis": {"past_events_pledged": Decimal("0"), "method": "no_history"},
+    }
+
+    if days_left <= 0:
+        result.update({
+            "collection_rate": Decimal("0"),
+            "projected_collection": Decimal("0.00"),
+            "projected_total_paid": result["total_paid"],
+            "basis": {"past_events_pledged": Decimal("0"), "method": "event_passed"},
+        })
+        return result
+
+    horizons, collected, history_pledged = collection_curve(event.user_id, event.id, today)
+    if horizons is None:
+        return result
+
+    # share of what was still unpaid at `days_left` that past events went on to collect
+    final = _collected_by(horizons, collected, 0)
+    remaining_days = np.arange(days_left - 1, -1, -1)
+    by_day = _collected_by(horizons, collected, remaining_days)
+    now = _collected_by(horizons, collected, days_left)
+    unpaid_now = max(1.0 - float(now), 1e-9)
+    rate = float(np.clip((final - now) / unpaid_now, 0.0, 1.0))
+    cumulative_rate = np.clip((by_day - now) / unpaid_now, 0.0, 1.0)
+
+    # every pledge's outstanding balance is collected at the same rate
+    projected = _share(rate, total_outstanding)
+
+    result.update({
+        "collection_rate": Decimal(rate).quantize(Decimal("0.0001"), ROUND_HALF_UP),
+        "projected_collection": projected,
+        "projected_total_paid": _money(total_paid + projected),
+        "series": [
+            {"date": today + datetime.timedelta(days=i + 1), "projected_collected": _share(value, total_outstanding)}
+            for i, value in enumerate(cumulative_rate)
+        ],
+        "basis": {"past_events_pledged": history_pledged, "method": "historical_curve"},
+    })
+    return result
+
+
+def cached_forecast(event):
+    """Forecast cached per event version and day."""
+    today = timezone.localdate()
+    key = f"forecast:{event.id}:{get_version('event', event.id)}:{today.isoformat()}"
+    return get_or_compute(key, lambda: forecast_event(event, today), ttl=FORECAST_TTL)
@@ -0,0 +1,96 @@
+# idempotency.py
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.response import Response
+
+
+HEADER = "Idempotency-Key"
+MAX_KEY_LENGTH = 255
+
+IN_FLIGHT = "in_flight"
+DONE = "done"
+
+
+def _fingerprint(request):
+    """Same key must come with the same request: method, path and (parsed, so key order doesn't matter) body."""
+    # the raw body is gone by now: throttles and parsers have already read the stream
+    body = json.dumps(request.data, sort_keys=True, default=str)
+    return hashlib.sha256(f"{request.method} {request.get_full_path()}\n{body}".encode()).hexdigest()
+
+
+def _error(detail, status_code):
+    return Response({"detail": detail}, status=status_code)
+
+
+class IdempotentCreateMixin:
+    """
+    `Idempotency-Key` support for a viewset's create (POST).
+
+    The first request with a key claims it in the cache (`cache.add`, SET NX in
+    Redis) and runs normally; its response is stored for IDEMPOTENCY_TTL and
+    replayed to any retry with the same key, marked `Idempotent-Replayed: true`,
+    at the cost of one cache lookup. A retry arriving while the first request
+    is still running gets 409, and reusing a key for a different request 422.
+    Requests that fail with an exception (validation errors included) or a
+    server error release the key, so the client can fix or retry them for real.
+
+    Keys are scoped to the user and the endpoint.
+    """
+
+    def create(self, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if key is None:
+            return super().create(request, *args, **kwargs)
+        if not key or len(key) > MAX_KEY_LENGTH:
+            return _error(f"{HEADER} must be 1-{MAX_KEY_LENGTH} characters.", status.HTTP_400_BAD_REQUEST)
+
+        cache_key = f"idempotency:{request.user.pk}:{request.path}:{hashlib.sha256(key.encode()).hexdigest()}"
+        fingerprint = _fingerprint(request)
+        if not self.claim(cache_key, fingerprint):
+            stored = cache.get(cache_key)
+            if stored is not None:
+                return self.replay(stored, fingerprint)
+            # expired between add and get: free again unless another retry got it first
+            if not self.claim(cache_key, fingerprint):
+                return self.in_progress()
+
+        try:
+            response = super().create(request, *args, **kwargs)
+        except Exception:
+            cache.delete(cache_key)
+            raise
+        if response.status_code >= 500:
+            cache.delete(cache_key)
+            return response
+        cache.set(cache_key, {
+            "state": DONE,
+            "fingerprint": fingerprint,
+            "status": response.status_code,
+            "data": response.data,
+            "location": response.get("Location"),
+        }, settings.IDEMPOTENCY_TTL)
+        return response
+
+    def claim(self, cache_key, fingerprint):
+        return cache.add(cache_key, {"state": IN_FLIGHT, "fingerprint": fingerprint},
+                         settings.IDEMPOTENCY_IN_FLIGHT_TTL)
+
+    def in_progress(self):
+        response = _error(f"A request with this {HEADER} is in progress.", status.HTTP_409_CONFLICT)
+        response["Retry-After"] = "1"
+        return response
+
+    def replay(self, stored, fingerprint):
+        if stored["fingerprint"] != fingerprint:
+            return _error(f"{HEADER} was already used for a different request.",
+                          status.HTTP_422_UNPROCESSABLE_ENTITY)
+        if stored["state"] == IN_FLIGHT:
+            return self.in_progress()
+        headers = {"Idempotent-Replayed": "true"}
+        if stored.get("location"):
+            headers["Location"] = stored["location"]
+        return Response(stored["data"], status=stored["status"], headers=headers)
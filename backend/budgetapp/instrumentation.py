@@ -0,0 +1,59 @@
+# instrumentation.py
+import time
+from contextvars import ContextVar
+
+
+class RequestMetrics:
+    """Counters collected while one request is being handled."""
+
+    __slots__ = ("started", "db_queries", "db_time", "cache_hits", "cache_misses", "render_started", "render_time")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.db_queries = 0
+        self.db_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.render_started = None
+        self.render_time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        """`connection.execute_wrapper` hook: counts and times every query."""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.db_queries += 1
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+
+_current = ContextVar("request_metrics", default=None)
+
+
+def start():
+    """Begin collecting for the current request; pass the token to `stop()`."""
+    metrics = RequestMetrics()
+    return metrics, _current.set(metrics)
+
+
+def stop(token):
+    _current.reset(token)
+
+
+def current():
+    """Metrics of the request being handled, or None outside a request."""
+    return _current.get()
+
+
+def record_cache(hit):
+    metrics = _current.get()
+    if metrics is None:
+        return
+    if hit:
+        metrics.cache_hits += 1
+    else:
+        metrics.cache_misses += 1
@@ -0,0 +1,199 @@
+# jobs.py
+import logging
+import os
+import socket
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Min
+from django.utils import timezone
+
+from . import metrics, recompute
+from .models import BudgetItem, Event, Job
+
+
+logger = logging.getLogger(__name__)
+
+# kind -> (function, whether it takes every claimed payload of its kind at once)
+HANDLERS = {}
+
+# Jobs claimed per worker round trip
+BATCH_SIZE = 50
+
+jobs_total = metrics.Counter(metrics.registry, "budget_jobs_total", "Jobs run by the worker, by kind and result.",
+                             ("kind", "result"))
+job_duration = metrics.Histogram(metrics.registry, "budget_job_duration_seconds", "Job handler run time by kind.",
+                                 ("kind",))
+
+
+def handler(kind, batch=False):
+    """
+    Register the function running jobs of `kind`. It is called with the job's
+    payload, or with the list of payloads of every claimed job of that kind
+    when `batch` is set, so one set-based query can serve them all.
+    """
+    def register(func):
+        HANDLERS[kind] = (func, batch)
+        return func
+    return register
+
+
+def eager():
+    """Run jobs inline instead of queueing them, for tests and deployments without a worker."""
+    return settings.JOBS_EAGER
+
+
+def enqueue(kind, payload=None, dedupe_key=None, delay=0, max_attempts=5):
+    """
+    Queue a job, in the caller's transaction: it becomes visible to the worker
+    when that commits and disappears if it rolls back.
+
+    While a job with the same `dedupe_key` is still queued, enqueueing again
+    returns that job instead of adding another, so a burst of writes to one
+    event collapses into a single recompute.
+    """
+    if kind not in HANDLERS:
+        raise ValueError(f"No job handler registered for {kind!r}")
+    payload = payload or {}
+    if eager():
+        func, batch = HANDLERS[kind]
+        func([payload] if batch else payload)
+        return None
+
+    if dedupe_key is not None:
+        queued = Job.objects.filter(dedupe_key=dedupe_key).first()
+        if queued:
+            return queued
+    try:
+        with transaction.atomic():
+            return Job.objects.create(
+                kind=kind, payload=payload, dedupe_key=dedupe_key, max_attempts=max_attempts,
+                run_after=timezone.now() + timedelta(seconds=delay),
+            )
+    except IntegrityError:
+        # another transaction queued the same key between our check and insert
+        if dedupe_key is None:
+            raise
+        return Job.objects.filter(dedupe_key=dedupe_key).first()
+
+
+def worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def claim(worker, batch_size=BATCH_SIZE, kinds=None):
+    """
+    Lock up to `batch_size` due jobs for `worker`. SKIP LOCKED lets several
+    workers claim concurrently without waiting on each other's rows; claimed
+    jobs lose their dedupe key so writes made while they run queue a new job.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        due = Job.objects.filter(status=Job.QUEUED, run_after__lte=now)
+        if kinds:
+            due = due.filter(kind__in=kinds)
+        ids = list(due.select_for_update(skip_locked=True).order_by("run_after", "id").values_list("pk", flat=True)[:batch_size])
+        if not ids:
+            return []
+        Job.objects.filter(pk__in=ids).update(status=Job.RUNNING, locked_by=worker, locked_at=now, dedupe_key=None)
+    return list(Job.objects.filter(pk__in=ids))
+
+
+def requeue_stale():
+    """Put back jobs whose worker died mid-run; returns how many."""
+    expired = timezone.now() - timedelta(seconds=settings.JOBS_LEASE)
+    return Job.objects.filter(status=Job.RUNNING, locked_at__lt=expired).update(
+        status=Job.QUEUED, locked_by="", locked_at=None,
+    )
+
+
+def backoff(attempts):
+    return min(settings.JOBS_RETRY_BASE * 2 ** (attempts - 1), settings.JOBS_RETRY_MAX)
+
+
+def run(jobs):
+    """Run claimed jobs, batch handlers once per kind; successes are deleted, failures retried or marked failed."""
+    by_kind = {}
+    for job in jobs:
+        by_kind.setdefault(job.kind, []).append(job)
+
+    for kind, group in by_kind.items():
+        func, batch = HANDLERS.get(kind, (None, False))
+        if func is None:
+            _failed(group, f"No job handler registered for {kind!r}", retry=False)
+            continue
+        for chunk in [group] if batch else [[job] for job in group]:
+            started = time.perf_counter()
+            try:
+                with transaction.atomic():
+                    func([job.payload for job in chunk] if batch else chunk[0].payload)
+            except Exception:
+                _failed(chunk, traceback.format_exc())
+            else:
+                Job.objects.filter(pk__in=[job.pk for job in chunk]).delete()
+                jobs_total.inc(kind, "done", amount=len(chunk))
+            finally:
+                job_duration.observe(time.perf_counter() - started, kind)
+
+
+def _failed(jobs, error, retry=True):
+    now = timezone.now()
+    for job in jobs:
+        job.attempts += 1
+        if retry and job.attempts < job.max_attempts:
+            job.status = Job.QUEUED
+            job.run_after = now + timedelta(seconds=backoff(job.attempts))
+            jobs_total.inc(job.kind, "retry")
+        else:
+            job.status = Job.FAILED
+            jobs_total.inc(job.kind, "failed")
+            logger.error(f"Job {job.kind} #{job.pk} failed after {job.attempts} attempt(s): {error.splitlines()[-1]}")
+        job.last_error = error
+        job.locked_by = ""
+        job.locked_at = None
+        job.save(update_fields=["attempts", "status", "run_after", "last_error", "locked_by", "locked_at"])
+
+
+def queue_stats():
+    """Job counts by kind and status, and how long the oldest due job has been waiting."""
+    counts = {}
+    for row in Job.objects.order_by().values("kind", "status").annotate(count=Count("id")):
+        counts.setdefault(row["kind"], {})[row["status"]] = row["count"]
+    oldest = Job.objects.filter(status=Job.QUEUED, run_after__lte=timezone.now()).aggregate(oldest=Min("run_after"))["oldest"]
+    return {
+        "counts": counts,
+        "oldest_due_seconds": (timezone.now() - oldest).total_seconds() if oldest else 0,
+    }
+
+
+@metrics.registry.register_collector
+def queue_depth():
+    stats = queue_stats()
+    lines = [
+        "# HELP budget_jobs Jobs in the queue by kind and status.",
+        "# TYPE budget_jobs gauge",
+    ]
+    for kind, statuses in sorted(stats["counts"].items()):
+        for status, count in sorted(statuses.items()):
+            lines.append(f'budget_jobs{{kind="{metrics._escape(kind)}",status="{status}"}} {count}')
+    lines += [
+        "# HELP budget_jobs_oldest_due_seconds Age of the oldest job waiting for a worker.",
+        "# TYPE budget_jobs_oldest_due_seconds gauge",
+        f"budget_jobs_oldest_due_seconds {metrics._format(round(stats['oldest_due_seconds'], 3))}",
+    ]
+    return lines
+
+
+@handler("recompute_funding", batch=True)
+def recompute_funding(payloads):
+    """Event and budget item `is_funded` for every event touched since the jobs were queued."""
+    event_ids = {payload["event"] for payload in payloads}
+    recompute.recompute("events", queryset=Event.objects.filter(pk__in=event_ids))
+    recompute.recompute("budget-items", queryset=BudgetItem.objects.filter(event_id__in=event_ids))
+
+
+def queue_funding_recompute(event_id):
+    return enqueue("recompute_funding", {"event": event_id}, dedupe_key=f"recompute_funding:{event_id}")
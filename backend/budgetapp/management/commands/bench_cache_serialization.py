@@ -0,0 +1,163 @@
+import datetime
+import pickle
+import random
+import time
+import zlib
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django_redis.serializers.pickle import PickleSerializer
+
+from budgetapp.cache import MsgPackSerializer, ThresholdCompressor, brotli
+
+
+def _money(rng, low, high):
+    return Decimal(rng.randint(low * 100, high * 100)) / 100
+
+
+def build_event_dashboard(rng, pledges, budget_items, tasks):
+    """Payload shaped like DashboardAPIView._get_event_data()."""
+    event_date = datetime.date(2030, 1, 1) + datetime.timedelta(days=rng.randint(0, 365))
+    event = {
+        "id": rng.randint(1, 10**6), "name": "Harambee for school fees",
+        "description": "Fundraiser", "venue": "Community Hall",
+        "total_budget": _money(rng, 100000, 5000000), "event_date": event_date,
+        "user": 1, "is_funded": False, "total_received": _money(rng, 0, 100000),
+        "total_pledged": _money(rng, 0, 5000000), "percentage_covered": _money(rng, 0, 100),
+        "outstanding_balance": _money(rng, 0, 100000), "overpaid_amount": Decimal("0.00"),
+    }
+    return {
+        "event": event,
+        "metrics": {
+            "total_pledged": event["total_pledged"],
+            "total_received": event["total_received"],
+            "percentage_covered": event["percentage_covered"],
+            "outstanding_balance": event["outstanding_balance"],
+        },
+        "pledges": [
+            {
+                "id": i, "event": event["id"], "amount_pledged": _money(rng, 100, 50000),
+                "is_fulfilled": rng.random() < 0.4, "name": f"Contributor {i}",
+                "phone_number": f"+2547{rng.randint(10**7, 10**8 - 1)}", "user": 1,
+                "total_paid": _money(rng, 0, 50000), "balance": _money(rng, 0, 50000),
+            }
+            for i in range(pledges)
+        ],
+        "budget_items": [
+            {
+                "id": i, "event": event["id"], "category": f"Category {i}",
+                "estimated_budget": _money(rng, 1000, 200000), "is_funded": rng.random() < 0.5,
+                "total_vendor_payments": _money(rng, 0, 200000),
+                "remaining_budget": _money(rng, 0, 200000), "is_fully_paid": False,
+            }
+            for i in range(budget_items)
+        ],
+        "tasks": [
+            {
+                "id": i, "budget_item": rng.randint(0, max(budget_items - 1, 0)),
+                "title": f"Task {i}", "description": "", "allocated_amount": _money(rng, 0, 10000),
+                "amount_paid": _money(rng, 0, 10000), "balance": _money(rng, 0, 10000), "user": 1,
+            }
+            for i in range(tasks)
+        ],
+        "budget_summary": {
+            "total_budget": _money(rng, 100000, 5000000),
+            "total_spent": _money(rng, 0, 5000000),
+        },
+    }
+
+
+def build_recent_activity(rng):
+    """Payload shaped like RecentActivityView._build_activity()."""
+    now = datetime.datetime(2030, 1, 1, tzinfo=datetime.timezone.utc)
+    return [
+        {
+            "type": rng.choice(["event", "pledge", "payment"]), "id": i,
+            "created": (now - datetime.timedelta(minutes=i)).isoformat(),
+            "amount": _money(rng, 100, 50000),
+        }
+        for i in range(10)
+    ]
+
+
+class Command(BaseCommand):
+    help = "Benchmark bytes stored and (de)serialization time of cache codecs on dashboard payloads."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--pledges", type=int, default=500, help="Pledges in the event dashboard payload.")
+        parser.add_argument("--budget-items", type=int, default=30)
+        parser.add_argument("--tasks", type=int, default=60)
+        parser.add_argument("--iterations", type=int, default=200)
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        payloads = {
+            "event dashboard": build_event_dashboard(
+                rng, options["pledges"], options["budget_items"], options["tasks"]
+            ),
+            "recent activity": build_recent_activity(rng),
+        }
+
+        pickle_serializer = PickleSerializer({"PICKLE_VERSION": pickle.HIGHEST_PROTOCOL})
+        msgpack_serializer = MsgPackSerializer({})
+        codecs = [
+            ("pickle", pickle_serializer, None),
+            ("pickle+zlib", pickle_serializer, _ZlibOnly()),
+            ("msgpack", msgpack_serializer, ThresholdCompressor({"COMPRESS_MIN_LENGTH": 1 << 30})),
+            ("msgpack+zlib", msgpack_serializer, ThresholdCompressor({"COMPRESS_ALGORITHM": "zlib"})),
+        ]
+        if brotli is not None:
+            codecs.append(
+                ("msgpack+brotli", msgpack_serializer, ThresholdCompressor({"COMPRESS_ALGORITHM": "brotli"}))
+            )
+
+        iterations = options["iterations"]
+        for payload_name, payload in payloads.items():
+            self.stdout.write(f"\n{payload_name}")
+            self.stdout.write(f"{'codec':<16}{'bytes':>10}{'dumps us':>12}{'loads us':>12}")
+            for codec_name, serializer, compressor in codecs:
+                size, dumps_us, loads_us = self._measure(serializer, compressor, payload, iterations)
+                self.stdout.write(f"{codec_name:<16}{size:>10}{dumps_us:>12.1f}{loads_us:>12.1f}")
+
+    def _measure(self, serializer, compressor, payload, iterations):
+        def dumps(value):
+            data = serializer.dumps(value)
+            return compressor.compress(data) if compressor else data
+
+        def loads(data):
+            return serializer.loads(compressor.decompress(data) if compressor else data)
+
+        encoded = dumps(payload)
+        if loads(encoded) != _normalize(payload):
+            raise AssertionError("Codec did not round-trip the payload")
+
+        started = time.perf_counter()
+        for _ in range(iterations):
+            dumps(payload)
+        dumps_us = (time.perf_counter() - started) / iterations * 1e6
+
+        started = time.perf_counter()
+        for _ in range(iterations):
+            loads(encoded)
+        loads_us = (time.perf_counter() - started) / iterations * 1e6
+        return len(encoded), dumps_us, loads_us
+
+
+class _ZlibOnly:
+    """zlib at the same level as ThresholdCompressor, without the size threshold."""
+
+    def compress(self, value):
+        return zlib.compress(value, 6)
+
+    def decompress(self, value):
+        return zlib.decompress(value)
+
+
+def _normalize(value):
+    # msgpack has no tuple type, everything else should round-trip unchanged
+    if isinstance(value, dict):
+        return {k: _normalize(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    return value
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from budgetapp.rollups import rebuild_daily_totals
+
+
+class Command(BaseCommand):
+    help = "Rebuild the DailyEventTotals rollup from raw M-Pesa and manual payments."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--event", type=int, action="append", dest="events",
+            help="Only rebuild this event (can be repeated). Defaults to all events.",
+        )
+
+    def handle(self, *args, **options):
+        buckets = rebuild_daily_totals(event_ids=options["events"])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {buckets} daily buckets."))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from budgetapp.search import SEARCH_SPECS, rebuild_index
+
+
+class Command(BaseCommand):
+    help = "Rebuild the trigram search index for pledges, service providers, events and budget items."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--type", action="append", dest="kinds",
+            help=f"Only rebuild this type (can be repeated): {', '.join(SEARCH_SPECS)}.",
+        )
+        parser.add_argument("--user", type=int, action="append", dest="users", help="Only rebuild this user id.")
+
+    def handle(self, *args, **options):
+        kinds = options["kinds"]
+        if kinds and set(kinds) - set(SEARCH_SPECS):
+            raise CommandError(f"Unknown type(s): {', '.join(set(kinds) - set(SEARCH_SPECS))}")
+        rows = rebuild_index(kinds=kinds, user_ids=options["users"])
+        self.stdout.write(self.style.SUCCESS(f"Indexed {rows} trigrams."))
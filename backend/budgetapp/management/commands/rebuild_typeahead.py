@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from budgetapp.typeahead import TYPEAHEAD_SPECS, rebuild
+
+
+class Command(BaseCommand):
+    help = "Drop and rebuild the type-ahead indexes for pledgers and vendors."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--kind", action="append", dest="kinds",
+            help=f"Only rebuild this kind (can be repeated): {', '.join(TYPEAHEAD_SPECS)}.",
+        )
+        parser.add_argument("--user", type=int, action="append", dest="users", help="Only rebuild this user id.")
+
+    def handle(self, *args, **options):
+        kinds = options["kinds"]
+        if kinds and set(kinds) - set(TYPEAHEAD_SPECS):
+            raise CommandError(f"Unknown kind(s): {', '.join(set(kinds) - set(TYPEAHEAD_SPECS))}")
+        built = rebuild(kinds=kinds, user_ids=options["users"])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {built} type-ahead indexes."))
@@ -0,0 +1,48 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from budgetapp.models import BudgetItem, Event, Pledge
+from budgetapp.recompute import CHUNK_SIZE, DERIVED, recompute, recompute_all
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute stored derived fields (pledge total_paid/is_fulfilled, event and budget item is_funded) "
+        "from the payments with set-based UPDATEs, fixing any that have drifted. Signals are not sent."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--kind", action="append", dest="kinds", choices=list(DERIVED),
+            help="Only recompute this kind (can be repeated). Defaults to all.",
+        )
+        parser.add_argument(
+            "--event", type=int, action="append", dest="events",
+            help="Only these events and their pledges and budget items (can be repeated).",
+        )
+        parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="Primary keys per UPDATE.")
+        parser.add_argument("--workers", type=int, default=1, help="Processes for full-table runs.")
+
+    def handle(self, *args, **options):
+        if options["chunk_size"] < 1 or options["workers"] < 1:
+            raise CommandError("--chunk-size and --workers must be positive.")
+        kinds = options["kinds"] or list(DERIVED)
+        started = time.monotonic()
+
+        if options["events"]:
+            selections = {
+                "pledges": Pledge.objects.filter(event_id__in=options["events"]),
+                "events": Event.objects.filter(pk__in=options["events"]),
+                "budget-items": BudgetItem.objects.filter(event_id__in=options["events"]),
+            }
+            fixed = {kind: recompute(kind, queryset=selections[kind]) for kind in kinds}
+        else:
+            def progress(done, total, kind, id_range, count):
+                if options["verbosity"] > 1 or done == total:
+                    self.stdout.write(f"{done}/{total} chunks ({kind} {id_range[0]}-{id_range[1] - 1}: {count} fixed)")
+
+            fixed = recompute_all(kinds, options["chunk_size"], options["workers"], progress)
+
+        summary = ", ".join(f"{count} {kind}" for kind, count in fixed.items())
+        self.stdout.write(self.style.SUCCESS(f"Fixed {summary} in {time.monotonic() - started:.1f}s."))
@@ -0,0 +1,62 @@
+import json
+import signal
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from budgetapp import jobs
+
+
+class Command(BaseCommand):
+    help = (
+        "Run queued jobs (see budgetapp.jobs) until stopped. Several workers can run side by side; "
+        "SIGTERM/SIGINT finish the current batch before exiting."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=jobs.BATCH_SIZE, help="Jobs claimed per round trip.")
+        parser.add_argument("--sleep", type=float, default=1.0, help="Seconds to wait when the queue is empty.")
+        parser.add_argument(
+            "--kind", action="append", dest="kinds",
+            help=f"Only run this kind (can be repeated): {', '.join(jobs.HANDLERS)}.",
+        )
+        parser.add_argument("--once", action="store_true", help="Exit once no job is due instead of waiting.")
+        parser.add_argument("--stats", action="store_true", help="Print queue depth as JSON and exit.")
+
+    def handle(self, *args, **options):
+        if options["stats"]:
+            self.stdout.write(json.dumps(jobs.queue_stats(), indent=2))
+            return
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be positive.")
+        if options["kinds"] and set(options["kinds"]) - set(jobs.HANDLERS):
+            raise CommandError(f"Unknown kind(s): {', '.join(set(options['kinds']) - set(jobs.HANDLERS))}")
+
+        self.stopping = False
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, self.stop)
+
+        worker = jobs.worker_name()
+        done = 0
+        self.stdout.write(f"Worker {worker} started.")
+        while not self.stopping:
+            # long-running process: drop connections the database has timed out
+            close_old_connections()
+            requeued = jobs.requeue_stale()
+            if requeued:
+                self.stdout.write(f"Requeued {requeued} job(s) from dead workers.")
+            claimed = jobs.claim(worker, options["batch_size"], options["kinds"])
+            if claimed:
+                jobs.run(claimed)
+                done += len(claimed)
+                if options["verbosity"] > 1:
+                    self.stdout.write(f"Ran {len(claimed)} job(s).")
+            elif options["once"]:
+                break
+            else:
+                time.sleep(options["sleep"])
+        self.stdout.write(self.style.SUCCESS(f"Worker {worker} stopped after {done} job(s)."))
+
+    def stop(self, signum, frame):
+        self.stopping = True
@@ -0,0 +1,332 @@
+import contextlib
+import datetime
+import math
+import multiprocessing
+import random
+import time
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from budgetapp.models import (
+    Event, BudgetItem, ServiceProvider, VendorPayment, Task, Pledge,
+    MpesaPayment, ManualPayment, UserSettings
+)
+from budgetapp.rollups import rebuild_daily_totals
+from budgetapp.search import rebuild_index
+
+
+# Insert order: every model comes after the models it references.
+MODELS = [Event, BudgetItem, ServiceProvider, VendorPayment, Task, Pledge, MpesaPayment, ManualPayment]
+# auto_now_add fields that would otherwise stamp every row with "now"
+BACKDATED_FIELDS = [(MpesaPayment, "timestamp"), (VendorPayment, "date_paid")]
+
+FIRST_NAMES = ["Wanjiku", "Kamau", "Achieng", "Otieno", "Njeri", "Mwangi", "Akinyi", "Kiprono", "Wambui",
+               "Omondi", "Chebet", "Mutua", "Nyambura", "Kariuki", "Atieno", "Kiptoo", "Muthoni", "Odhiambo"]
+LAST_NAMES = ["Kamau", "Otieno", "Njoroge", "Wafula", "Mutiso", "Ochieng", "Kibet", "Maina", "Onyango",
+              "Cheruiyot", "Githinji", "Barasa", "Korir", "Nduta", "Wekesa", "Kilonzo"]
+EVENT_KINDS = ["Wedding", "Harambee", "Graduation", "Dowry Ceremony", "Fundraiser", "Baby Shower", "Memorial",
+               "Church Building Fund", "Medical Appeal", "School Fees Drive"]
+VENUES = ["Karen Gardens", "KICC", "Safari Park", "Nyali Beach", "Kisumu Social Hall", "Eldoret Sports Club",
+          "Nakuru Athletic Club", "Home Compound", "Parish Hall", "Thika Greens"]
+CATEGORIES = ["Catering", "Tents & Chairs", "Decor", "Photography", "Sound & PA", "Transport", "Venue Hire",
+              "Attire", "Cake", "MC", "Printing", "Security", "Flowers", "Drinks"]
+SERVICE_TYPES = ["Food", "Rentals", "Decoration", "Media", "Entertainment", "Logistics", "Venue", "Tailoring"]
+PAYMENT_METHODS = ["mpesa", "bank", "cash"]
+
+
+def _cents(value):
+    return Decimal(value).scaleb(-2)
+
+
+def _phone(rng):
+    return f"+2547{rng.randrange(10 ** 8):08d}"
+
+
+def _person(rng):
+    return f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"[:25]
+
+
+def _split(rng, total, parts, share=1.0):
+    """Split `total` cents into `parts` random positive integers summing to at most total * share."""
+    if parts < 1:
+        return []
+    weights = [rng.uniform(0.5, 1.5) for _ in range(parts)]
+    scale = total * share / sum(weights)
+    return [max(1, int(w * scale)) for w in weights]
+
+
+def _aware(day, rng):
+    moment = datetime.datetime.combine(day, datetime.time(rng.randrange(6, 22), rng.randrange(60), rng.randrange(60)))
+    return timezone.make_aware(moment, datetime.timezone.utc)
+
+
+@contextlib.contextmanager
+def backdating():
+    """Let bulk_create keep the timestamps we generate instead of auto_now_add's "now"."""
+    fields = [model._meta.get_field(name) for model, name in BACKDATED_FIELDS]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+class Plan:
+    """
+    Row counts per user and the primary-key block reserved for every model.
+
+    Counts per user are fixed, so user `u`'s k-th row of a model always gets
+    `base + u * per_user + k`: workers never need to read generated keys back,
+    and the same seed always produces the same rows with the same keys.
+    """
+
+    def __init__(self, options, bases):
+        self.seed = options["seed"]
+        self.anchor = options["anchor_date"]
+        self.events = options["events_per_user"]
+        self.items = options["items_per_event"]
+        self.providers = options["providers_per_item"]
+        self.vendor_payments = options["vendor_payments_per_provider"]
+        self.tasks = options["tasks_per_item"]
+        self.pledges = options["pledges_per_event"]
+        self.mpesa = options["mpesa_per_pledge"]
+        self.manual = options["manual_per_pledge"]
+        self.chunk_size = options["chunk_size"]
+        self.user_base = bases[User]
+        self.bases = bases
+
+        items = self.events * self.items
+        providers = items * self.providers
+        pledges = self.events * self.pledges
+        self.per_user = {
+            Event: self.events,
+            BudgetItem: items,
+            ServiceProvider: providers,
+            VendorPayment: providers * self.vendor_payments,
+            Task: items * self.tasks,
+            Pledge: pledges,
+            MpesaPayment: pledges * self.mpesa,
+            ManualPayment: pledges * self.manual,
+        }
+
+    def first_pk(self, model, user_index):
+        return self.bases[model] + user_index * self.per_user[model]
+
+
+class _Writer:
+    """Buffers rows per model and bulk-inserts them, parents first, in one transaction per flush."""
+
+    def __init__(self, chunk_size):
+        self.chunk_size = chunk_size
+        self.buffers = {model: [] for model in MODELS}
+        self.pending = 0
+        self.written = 0
+
+    def add(self, obj):
+        self.buffers[type(obj)].append(obj)
+        self.pending += 1
+        if self.pending >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        with transaction.atomic():
+            for model in MODELS:
+                rows = self.buffers[model]
+                if rows:
+                    model.objects.bulk_create(rows, batch_size=self.chunk_size)
+                    self.written += len(rows)
+                    self.buffers[model] = []
+        self.pending = 0
+
+
+def _seed_user(plan, writer, index):
+    rng = random.Random(f"{plan.seed}:{index}")
+    user_id = plan.user_base + index
+    pks = {model: plan.first_pk(model, index) for model in MODELS}
+
+    def next_pk(model):
+        pks[model] += 1
+        return pks[model] - 1
+
+    for _ in range(plan.events):
+        event_date = plan.anchor + datetime.timedelta(days=rng.randint(-365, 180))
+        pledged = [rng.randrange(500, 50_000) * 100 for _ in range(plan.pledges)]
+        budget = max(sum(pledged) * rng.uniform(0.6, 1.4), 10_000_00)
+        event = Event(
+            pk=next_pk(Event), user_id=user_id, name=f"{rng.choice(LAST_NAMES)} {rng.choice(EVENT_KINDS)}",
+            venue=rng.choice(VENUES), description="", total_budget=_cents(int(budget)), event_date=event_date,
+            created_on=event_date - datetime.timedelta(days=rng.randint(30, 200)),
+        )
+        writer_rows = [event]
+        # no payment is dated after the event or in the future
+        last_day = min(event_date, plan.anchor)
+
+        # budget items stay within the event budget, tasks and providers within their item
+        for estimate in _split(rng, int(budget), plan.items, share=rng.uniform(0.6, 0.95)):
+            item = BudgetItem(pk=next_pk(BudgetItem), user_id=user_id, event_id=event.pk,
+                              category=rng.choice(CATEGORIES), estimated_budget=_cents(estimate))
+            writer_rows.append(item)
+
+            charges = [int(estimate * rng.uniform(0.5, 1.0)) for _ in range(plan.providers)]
+            # VendorPayment.clean() caps the item's paid total at the charging provider's amount
+            paid = _split(rng, min(charges, default=0), plan.providers * plan.vendor_payments, share=rng.uniform(0.1, 1.0))
+            for p, charge in enumerate(charges):
+                provider = ServiceProvider(
+                    pk=next_pk(ServiceProvider), user_id=user_id, budget_item_id=item.pk,
+                    service_type=rng.choice(SERVICE_TYPES), name=f"{rng.choice(LAST_NAMES)} {item.category} {p + 1}",
+                    phone_number=_phone(rng), amount_charged=_cents(charge),
+                )
+                writer_rows.append(provider)
+                for v in range(plan.vendor_payments):
+                    pk = next_pk(VendorPayment)
+                    writer_rows.append(VendorPayment(
+                        pk=pk, user_id=user_id, budget_item_id=item.pk, service_provider_id=provider.pk,
+                        payment_method=rng.choice(PAYMENT_METHODS), transaction_code=f"BV{pk}",
+                        amount=_cents(paid[p * plan.vendor_payments + v]), confirmed=rng.random() < 0.7,
+                        date_paid=_aware(last_day - datetime.timedelta(days=rng.randint(0, 60)), rng),
+                    ))
+            item.is_funded = sum(paid) >= estimate
+
+            for allocated in _split(rng, estimate, plan.tasks, share=rng.uniform(0.5, 0.95)):
+                writer_rows.append(Task(
+                    pk=next_pk(Task), user_id=user_id, budget_item_id=item.pk,
+                    title=f"{rng.choice(['Book', 'Confirm', 'Pay', 'Collect', 'Follow up'])} {item.category.lower()}",
+                    allocated_amount=_cents(allocated), amount_paid=_cents(int(allocated * rng.random())),
+                ))
+
+        received = 0
+        for amount in pledged:
+            pledge = Pledge(pk=next_pk(Pledge), user_id=user_id, event_id=event.pk,
+                            amount_pledged=_cents(amount), name=_person(rng), phone_number=_phone(rng))
+            writer_rows.append(pledge)
+            # some pledgers overpay, most pay part, a few barely start
+            payments = _split(rng, amount, plan.mpesa + plan.manual, share=rng.choice([1.1, 1.0, 0.7, 0.4, 0.05]))
+            for n, paid in enumerate(payments):
+                day = last_day - datetime.timedelta(days=rng.randint(0, 90))
+                if n < plan.mpesa:
+                    pk = next_pk(MpesaPayment)
+                    writer_rows.append(MpesaPayment(pk=pk, user_id=user_id, event_id=event.pk, pledge_id=pledge.pk,
+                                                    amount=_cents(paid), transaction_id=f"BM{pk}",
+                                                    timestamp=_aware(day, rng)))
+                else:
+                    writer_rows.append(ManualPayment(pk=next_pk(ManualPayment), user_id=user_id, event_id=event.pk,
+                                                     pledge_id=pledge.pk, amount=_cents(paid), date=day))
+            pledge.total_paid = _cents(sum(payments))
+            pledge.is_fulfilled = sum(payments) >= amount
+            received += sum(payments)
+        event.is_funded = received >= int(budget)
+
+        for row in writer_rows:
+            writer.add(row)
+
+
+def _seed_users(args):
+    """Worker entry point: generate and insert every row for users [start, stop)."""
+    plan, start, stop = args
+    writer = _Writer(plan.chunk_size)
+    with backdating():
+        for index in range(start, stop):
+            _seed_user(plan, writer, index)
+        writer.flush()
+    return stop - start, writer.written
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate deterministic benchmark data: users with events, budget items, service providers, "
+        "vendor payments, tasks, pledges and M-Pesa and manual payments that pass every clean() check. "
+        "Primary keys are reserved above the current maximum, so don't run it against a database taking writes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=10)
+        parser.add_argument("--events-per-user", type=int, default=5)
+        parser.add_argument("--items-per-event", type=int, default=8)
+        parser.add_argument("--providers-per-item", type=int, default=2)
+        parser.add_argument("--vendor-payments-per-provider", type=int, default=2)
+        parser.add_argument("--tasks-per-item", type=int, default=3)
+        parser.add_argument("--pledges-per-event", type=int, default=200)
+        parser.add_argument("--mpesa-per-pledge", type=int, default=2)
+        parser.add_argument("--manual-per-pledge", type=int, default=1)
+        parser.add_argument("--seed", type=int, default=0, help="Same seed and anchor date, same data.")
+        parser.add_argument(
+            "--anchor-date", type=datetime.date.fromisoformat, default=None,
+            help="Date the data is generated around (YYYY-MM-DD, default today).",
+        )
+        parser.add_argument("--workers", type=int, default=multiprocessing.cpu_count())
+        parser.add_argument("--chunk-size", type=int, default=5000, help="Rows per bulk insert transaction.")
+        parser.add_argument("--password", default="benchmark", help="Password for every generated user.")
+        parser.add_argument("--skip-derived", action="store_true",
+                            help="Don't rebuild the daily totals rollup and search index afterwards.")
+
+    def handle(self, *args, **options):
+        users = options["users"]
+        if users < 1 or options["chunk_size"] < 1:
+            raise CommandError("--users and --chunk-size must be positive.")
+        options["anchor_date"] = options["anchor_date"] or timezone.localdate()
+        prefix = f"bench{options['seed']}_"
+        if User.objects.filter(username__startswith=prefix).exists():
+            raise CommandError(f"Benchmark users for seed {options['seed']} already exist; use another --seed.")
+
+        bases = {
+            model: (model.objects.aggregate(top=Max("pk"))["top"] or 0) + 1
+            for model in [User, *MODELS]
+        }
+        plan = Plan(options, bases)
+        started = time.monotonic()
+
+        password = make_password(options["password"])  # hashed once, shared by every user
+        with transaction.atomic():
+            User.objects.bulk_create([
+                User(pk=plan.user_base + i, username=f"{prefix}{i}", email=f"{prefix}{i}@example.com",
+                     password=password)
+                for i in range(users)
+            ], batch_size=options["chunk_size"])
+            UserSettings.objects.bulk_create([
+                UserSettings(user_id=plan.user_base + i) for i in range(users)
+            ], batch_size=options["chunk_size"])
+
+        workers = max(1, min(options["workers"], users))
+        step = max(1, math.ceil(users / (workers * 4)))
+        units = [(plan, start, min(start + step, users)) for start in range(0, users, step)]
+        done = rows = 0
+
+        if workers == 1:
+            results = map(_seed_users, units)
+        else:
+            # forked children must not share the parent's database connections
+            connections.close_all()
+            pool = multiprocessing.get_context("fork").Pool(workers)
+            results = pool.imap_unordered(_seed_users, units)
+        try:
+            for seeded, written in results:
+                done += seeded
+                rows += written
+                self.stdout.write(f"{done}/{users} users, {rows} rows ({time.monotonic() - started:.1f}s)")
+        finally:
+            if workers > 1:
+                pool.close()
+                pool.join()
+
+        if not options["skip_derived"]:
+            first_event = plan.bases[Event]
+            event_ids = range(first_event, first_event + users * plan.per_user[Event])
+            buckets = 0
+            for start in range(0, len(event_ids), 1000):
+                buckets += rebuild_daily_totals(event_ids=list(event_ids[start:start + 1000]))
+            self.stdout.write(f"Rebuilt {buckets} daily totals ({time.monotonic() - started:.1f}s)")
+            trigrams = rebuild_index(user_ids=list(range(plan.user_base, plan.user_base + users)))
+            self.stdout.write(f"Indexed {trigrams} search trigrams ({time.monotonic() - started:.1f}s)")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {users} users and {rows} rows in {time.monotonic() - started:.1f}s "
+            f"(seed {options['seed']}, anchor {options['anchor_date']})."
+        ))
@@ -0,0 +1,95 @@
+import json
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from budgetapp.recompute import CHUNK_SIZE, DERIVED, discrepancies, id_ranges, repair
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare stored derived fields (pledge total_paid/is_fulfilled, event and budget item is_funded) with "
+        "the aggregates recomputed from the payments, one primary-key chunk per query. Progress is kept in a "
+        "state file so an interrupted run resumes where it stopped. Exits non-zero on unrepaired drift."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--kind", action="append", dest="kinds", choices=list(DERIVED),
+            help="Only verify this kind (can be repeated). Defaults to all.",
+        )
+        parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="Primary keys per query.")
+        parser.add_argument("--repair", action="store_true", help="Rewrite drifted rows with the recomputed values.")
+        parser.add_argument(
+            "--state-file", default=str(settings.BASE_DIR / "verify_totals.state.json"),
+            help="Where progress is kept between runs; removed once a run completes.",
+        )
+        parser.add_argument("--restart", action="store_true", help="Ignore saved progress and start from the top.")
+        parser.add_argument("--report", help="Append every discrepancy to this file as JSON lines.")
+        parser.add_argument("--show", type=int, default=20, help="Discrepancies to print (the rest are counted).")
+
+    def handle(self, *args, **options):
+        if options["chunk_size"] < 1:
+            raise CommandError("--chunk-size must be positive.")
+        kinds = options["kinds"] or list(DERIVED)
+        state_file = options["state_file"]
+        state = self.load_state(state_file, kinds, options["restart"])
+        started = time.monotonic()
+
+        for kind in kinds:
+            resume_at = state["next"].get(kind)
+            if resume_at is not None:
+                self.stdout.write(f"Resuming {kind} at id {resume_at}.")
+            for low, high in id_ranges(DERIVED[kind][0], options["chunk_size"]):
+                if resume_at is not None and high <= resume_at:
+                    continue
+                found = discrepancies(kind, id_range=(max(low, resume_at or low), high))
+                self.record(found, state, options)
+                if found and options["repair"]:
+                    repair(kind, [(row["id"], row["event"]) for row in found])
+                    state["repaired"] += len(found)
+                state["next"][kind] = high
+                self.save_state(state_file, state)
+                if options["verbosity"] > 1:
+                    self.stdout.write(f"{kind} {low}-{high - 1}: {len(found)} drifted")
+
+        # a finished run leaves nothing to resume
+        if os.path.exists(state_file):
+            os.remove(state_file)
+
+        found, repaired = state["found"], state["repaired"]
+        summary = f"{found} discrepancies, {repaired} repaired, in {time.monotonic() - started:.1f}s."
+        if found > repaired:
+            raise CommandError(summary)
+        self.stdout.write(self.style.SUCCESS(summary))
+
+    def load_state(self, path, kinds, restart):
+        if not restart and os.path.exists(path):
+            with open(path) as f:
+                state = json.load(f)
+            if state.get("kinds") == kinds:
+                return state
+            self.stderr.write(f"Ignoring {path}: it was written for --kind {', '.join(state.get('kinds') or [])}.")
+        return {"kinds": kinds, "next": {}, "found": 0, "repaired": 0}
+
+    def save_state(self, path, state):
+        # replaced in one step so an interrupted write never leaves a truncated file
+        with open(f"{path}.tmp", "w") as f:
+            json.dump(state, f)
+        os.replace(f"{path}.tmp", path)
+
+    def record(self, found, state, options):
+        for row in found:
+            if state["found"] < options["show"]:
+                stored = ", ".join(f"{name}={value}" for name, value in row["stored"].items())
+                expected = ", ".join(f"{name}={value}" for name, value in row["expected"].items())
+                self.stdout.write(self.style.WARNING(
+                    f"{row['kind']} {row['id']} (event {row['event']}): stored {stored}, expected {expected}"
+                ))
+            state["found"] += 1
+        if found and options["report"]:
+            with open(options["report"], "a") as f:
+                for row in found:
+                    f.write(json.dumps(row, default=str) + "\n")
@@ -0,0 +1,265 @@
+# metrics.py
+import functools
+import logging
+import threading
+import time
+
+from django.conf import settings
+
+
+logger = logging.getLogger(__name__)
+
+# Samples are buffered per process and pushed to Redis at most this often (seconds)
+FLUSH_INTERVAL = 1.0
+REDIS_KEY = "metrics:v1"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 250)
+SIGNAL_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names, values):
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+def _format(value):
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class LocalBackend:
+    """Keeps samples in this process only: for tests and single-process runs without Redis."""
+
+    def __init__(self):
+        self.values = {}
+
+    def add(self, increments):
+        for field, amount in increments.items():
+            self.values[field] = self.values.get(field, 0) + amount
+
+    def snapshot(self):
+        return dict(self.values)
+
+    def clear(self):
+        self.values.clear()
+
+
+class RedisBackend:
+    """All workers add into one Redis hash, so a scrape of any worker sees every worker's samples."""
+
+    def __init__(self):
+        from django_redis import get_redis_connection
+        self.redis = get_redis_connection("default")
+
+    def add(self, increments):
+        pipe = self.redis.pipeline(transaction=False)
+        for field, amount in increments.items():
+            pipe.hincrbyfloat(REDIS_KEY, field, amount)
+        pipe.execute()
+
+    def snapshot(self):
+        return {
+            (field.decode() if isinstance(field, bytes) else field): float(value)
+            for field, value in self.redis.hgetall(REDIS_KEY).items()
+        }
+
+    def clear(self):
+        self.redis.delete(REDIS_KEY)
+
+
+class Registry:
+    """
+    Counters and histograms rendered in the Prometheus text format.
+
+    Updates only touch an in-process dict; it is pushed to the backend in one
+    pipeline at most every FLUSH_INTERVAL seconds (and before every scrape), so
+    recording a request costs a few dict updates rather than a Redis round trip.
+    """
+
+    def __init__(self):
+        self.families = {}
+        self.collectors = []
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.last_flush = time.monotonic()
+        self._backend = None
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            if "django_redis" in settings.CACHES["default"]["BACKEND"]:
+                self._backend = RedisBackend()
+            else:
+                self._backend = LocalBackend()
+        return self._backend
+
+    def register(self, metric):
+        self.families[metric.name] = metric
+        return metric
+
+    def register_collector(self, collector):
+        """`collector()` returns exposition lines computed at scrape time, e.g. gauges read from the database."""
+        self.collectors.append(collector)
+        return collector
+
+    def add(self, family, sample, amount):
+        field = f"{family}\t{sample}"
+        with self.lock:
+            self.pending[field] = self.pending.get(field, 0) + amount
+            due = time.monotonic() - self.last_flush >= FLUSH_INTERVAL
+        if due:
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            pending, self.pending = self.pending, {}
+            self.last_flush = time.monotonic()
+        if not pending:
+            return
+        try:
+            self.backend.add(pending)
+        except Exception as e:
+            logger.warning(f"Could not flush metrics, keeping them for the next flush: {e}")
+            with self.lock:
+                for field, amount in pending.items():
+                    self.pending[field] = self.pending.get(field, 0) + amount
+
+    def render(self):
+        self.flush()
+        samples = {}
+        for field, value in self.backend.snapshot().items():
+            family, sample = field.split("\t", 1)
+            samples.setdefault(family, []).append((sample, value))
+
+        lines = []
+        for name, metric in self.families.items():
+            lines.append(f"# HELP {name} {metric.help}")
+            lines.append(f"# TYPE {name} {metric.type}")
+            lines.extend(f"{sample} {_format(value)}" for sample, value in metric.order(samples.get(name, [])))
+        lines.extend(_derived(samples))
+        for collector in self.collectors:
+            try:
+                lines.extend(collector())
+            except Exception as e:
+                logger.warning(f"Metrics collector {collector.__name__} failed: {e}")
+        return "\n".join(lines) + "\n"
+
+    def clear(self):
+        with self.lock:
+            self.pending = {}
+        self.backend.clear()
+
+
+class Counter:
+    type = "counter"
+
+    def __init__(self, registry, name, help, labelnames=()):
+        self.registry, self.name, self.help, self.labelnames = registry, name, help, tuple(labelnames)
+        registry.register(self)
+
+    def inc(self, *labelvalues, amount=1):
+        self.registry.add(self.name, f"{self.name}{_labels(self.labelnames, labelvalues)}", amount)
+
+    def order(self, samples):
+        return sorted(samples)
+
+
+class Histogram:
+    type = "histogram"
+
+    def __init__(self, registry, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.registry, self.name, self.help, self.labelnames = registry, name, help, tuple(labelnames)
+        self.buckets = tuple(buckets)
+        registry.register(self)
+
+    def observe(self, value, *labelvalues):
+        names = self.labelnames + ("le",)
+        # buckets are stored cumulatively, as the exposition format expects
+        for bound in self.buckets:
+            if value <= bound:
+                self.registry.add(self.name, f"{self.name}_bucket{_labels(names, labelvalues + (bound,))}", 1)
+        self.registry.add(self.name, f"{self.name}_bucket{_labels(names, labelvalues + ('+Inf',))}", 1)
+        labels = _labels(self.labelnames, labelvalues)
+        self.registry.add(self.name, f"{self.name}_sum{labels}", value)
+        self.registry.add(self.name, f"{self.name}_count{labels}", 1)
+
+    def order(self, samples):
+        # a bucket that was never hit has no field yet; Prometheus needs every bucket of a series
+        by_series = {}
+        for sample, value in samples:
+            by_series[sample] = value
+        count = f"{self.name}_count"
+        series = {sample[len(count):] for sample in by_series if sample.startswith(count)}
+        ordered = []
+        for labels in sorted(series):
+            prefix = labels[:-1] + "," if labels else "{"
+            for bound in self.buckets + ("+Inf",):
+                key = f"{self.name}_bucket{prefix}le=\"{bound}\"}}"
+                ordered.append((key, by_series.get(key, 0)))
+            ordered.append((f"{self.name}_sum{labels}", by_series.get(f"{self.name}_sum{labels}", 0)))
+            ordered.append((f"{count}{labels}", by_series[f"{count}{labels}"]))
+        return ordered
+
+
+registry = Registry()
+
+requests_total = Counter(registry, "budget_http_requests_total", "Requests handled, by view, method and status.",
+                         ("view", "method", "status"))
+request_duration = Histogram(registry, "budget_http_request_duration_seconds", "Request wall time by view.",
+                             ("view",), LATENCY_BUCKETS)
+request_queries = Histogram(registry, "budget_http_request_db_queries", "Database queries per request by view.",
+                            ("view",), QUERY_BUCKETS)
+request_db_duration = Histogram(registry, "budget_http_request_db_seconds", "Database time per request by view.",
+                                ("view",), LATENCY_BUCKETS)
+throttled_total = Counter(registry, "budget_http_throttled_total", "Requests rejected by a throttle (429).",
+                          ("view",))
+cache_total = Counter(registry, "budget_cache_requests_total", "Cached payload lookups, by result.", ("result",))
+signal_duration = Histogram(registry, "budget_signal_handler_duration_seconds", "Signal receiver run time.",
+                            ("handler",), SIGNAL_BUCKETS)
+
+
+def _derived(samples):
+    """Gauges computed from other families at scrape time."""
+    totals = {sample: value for sample, value in samples.get(cache_total.name, [])}
+    hits = totals.get(f'{cache_total.name}{{result="hit"}}', 0)
+    misses = totals.get(f'{cache_total.name}{{result="miss"}}', 0)
+    if not hits + misses:
+        return []
+    return [
+        "# HELP budget_cache_hit_ratio Share of cached payload lookups served from cache.",
+        "# TYPE budget_cache_hit_ratio gauge",
+        f"budget_cache_hit_ratio {_format(round(hits / (hits + misses), 6))}",
+    ]
+
+
+def observe_request(view, method, status, duration, request_metrics):
+    """Record one finished request; called by ServerTimingMiddleware."""
+    requests_total.inc(view, method, status)
+    request_duration.observe(duration, view)
+    request_queries.observe(request_metrics.db_queries, view)
+    request_db_duration.observe(request_metrics.db_time, view)
+    if status == 429:
+        throttled_total.inc(view)
+    if request_metrics.cache_hits:
+        cache_total.inc("hit", amount=request_metrics.cache_hits)
+    if request_metrics.cache_misses:
+        cache_total.inc("miss", amount=request_metrics.cache_misses)
+
+
+def timed_handler(func):
+    """Record a signal receiver's run time; put it below @receiver."""
+    handler = f"{func.__module__}.{func.__name__}"
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            signal_duration.observe(time.perf_counter() - started, handler)
+    return wrapper
@@ -1,12 +1,179 @@
 # core/middleware.py
 
+import logging
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
 from django.utils.deprecation import MiddlewareMixin
 
+from . import db_router, instrumentation, profiling, querywatch
+from .metrics import observe_request
+
+
+timing_logger = logging.getLogger("budgetapp.timing")
+
+
 class NoCacheMiddleware(MiddlewareMixin):
     def process_response(self, request, response):
-        # Only disable caching for API routes
-        if request.path.startswith("/api/"):
+        # Only disable caching for API routes, and leave views that set their own policy alone
+        if request.path.startswith("/api/") and not response.has_header("Cache-Control"):
             response["Cache-Control"] = "no-store, no-cache, must-revalidate, max-age=0"
             response["Pragma"] = "no-cache"
             response["Expires"] = "0"
         return response
+
+
+class ServerTimingMiddleware:
+    """
+    Times every request and reports where the time went: total, database
+    (query count and time), cached payloads (hits/misses) and response rendering.
+
+    The numbers go out as a `Server-Timing` header (shown in the browser's network
+    panel; disable with SERVER_TIMING_HEADER = False) and as one key=value log line
+    per request on the `budgetapp.timing` logger, tagged with the view name, and
+    are added to the cross-worker metrics served at /api/metrics/.
+    Should be first in MIDDLEWARE so the total covers the other middleware too.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.emit_header = getattr(settings, "SERVER_TIMING_HEADER", True)
+
+    def __call__(self, request):
+        metrics, token = instrumentation.start()
+        try:
+            with ExitStack() as stack:
+                for conn in connections.all():
+                    stack.enter_context(conn.execute_wrapper(metrics))
+                response = self.get_response(request)
+        finally:
+            instrumentation.stop(token)
+
+        total = metrics.elapsed
+        if self.emit_header:
+            response["Server-Timing"] = (
+                f'db;dur={metrics.db_time * 1000:.1f};desc="{metrics.db_queries} queries", '
+                f'cache;desc="{metrics.cache_hits} hits {metrics.cache_misses} misses", '
+                f"render;dur={metrics.render_time * 1000:.1f}, "
+                f"total;dur={total * 1000:.1f}"
+            )
+        match = request.resolver_match
+        view = (match.view_name or match.route) if match else "-"
+        observe_request(view, request.method, response.status_code, total, metrics)
+        timing_logger.info(
+            "view=%s method=%s status=%s total_ms=%.1f db_queries=%d db_ms=%.1f "
+            "cache_hits=%d cache_misses=%d render_ms=%.1f",
+            view, request.method, response.status_code,
+            total * 1000, metrics.db_queries, metrics.db_time * 1000,
+            metrics.cache_hits, metrics.cache_misses, metrics.render_time * 1000,
+        )
+        return response
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered (serialized to JSON) after the view returns
+        metrics = instrumentation.current()
+        if metrics is not None:
+            metrics.render_started = time.perf_counter()
+            response.add_post_render_callback(self._rendered)
+        return response
+
+    @staticmethod
+    def _rendered(response):
+        metrics = instrumentation.current()
+        if metrics is not None and metrics.render_started is not None:
+            metrics.render_time += time.perf_counter() - metrics.render_started
+
+
+class ProfilingMiddleware:
+    """
+    Profiles a single request when it carries a token from /api/profiling/token/,
+    in the X-Profile-Token header or the `_profile` query parameter.
+
+    Tokens are signed, short-lived and single-use, and only one request per
+    PROFILE_MIN_INTERVAL seconds is profiled across all workers. Requests that
+    can't be profiled are still served normally; `X-Profile` says why.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = request.headers.get("X-Profile-Token") or request.GET.get("_profile")
+        if not token:
+            return self.get_response(request)
+
+        # the token is only used up once there is a slot, so a rate-limited request can be retried with it
+        payload = profiling.check_token(token)
+        if payload is None:
+            outcome = "invalid"
+        elif not profiling.acquire_slot():
+            outcome = "rate-limited"
+        elif not profiling.redeem_token(payload):
+            profiling.release_slot()
+            outcome = "invalid"
+        else:
+            response, profiler, timeline, elapsed = profiling.profile_request(self.get_response, request)
+            response["X-Profile"] = profiling.save(request, response, profiler, timeline, elapsed, payload["user"])
+            return response
+
+        response = self.get_response(request)
+        response["X-Profile"] = outcome
+        return response
+
+
+class QueryWatchMiddleware:
+    """
+    Development/staging aid: reports requests that repeat a query shape (N+1)
+    or run slow queries, with the originating app frames and EXPLAIN plans.
+    Only loaded when QUERYWATCH_ENABLED; with QUERYWATCH_RAISE the request
+    fails instead, which turns any N+1 hit by the test suite into a failure.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, "QUERYWATCH_ENABLED", False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        watcher = querywatch.QueryWatcher()
+        with watcher.watching():
+            response = self.get_response(request)
+        report = watcher.report(explain=False)
+        if not querywatch.has_violations(report):
+            return response
+
+        report = watcher.report()
+        querywatch.emit(request, report)
+        if getattr(settings, "QUERYWATCH_RAISE", False):
+            raise querywatch.QueryWatchViolation(querywatch.format_report(report))
+        response["X-Query-Watch"] = f"repeated={len(report['repeated'])} slow={len(report['slow'])}"
+        return response
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Lets safe requests (GET/HEAD/OPTIONS) read from the replicas in
+    REPLICA_DATABASES, except for clients that wrote in the last
+    REPLICA_PIN_SECONDS: a successful unsafe request pins its client to the
+    primary so it reads its own writes. Only loaded when replicas are configured.
+    """
+
+    def __init__(self, get_response):
+        if not db_router.replicas():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        identity = db_router.client_identity(request)
+        safe = request.method in ("GET", "HEAD", "OPTIONS")
+        state, token = db_router.start(safe and not db_router.is_pinned(identity))
+        try:
+            response = self.get_response(request)
+        finally:
+            db_router.stop(token)
+        if (not safe or state.wrote) and response.status_code < 400:
+            db_router.pin(identity)
+        return response
@@ -3,7 +3,8 @@ from django.conf import settings
 from django.contrib.auth.models import User
 from django.utils import timezone
 from django.core.exceptions import ValidationError
-from django.db.models import Sum
+from django.core.validators import MaxValueValidator
+from django.db.models import OuterRef, Subquery, Sum
 from django.db import transaction
 import logging
 
@@ -26,7 +27,84 @@ class UserSettings(models.Model):
         return f"Settings for {self.user.username}"
 
 
-class Event(models.Model):
+def _sum_of(model, fk, field, outer="pk"):
+    """Correlated SUM(`field`) over the `model` rows pointing at the outer row's `outer` (NULL when none)."""
+    return Subquery(
+        model.objects.filter(**{fk: OuterRef(outer)}).order_by().values(fk)
+        .annotate(total=Sum(field)).values("total")[:1]
+    )
+
+
+class VersionConflict(Exception):
+    """The row changed (or was deleted) since the instance being saved was read."""
+
+
+class VersionedModel(models.Model):
+    """
+    Optimistic concurrency: full saves of an existing row only succeed if its
+    `version` is still the one that was read, checked and bumped by the UPDATE
+    itself (`... WHERE id = %s AND version = %s`), so editors never lock rows.
+    Saves of derived fields with `update_fields` (is_funded, total_paid, ...)
+    neither check nor bump it.
+    """
+    version = models.PositiveIntegerField(default=1, editable=False)
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        self._expected_version = None
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            self._expected_version = self.version
+            self.version += 1
+        try:
+            super().save(*args, **kwargs)
+        except Exception:
+            if self._expected_version is not None:
+                self.version = self._expected_version
+            raise
+        finally:
+            self._expected_version = None
+
+    def _do_update(self, base_qs, using, pk_val, values, update_fields, forced_update):
+        if getattr(self, '_expected_version', None) is None:
+            return super()._do_update(base_qs, using, pk_val, values, update_fields, forced_update)
+        if not super()._do_update(base_qs.filter(version=self._expected_version), using, pk_val, values,
+                                  update_fields, forced_update):
+            raise VersionConflict(f"{self._meta.object_name} {pk_val} is no longer at version {self._expected_version}")
+        return True
+
+
+class EventQuerySet(models.QuerySet):
+    def with_totals(self):
+        """
+        Annotate pledge and payment totals so the money methods on each event
+        don't run their own aggregates (one query for a whole list).
+        """
+        return self.annotate(
+            _total_pledged=_sum_of(Pledge, "event", "amount_pledged"),
+            _total_mpesa=_sum_of(MpesaPayment, "event", "amount"),
+            _total_manual=_sum_of(ManualPayment, "event", "amount"),
+        )
+
+
+class BudgetItemQuerySet(models.QuerySet):
+    def with_totals(self):
+        return self.annotate(_total_vendor_payments=_sum_of(VendorPayment, "budget_item", "amount"))
+
+
+class ServiceProviderQuerySet(models.QuerySet):
+    def with_totals(self):
+        return self.annotate(_total_received=_sum_of(VendorPayment, "service_provider", "amount"))
+
+
+class VendorPaymentQuerySet(models.QuerySet):
+    def with_totals(self):
+        """Annotate what has been paid against each payment's budget item overall."""
+        return self.annotate(_item_total_paid=_sum_of(VendorPayment, "budget_item", "amount", outer="budget_item"))
+
+
+class Event(VersionedModel):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="events", db_index=True)
     name = models.CharField(max_length=255, db_index=True)
     venue = models.CharField(max_length=55, db_index=True, blank=True, null=True)
@@ -40,10 +118,24 @@ class Event(models.Model):
     event_date = models.DateField(db_index=True)
     created_on = models.DateField(default=timezone.now)
     is_funded = models.BooleanField(default=False)
+    # Unguessable token of the public progress page; None while the event isn't shared
+    public_token = models.CharField(max_length=43, unique=True, null=True, blank=True, editable=False)
+    public_top_contributors = models.PositiveSmallIntegerField(
+        default=0,
+        validators=[MaxValueValidator(20)],
+        help_text="Largest contributors listed on the public progress page (0 hides the list)",
+    )
+
+    objects = EventQuerySet.as_manager()
         
 
     def save(self, *args, **kwargs):
-        self.full_clean()  # Ensures validation is applied
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None:
+            self.full_clean()  # Ensures validation is applied
+        else:
+            # partial saves (e.g. is_funded) only validate the fields they write
+            self.full_clean(exclude=[f.name for f in self._meta.fields if f.name not in update_fields])
         super().save(*args, **kwargs)  
 
 
@@ -53,9 +145,13 @@ class Event(models.Model):
 
 
     def total_pledged(self):
+        if hasattr(self, '_total_pledged'):
+            return self._total_pledged or 0
         return self.pledges.aggregate(total=models.Sum('amount_pledged'))['total'] or 0
 
     def total_received(self):
+        if hasattr(self, '_total_mpesa'):
+            return (self._total_mpesa or 0) + (self._total_manual or 0)
         total_mpesa = self.mpesa_payments.aggregate(total=models.Sum('amount'))['total'] or 0
         total_manual = self.manual_payments.aggregate(total=models.Sum('amount'))['total'] or 0
         return total_mpesa + total_manual
@@ -102,21 +198,35 @@ class Event(models.Model):
 
     class Meta:
         ordering = ['-event_date']
+        indexes = [
+            models.Index(fields=['user', 'event_date'], name='event_user_date'),
+            models.Index(fields=['user', 'is_funded', 'event_date'], name='event_user_funded_date'),
+            models.Index(fields=['user', 'total_budget'], name='event_user_budget'),
+        ]
 
 
-class BudgetItem(models.Model):
+class BudgetItem(VersionedModel):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="budget_items", db_index=True)
     event = models.ForeignKey(Event, on_delete=models.PROTECT, related_name="budget_items", db_index=True, null=True, blank=True)
     category = models.CharField(max_length=255, db_index=True)
     estimated_budget = models.DecimalField(max_digits=12, decimal_places=2)
     is_funded = models.BooleanField(default=False)
 
+    objects = BudgetItemQuerySet.as_manager()
+
 
     class Meta:
         ordering = ['category']
+        indexes = [
+            models.Index(fields=['user', 'event', 'is_funded'], name='budgetitem_user_event_funded'),
+            models.Index(fields=['user', 'is_funded'], name='budgetitem_user_funded'),
+            models.Index(fields=['user', 'estimated_budget'], name='budgetitem_user_estimate'),
+        ]
 
     @property
     def total_vendor_payments(self):
+        if hasattr(self, '_total_vendor_payments'):
+            return self._total_vendor_payments or 0
         return self.payments.aggregate(total=models.Sum('amount'))['total'] or 0
 
     @property
@@ -170,14 +280,22 @@ class ServiceProvider(models.Model):
     email = models.EmailField(blank=True, null=True, db_index=True)
     amount_charged = models.DecimalField(max_digits=10, decimal_places=2, default=0)
 
+    objects = ServiceProviderQuerySet.as_manager()
+
 
     class Meta:
         ordering = ['name']
         unique_together = ('budget_item', 'name', 'phone_number')
+        indexes = [
+            models.Index(fields=['user', 'budget_item', 'name'], name='provider_user_item_name'),
+            models.Index(fields=['user', 'service_type', 'name'], name='provider_user_type_name'),
+        ]
 
 
     @property
     def total_received(self):
+        if hasattr(self, '_total_received'):
+            return self._total_received or 0
         return self.payments.aggregate(total=models.Sum('amount'))['total'] or 0
 
     @property
@@ -212,16 +330,26 @@ class VendorPayment(models.Model):
     date_paid = models.DateTimeField(auto_now_add=True)
     amount = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
     confirmed = models.BooleanField(default=False)  
-    
+
+    objects = VendorPaymentQuerySet.as_manager()
 
 
     class Meta:
         ordering = ['-date_paid']
         unique_together = ('service_provider', 'transaction_code')
+        indexes = [
+            models.Index(fields=['user', 'budget_item', 'date_paid'], name='vendorpay_user_item_date'),
+            models.Index(fields=['user', 'service_provider', 'date_paid'], name='vendorpay_user_provider_date'),
+            models.Index(fields=['user', 'confirmed', 'date_paid'], name='vendorpay_user_confirmed_date'),
+            models.Index(fields=['user', 'date_paid'], name='vendorpay_user_date'),
+            models.Index(fields=['user', 'amount'], name='vendorpay_user_amount'),
+        ]
 
 
     @property
     def total_paid(self):
+        if hasattr(self, '_item_total_paid'):
+            return self._item_total_paid or 0
         return self.budget_item.total_vendor_payments
 
     
@@ -264,6 +392,9 @@ class Task(models.Model):
 
     class Meta:
         ordering = ['title']
+        indexes = [
+            models.Index(fields=['user', 'budget_item', 'title'], name='task_user_item_title'),
+        ]
         
     def clean(self):
         if self.allocated_amount < 0:
@@ -299,7 +430,7 @@ class Task(models.Model):
         return f"{self.title} - KES {self.allocated_amount} ({self.budget_item.category})"
 
 
-class Pledge(models.Model):
+class Pledge(VersionedModel):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="pledges", db_index=True)
     event = models.ForeignKey(Event, on_delete=models.PROTECT, related_name="pledges", db_index=True, null=True, blank=True)
     amount_pledged = models.DecimalField(max_digits=10, decimal_places=2)
@@ -311,6 +442,11 @@ class Pledge(models.Model):
 
     class Meta:
         ordering = ['-id']
+        indexes = [
+            models.Index(fields=['user', 'event', 'is_fulfilled'], name='pledge_user_event_fulfilled'),
+            models.Index(fields=['user', 'is_fulfilled'], name='pledge_user_fulfilled'),
+            models.Index(fields=['user', 'amount_pledged'], name='pledge_user_amount'),
+        ]
         
 
     def balance(self):
@@ -352,6 +488,10 @@ class MpesaPayment(models.Model):
         indexes = [
             models.Index(fields=['transaction_id']),
             models.Index(fields=['timestamp']),
+            models.Index(fields=['user', 'event', 'timestamp'], name='mpesa_user_event_time'),
+            models.Index(fields=['user', 'pledge', 'timestamp'], name='mpesa_user_pledge_time'),
+            models.Index(fields=['user', 'timestamp'], name='mpesa_user_time'),
+            models.Index(fields=['user', 'amount'], name='mpesa_user_amount'),
         ]
 
     def clean(self):
@@ -378,6 +518,10 @@ class ManualPayment(models.Model):
         ordering = ['-date']
         indexes = [
             models.Index(fields=['date']),
+            models.Index(fields=['user', 'event', 'date'], name='manual_user_event_date'),
+            models.Index(fields=['user', 'pledge', 'date'], name='manual_user_pledge_date'),
+            models.Index(fields=['user', 'date'], name='manual_user_date'),
+            models.Index(fields=['user', 'amount'], name='manual_user_amount'),
         ]
 
     def clean(self):
@@ -392,6 +536,86 @@ class ManualPayment(models.Model):
         return f"Manual Payment - KES {self.amount} on {self.date}"
 
 
+class DailyEventTotals(models.Model):
+    """
+    Per event, per day, per channel payment totals for time-series charts.
+    Maintained by the payment signals and rebuildable with `rebuild_daily_totals`.
+    """
+    CHANNEL_MPESA = "mpesa"
+    CHANNEL_MANUAL = "manual"
+    CHANNEL_CHOICES = [(CHANNEL_MPESA, "Mpesa"), (CHANNEL_MANUAL, "Manual")]
+
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name="daily_totals")
+    day = models.DateField()
+    channel = models.CharField(max_length=10, choices=CHANNEL_CHOICES)
+    total_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    payment_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['event', 'day', 'channel']
+        unique_together = ('event', 'day', 'channel')
+        verbose_name_plural = "Daily event totals"
+
+    def __str__(self):
+        return f"{self.event_id} {self.day} {self.channel} - KES {self.total_amount}"
+
+
+class SearchTrigram(models.Model):
+    """
+    Trigram search index over pledges, service providers, events and budget items.
+    One row per distinct trigram per indexed object, maintained by signals in
+    `budgetapp.search`.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="+", db_index=False)
+    kind = models.CharField(max_length=20)
+    object_id = models.PositiveBigIntegerField()
+    trigram = models.CharField(max_length=3)
+    weight = models.PositiveSmallIntegerField(default=1)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'trigram', 'kind', 'object_id'], name='search_trigram_lookup'),
+            models.Index(fields=['kind', 'object_id'], name='search_trigram_object'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind}:{self.object_id} '{self.trigram}'"
+
+
+class Job(models.Model):
+    """
+    Deferred work for the `run_jobs` worker, see `budgetapp.jobs`. Rows are
+    inserted in the same transaction as the write that caused them and deleted
+    once they succeed; failed jobs stay for inspection in the admin.
+    """
+    QUEUED = "queued"
+    RUNNING = "running"
+    FAILED = "failed"
+    STATUS_CHOICES = [(QUEUED, "Queued"), (RUNNING, "Running"), (FAILED, "Failed")]
+
+    kind = models.CharField(max_length=50)
+    payload = models.JSONField(default=dict, blank=True)
+    # Unique while queued so repeated enqueues collapse; cleared when a worker claims the job
+    dedupe_key = models.CharField(max_length=200, unique=True, null=True, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    run_after = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['run_after', 'id']
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='job_claim'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} #{self.pk} ({self.status})"
+
+
 class MpesaInfo(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name="mpesa_info")
     paybill_number = models.CharField(max_length=20, blank=True, null=True)
@@ -0,0 +1,125 @@
+# profiling.py
+import cProfile
+import json
+import logging
+import os
+import time
+import uuid
+from contextlib import ExitStack
+from pathlib import Path
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.db import connections
+from django.utils import timezone
+
+
+logger = logging.getLogger(__name__)
+
+SALT = "budgetapp.profiling"
+# Longest SQL timeline kept in the sidecar; the pstats file still has every call
+MAX_TIMELINE = 1000
+
+
+def issue_token(user):
+    """Single-use token letting one request be profiled, signed for the issuing staff user."""
+    return signing.dumps({"user": user.pk, "nonce": uuid.uuid4().hex}, salt=SALT)
+
+
+def _used_key(payload):
+    return f"profiling:used:{payload['nonce']}"
+
+
+def check_token(token):
+    """Token payload, or None if it is forged, expired or was already used. Doesn't use it up."""
+    try:
+        payload = signing.loads(token, salt=SALT, max_age=settings.PROFILE_TOKEN_MAX_AGE)
+    except signing.BadSignature:
+        return None
+    if cache.get(_used_key(payload)) is not None:
+        return None
+    return payload
+
+
+def redeem_token(payload):
+    """Use up a checked token; False if a concurrent request got to it first."""
+    return cache.add(_used_key(payload), 1, settings.PROFILE_TOKEN_MAX_AGE)
+
+
+def acquire_slot():
+    """At most one profiled request per PROFILE_MIN_INTERVAL seconds across all workers."""
+    return cache.add("profiling:slot", 1, settings.PROFILE_MIN_INTERVAL)
+
+
+def release_slot():
+    cache.delete("profiling:slot")
+
+
+class SqlTimeline:
+    """`execute_wrapper` hook keeping when each query started, how long it took and its SQL."""
+
+    def __init__(self, started):
+        self.started = started
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        query_started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            if len(self.queries) < MAX_TIMELINE:
+                self.queries.append({
+                    "start_ms": round((query_started - self.started) * 1000, 3),
+                    "duration_ms": round((time.perf_counter() - query_started) * 1000, 3),
+                    "alias": context["connection"].alias,
+                    "sql": sql,
+                })
+
+
+def profile_request(get_response, request):
+    """Run the request under cProfile, recording its SQL as it goes."""
+    started = time.perf_counter()
+    timeline = SqlTimeline(started)
+    profiler = cProfile.Profile()
+    with ExitStack() as stack:
+        for conn in connections.all():
+            stack.enter_context(conn.execute_wrapper(timeline))
+        response = profiler.runcall(get_response, request)
+    return response, profiler, timeline, time.perf_counter() - started
+
+
+def save(request, response, profiler, timeline, elapsed, user_id):
+    """Write `<name>.pstats` and a `<name>.json` sidecar to PROFILE_DIR and return the name."""
+    directory = Path(settings.PROFILE_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    match = request.resolver_match
+    view = (match.view_name or match.route) if match else "unresolved"
+    name = f"{timezone.now():%Y%m%dT%H%M%S}-{view.replace('/', '_')}-{uuid.uuid4().hex[:8]}"
+    query = request.GET.copy()
+    query.pop("_profile", None)
+
+    profiler.dump_stats(directory / f"{name}.pstats")
+    with open(directory / f"{name}.json", "w") as f:
+        json.dump({
+            "view": view,
+            "method": request.method,
+            "path": f"{request.path}?{query.urlencode()}" if query else request.path,
+            "status": response.status_code,
+            "requested_by": user_id,
+            "total_ms": round(elapsed * 1000, 3),
+            "sql_count": len(timeline.queries),
+            "sql_ms": round(sum(q["duration_ms"] for q in timeline.queries), 3),
+            "sql": timeline.queries,
+        }, f, indent=2)
+    _prune(directory)
+    logger.info(f"Profiled {request.method} {request.path} ({view}) as {name}")
+    return name
+
+
+def _prune(directory):
+    keep = settings.PROFILE_KEEP
+    profiles = sorted(directory.glob("*.pstats"), key=os.path.getmtime)
+    for old in profiles[:max(len(profiles) - keep, 0)]:
+        old.unlink(missing_ok=True)
+        old.with_suffix(".json").unlink(missing_ok=True)
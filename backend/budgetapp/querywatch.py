@@ -0,0 +1,167 @@
+# querywatch.py
+import json
+import logging
+import os
+import sys
+import time
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+from .utils import normalize_sql
+
+
+logger = logging.getLogger(__name__)
+
+# Same statement shape run at least this many times in one request counts as N+1
+REPEAT_THRESHOLD = 5
+# Single queries at least this slow (milliseconds) are reported
+SLOW_MS = 100
+# App frames kept per query, innermost first
+STACK_DEPTH = 6
+# Savepoints around every write repeat by design
+TRANSACTION_CONTROL = ("SAVEPOINT", "RELEASE SAVEPOINT", "ROLLBACK TO SAVEPOINT")
+
+
+class QueryWatchViolation(AssertionError):
+    """Raised when violations should fail the request or test instead of only being reported."""
+
+
+def _app_stack(depth):
+    """
+    Innermost frames from our own code (not Django, DRF or other installed
+    packages), e.g. the model property or serializer method that ran the query.
+    """
+    root = str(settings.BASE_DIR)
+    frames = []
+    frame = sys._getframe(2)
+    while frame is not None and len(frames) < depth:
+        filename = frame.f_code.co_filename
+        if filename.startswith(root) and filename != __file__ and "site-packages" not in filename:
+            frames.append(f"{os.path.relpath(filename, root)}:{frame.f_lineno} in {frame.f_code.co_name}")
+        frame = frame.f_back
+    return frames
+
+
+class QueryWatcher:
+    """`execute_wrapper` hook recording each statement's shape, duration and origin."""
+
+    def __init__(self, repeat_threshold=None, slow_ms=None):
+        self.repeat_threshold = repeat_threshold or getattr(settings, "QUERYWATCH_REPEAT_THRESHOLD", REPEAT_THRESHOLD)
+        self.slow_ms = slow_ms if slow_ms is not None else getattr(settings, "QUERYWATCH_SLOW_MS", SLOW_MS)
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({
+                "alias": context["connection"].alias,
+                "sql": sql,
+                "params": None if many else params,
+                "duration_ms": (time.perf_counter() - started) * 1000,
+                "stack": _app_stack(STACK_DEPTH),
+            })
+
+    @contextmanager
+    def watching(self):
+        with ExitStack() as stack:
+            for conn in connections.all():
+                stack.enter_context(conn.execute_wrapper(self))
+            yield self
+
+    def report(self, explain=True):
+        """Repeated shapes and slow queries, each with its origin and (optionally) its EXPLAIN plan."""
+        by_shape = {}
+        for query in self.queries:
+            shape = normalize_sql(query["sql"])
+            if not shape.upper().startswith(TRANSACTION_CONTROL):
+                by_shape.setdefault(shape, []).append(query)
+
+        repeated = [
+            {
+                "shape": shape,
+                "count": len(queries),
+                "total_ms": round(sum(q["duration_ms"] for q in queries), 3),
+                "origin": (queries[0]["stack"] or [None])[0],
+                "stack": queries[0]["stack"],
+                "explain": _explain(queries[0]) if explain else None,
+            }
+            for shape, queries in by_shape.items() if len(queries) >= self.repeat_threshold
+        ]
+        slow = [
+            {
+                "sql": query["sql"],
+                "duration_ms": round(query["duration_ms"], 3),
+                "origin": (query["stack"] or [None])[0],
+                "stack": query["stack"],
+                "explain": _explain(query) if explain else None,
+            }
+            for query in self.queries if query["duration_ms"] >= self.slow_ms
+        ]
+        return {"queries": len(self.queries), "repeated": repeated, "slow": slow}
+
+
+def _explain(query):
+    if query["params"] is None or not query["sql"].lstrip().upper().startswith("SELECT"):
+        return None
+    connection = connections[query["alias"]]
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f"{connection.ops.explain_query_prefix()} {query['sql']}", query["params"])
+            return "\n".join(" ".join(str(column) for column in row) for row in cursor.fetchall())
+    except Exception as e:
+        return f"EXPLAIN failed: {e}"
+
+
+def has_violations(report):
+    return bool(report["repeated"] or report["slow"])
+
+
+def format_report(report):
+    lines = [f"{report['queries']} queries"]
+    for item in report["repeated"]:
+        lines.append(f"  repeated {item['count']}x ({item['total_ms']}ms) at {' <- '.join(item['stack']) or '?'}")
+        lines.append(f"    {item['shape']}")
+    for item in report["slow"]:
+        lines.append(f"  slow {item['duration_ms']}ms at {' <- '.join(item['stack']) or '?'}")
+        lines.append(f"    {item['sql']}")
+    return "\n".join(lines)
+
+
+@contextmanager
+def watch_queries(repeat_threshold=None, slow_ms=None, explain=True, fail=True):
+    """
+    Watch the queries run inside the block, for tests:
+
+        with watch_queries():
+            self.client.get("/api/events/")
+
+    Raises QueryWatchViolation on repeated shapes or slow queries unless `fail`
+    is False; the report is on the yielded watcher's `last_report` either way.
+    """
+    watcher = QueryWatcher(repeat_threshold, slow_ms)
+    with watcher.watching():
+        yield watcher
+    watcher.last_report = watcher.report(explain=explain)
+    if fail and has_violations(watcher.last_report):
+        raise QueryWatchViolation(format_report(watcher.last_report))
+
+
+def emit(request, report):
+    """Log a request's report and append it to QUERYWATCH_REPORT_FILE when one is configured."""
+    match = request.resolver_match
+    entry = {
+        "view": (match.view_name or match.route) if match else "-",
+        "method": request.method,
+        "path": request.path,
+        **report,
+    }
+    logger.warning(f"Query problems in {entry['method']} {entry['path']} ({entry['view']}):\n{format_report(report)}")
+    path = getattr(settings, "QUERYWATCH_REPORT_FILE", None)
+    if path:
+        with open(path, "a") as f:
+            f.write(json.dumps(entry, default=str) + "\n")
+    return entry
@@ -0,0 +1,246 @@
+# realtime.py
+import asyncio
+import json
+import logging
+import re
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import Event, Pledge
+
+
+logger = logging.getLogger(__name__)
+
+PATH = re.compile(r"/ws/events/(?P<event_id>\d+)/")
+# Messages buffered per viewer; a viewer that falls further behind is told to resync
+QUEUE_SIZE = 100
+RESYNC = json.dumps({"type": "resync"})
+
+# Close codes sent before the handshake is accepted
+CLOSE_NOT_FOUND = 4404
+CLOSE_UNAUTHORIZED = 4401
+
+
+def _uses_redis():
+    return "django_redis" in settings.CACHES["default"]["BACKEND"]
+
+
+def channel(event_id):
+    return f"realtime:event:{event_id}"
+
+
+def event_totals(event_id, user_id=None):
+    """The dashboard's metrics block for one event, in one query; None if it doesn't exist (or isn't the user's)."""
+    events = Event.objects.with_totals().filter(pk=event_id)
+    if user_id is not None:
+        events = events.filter(user_id=user_id)
+    event = events.first()
+    if event is None:
+        return None
+    return {
+        "total_pledged": event.total_pledged(),
+        "total_received": event.total_received(),
+        "percentage_covered": event.percentage_covered(),
+        "outstanding_balance": event.outstanding_balance(),
+        "total_budget": event.total_budget,
+    }
+
+
+class Hub:
+    """
+    Fan-out to the viewers connected to this process. All of them share one
+    Redis subscription, which follows the set of events being watched, so a
+    payment costs one PUBLISH however many screens are open.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """Forget every viewer and the subscription, e.g. when a new event loop takes over."""
+        self.viewers = {}
+        # the loop the subscription, its reader task and the viewers' queues belong to
+        self.loop = None
+        self.pubsub = None
+        self.reader = None
+
+    async def join(self, event_id):
+        loop = asyncio.get_running_loop()
+        if loop is not self.loop:
+            # nothing made on another loop can be awaited from this one
+            self.reset()
+            self.loop = loop
+        queue = asyncio.Queue(QUEUE_SIZE)
+        first = event_id not in self.viewers
+        self.viewers.setdefault(event_id, set()).add(queue)
+        if _uses_redis() and (first or self.pubsub is None or self.reader is None or self.reader.done()):
+            await self._subscribe(event_id)
+        return queue
+
+    async def leave(self, event_id, queue):
+        viewers = self.viewers.get(event_id, set())
+        viewers.discard(queue)
+        if not viewers:
+            self.viewers.pop(event_id, None)
+            if self.pubsub is not None:
+                await self.pubsub.unsubscribe(channel(event_id))
+
+    async def _subscribe(self, event_id):
+        if self.pubsub is None:
+            import redis.asyncio
+            client = redis.asyncio.from_url(settings.CACHES["default"]["LOCATION"])
+            self.pubsub = client.pubsub(ignore_subscribe_messages=True)
+            # a fresh subscription (first viewer, or after a failure) covers every watched event
+            await self.pubsub.subscribe(*(channel(watched) for watched in self.viewers))
+        else:
+            await self.pubsub.subscribe(channel(event_id))
+        # listen() returns once nothing is subscribed, so a new reader starts with the next viewer
+        if self.reader is None or self.reader.done():
+            self.reader = asyncio.create_task(self._read(self.pubsub))
+
+    async def _read(self, pubsub):
+        try:
+            async for message in pubsub.listen():
+                name = message["channel"].decode() if isinstance(message["channel"], bytes) else message["channel"]
+                data = message["data"].decode() if isinstance(message["data"], bytes) else message["data"]
+                self.fan_out(int(name.rsplit(":", 1)[1]), data)
+        except Exception as e:
+            logger.error(f"Realtime subscription failed, viewers will resync: {e}")
+            # the next viewer to join subscribes again on a new connection
+            if self.pubsub is pubsub:
+                self.pubsub = None
+            try:
+                await pubsub.aclose()
+            except Exception:
+                pass
+            for event_id in list(self.viewers):
+                self.fan_out(event_id, RESYNC)
+
+    def fan_out(self, event_id, data):
+        for queue in list(self.viewers.get(event_id, ())):
+            try:
+                queue.put_nowait(data)
+            except asyncio.QueueFull:
+                # too slow to keep up: drop its backlog and have it refetch the dashboard once
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(RESYNC)
+
+    def deliver(self, event_id, data):
+        """Hand a message to this process's viewers from any thread (used when Redis isn't configured)."""
+        if self.loop is not None and not self.loop.is_closed() and event_id in self.viewers:
+            self.loop.call_soon_threadsafe(self.fan_out, event_id, data)
+
+
+hub = Hub()
+
+
+def has_viewers(event_id):
+    if not _uses_redis():
+        return event_id in hub.viewers
+    from django_redis import get_redis_connection
+    return bool(get_redis_connection("default").pubsub_numsub(channel(event_id))[0][1])
+
+
+def publish(event_id, message):
+    data = json.dumps(message, cls=DjangoJSONEncoder)
+    if _uses_redis():
+        from django_redis import get_redis_connection
+        get_redis_connection("default").publish(channel(event_id), data)
+    else:
+        hub.deliver(event_id, data)
+
+
+def publish_payment(event_id, payment, change):
+    """
+    Push a committed payment change to the event's viewers: the payment, the
+    event's new totals and its pledge's status. Nothing is queried when nobody
+    is watching the event.
+    """
+    try:
+        if not has_viewers(event_id):
+            return
+        message = {
+            "type": f"payment.{change}",
+            "event": event_id,
+            "payment": {
+                "id": payment.pk,
+                "channel": "mpesa" if payment._meta.model_name == "mpesapayment" else "manual",
+                "amount": payment.amount,
+                "pledge": payment.pledge_id,
+            },
+            "metrics": event_totals(event_id),
+        }
+        if payment.pledge_id:
+            message["pledge"] = Pledge.objects.filter(pk=payment.pledge_id).values(
+                "id", "total_paid", "is_fulfilled"
+            ).first()
+        publish(event_id, message)
+    except Exception as e:
+        logger.error(f"Error publishing realtime update for event {event_id}: {e}")
+
+
+def _authenticate(scope):
+    """User id from the `?token=` access token; browsers can't set headers on a WebSocket handshake."""
+    from rest_framework_simplejwt.authentication import JWTAuthentication
+    from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+
+    token = parse_qs(scope.get("query_string", b"").decode()).get("token", [None])[0]
+    if not token:
+        return None
+    authentication = JWTAuthentication()
+    try:
+        user = authentication.get_user(authentication.get_validated_token(token))
+    except (InvalidToken, AuthenticationFailed):
+        return None
+    return user.pk if user.is_active else None
+
+
+async def websocket_application(scope, receive, send):
+    """
+    `/ws/events/<id>/?token=<access token>`: a snapshot of the event's totals,
+    then a message per committed payment change until the client disconnects.
+    Messages from the client are ignored.
+    """
+    await receive()  # websocket.connect
+    match = PATH.fullmatch(scope["path"])
+    if not match:
+        await send({"type": "websocket.close", "code": CLOSE_NOT_FOUND})
+        return
+    event_id = int(match["event_id"])
+    user_id = await sync_to_async(_authenticate)(scope)
+    if user_id is None:
+        await send({"type": "websocket.close", "code": CLOSE_UNAUTHORIZED})
+        return
+    # joined before the snapshot is read so no change can fall in between
+    queue = await hub.join(event_id)
+    try:
+        metrics = await sync_to_async(event_totals)(event_id, user_id)
+        if metrics is None:
+            await send({"type": "websocket.close", "code": CLOSE_NOT_FOUND})
+            return
+        await send({"type": "websocket.accept"})
+        await send({"type": "websocket.send", "text": json.dumps(
+            {"type": "snapshot", "event": event_id, "metrics": metrics}, cls=DjangoJSONEncoder,
+        )})
+
+        incoming = asyncio.ensure_future(receive())
+        outgoing = asyncio.ensure_future(queue.get())
+        try:
+            while True:
+                done, _ = await asyncio.wait({incoming, outgoing}, return_when=asyncio.FIRST_COMPLETED)
+                if incoming in done:
+                    if incoming.result()["type"] == "websocket.disconnect":
+                        return
+                    incoming = asyncio.ensure_future(receive())
+                if outgoing in done:
+                    await send({"type": "websocket.send", "text": outgoing.result()})
+                    outgoing = asyncio.ensure_future(queue.get())
+        finally:
+            incoming.cancel()
+            outgoing.cancel()
+    finally:
+        await hub.leave(event_id, queue)
@@ -0,0 +1,170 @@
+# recompute.py
+import logging
+import multiprocessing
+
+from django.db import connections, transaction
+from django.db.models import BooleanField, Case, DecimalField, F, Max, Min, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce, Round
+
+from .cache import bump_version
+from .models import BudgetItem, Event, ManualPayment, MpesaPayment, Pledge, VendorPayment
+
+
+logger = logging.getLogger(__name__)
+
+# Primary-key span updated per statement; keeps each UPDATE's locks short
+CHUNK_SIZE = 5000
+
+
+def _paid(model, fk, field="amount"):
+    """Correlated SUM over the `model` rows pointing at the row being updated, 0 when there are none."""
+    total = Subquery(
+        model.objects.filter(**{fk: OuterRef("pk")}).order_by().values(fk).annotate(total=Sum(field)).values("total")[:1]
+    )
+    return Coalesce(total, Value(0), output_field=DecimalField())
+
+
+def _money(expression):
+    # rounded to the stored precision so backends summing in floating point (SQLite) compare equal
+    return Round(expression, 2, output_field=DecimalField())
+
+
+def _at_least(expression, threshold):
+    return Case(When(**{f"{threshold}__lte": expression}, then=Value(True)), default=Value(False),
+                output_field=BooleanField())
+
+
+def _pledge_fields():
+    paid = _money(_paid(MpesaPayment, "pledge") + _paid(ManualPayment, "pledge"))
+    return {"total_paid": paid, "is_fulfilled": _at_least(paid, "amount_pledged")}
+
+
+def _event_fields():
+    received = _money(_paid(MpesaPayment, "event") + _paid(ManualPayment, "event"))
+    return {"is_funded": _at_least(received, "total_budget")}
+
+
+def _budget_item_fields():
+    return {"is_funded": _at_least(_money(_paid(VendorPayment, "budget_item")), "estimated_budget")}
+
+
+# kind -> (model, stored derived fields as expressions, how to find the event of each row)
+DERIVED = {
+    "pledges": (Pledge, _pledge_fields, "event_id"),
+    "events": (Event, _event_fields, "pk"),
+    "budget-items": (BudgetItem, _budget_item_fields, "event_id"),
+}
+
+
+def drifted(kind, queryset=None, id_range=None):
+    """
+    Rows of `kind` whose stored derived fields differ from the recomputed
+    aggregates, annotated with the recomputed values as `_new_<field>`.
+    Limited to `queryset` and/or the half-open primary-key `id_range`.
+    """
+    model, fields, event_field = DERIVED[kind]
+    rows = model.objects.all() if queryset is None else queryset
+    if id_range is not None:
+        rows = rows.filter(pk__gte=id_range[0], pk__lt=id_range[1])
+
+    expressions = fields()
+    annotated = rows.order_by().annotate(**{f"_new_{name}": expression for name, expression in expressions.items()})
+    drift = Q()
+    for name in expressions:
+        drift |= ~Q(**{name: F(f"_new_{name}")})
+    return annotated.filter(drift)
+
+
+def discrepancies(kind, queryset=None, id_range=None):
+    """Drifted rows of `kind` as dicts with the stored and the recomputed value of each derived field."""
+    model, fields, event_field = DERIVED[kind]
+    names = list(fields())
+    rows = drifted(kind, queryset, id_range).values_list("pk", event_field, *names, *(f"_new_{name}" for name in names))
+    return [
+        {
+            "kind": kind,
+            "id": row[0],
+            "event": row[1],
+            "stored": dict(zip(names, row[2:2 + len(names)])),
+            "expected": dict(zip(names, row[2 + len(names):])),
+        }
+        for row in rows
+    ]
+
+
+def repair(kind, stale):
+    """Rewrite the derived fields of `stale` ((pk, event id) pairs) and drop their events' cached payloads."""
+    model, fields, _ = DERIVED[kind]
+    ids = [pk for pk, _ in stale]
+    with transaction.atomic():
+        for start in range(0, len(ids), CHUNK_SIZE):
+            model.objects.filter(pk__in=ids[start:start + CHUNK_SIZE]).update(**fields())
+
+    for event_id in {event_id for _, event_id in stale if event_id}:
+        try:
+            bump_version("event", event_id)
+        except Exception as e:
+            logger.error(f"Error bumping cache version for event {event_id}: {e}")
+
+
+def recompute(kind, queryset=None, id_range=None):
+    """
+    Recompute a kind's stored derived fields with set-based UPDATEs, without
+    save(), full_clean() or signals. Limited to `queryset` and/or the
+    half-open primary-key `id_range` when given.
+
+    Only rows whose stored values have drifted are written; the versions of
+    their events are bumped so cached payloads built from them are dropped.
+    Returns the number of rows fixed.
+    """
+    event_field = DERIVED[kind][2]
+    stale = list(drifted(kind, queryset, id_range).values_list("pk", event_field))
+    repair(kind, stale)
+    return len(stale)
+
+
+def id_ranges(model, chunk_size=CHUNK_SIZE):
+    """Half-open primary-key ranges covering the table, `chunk_size` ids each (gaps make some sparse)."""
+    bounds = model.objects.aggregate(low=Min("pk"), high=Max("pk"))
+    if bounds["low"] is None:
+        return []
+    return [(start, start + chunk_size) for start in range(bounds["low"], bounds["high"] + 1, chunk_size)]
+
+
+def _recompute_range(task):
+    kind, id_range = task
+    fixed = recompute(kind, id_range=id_range)
+    return kind, id_range, fixed
+
+
+def recompute_all(kinds=None, chunk_size=CHUNK_SIZE, workers=1, progress=None):
+    """
+    Recompute every row of `kinds` (default: all), one id-range chunk per
+    UPDATE, spread over `workers` processes. Returns {kind: rows fixed}.
+    """
+    kinds = list(kinds or DERIVED)
+    tasks = [(kind, id_range) for kind in kinds for id_range in id_ranges(DERIVED[kind][0], chunk_size)]
+    fixed = dict.fromkeys(kinds, 0)
+
+    if workers <= 1 or len(tasks) <= 1:
+        results = map(_recompute_range, tasks)
+    else:
+        # forked children must not share the parent's database connections
+        connections.close_all()
+        pool = multiprocessing.get_context("fork").Pool(workers)
+        results = pool.imap_unordered(_recompute_range, tasks)
+    try:
+        for done, (kind, id_range, count) in enumerate(results, 1):
+            fixed[kind] += count
+            if progress:
+                progress(done, len(tasks), kind, id_range, count)
+    finally:
+        if workers > 1 and len(tasks) > 1:
+            pool.close()
+            pool.join()
+    return fixed
+
+
+def confirm_vendor_payments(queryset):
+    """Mark the unconfirmed payments in `queryset` as confirmed in one UPDATE; returns how many changed."""
+    return queryset.filter(confirmed=False).update(confirmed=True)
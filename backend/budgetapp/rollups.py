@@ -0,0 +1,159 @@
+# rollups.py
+import datetime
+import logging
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from .models import DailyEventTotals, ManualPayment, MpesaPayment
+
+
+logger = logging.getLogger(__name__)
+
+BULK_BATCH_SIZE = 1000
+# Longest date range the chart endpoint will zero-fill.
+MAX_SERIES_DAYS = 3660
+
+
+def _as_day(value):
+    if isinstance(value, datetime.datetime):
+        return timezone.localdate(value) if timezone.is_aware(value) else value.date()
+    return value
+
+
+def payment_bucket(payment):
+    """Return the (event_id, day, channel) bucket a payment rolls up into, or None."""
+    if isinstance(payment, MpesaPayment):
+        if not payment.event_id or not payment.timestamp:
+            return None
+        return payment.event_id, _as_day(payment.timestamp), DailyEventTotals.CHANNEL_MPESA
+
+    event_id = payment.event_id
+    if not event_id and payment.pledge_id:
+        event_id = payment.pledge.event_id
+    if not event_id or not payment.date:
+        return None
+    return event_id, _as_day(payment.date), DailyEventTotals.CHANNEL_MANUAL
+
+
+def add_to_bucket(bucket, amount):
+    """Increment one bucket by a single new payment with an atomic UPDATE."""
+    event_id, day, channel = bucket
+    rows = DailyEventTotals.objects.filter(event_id=event_id, day=day, channel=channel)
+    changes = {
+        "total_amount": F("total_amount") + amount,
+        "payment_count": F("payment_count") + 1,
+    }
+    if rows.update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            DailyEventTotals.objects.create(
+                event_id=event_id, day=day, channel=channel,
+                total_amount=amount, payment_count=1,
+            )
+    except IntegrityError:
+        # another writer created the bucket first
+        rows.update(**changes)
+
+
+def _bucket_payments(event_id, day, channel):
+    if channel == DailyEventTotals.CHANNEL_MPESA:
+        start = timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+        return MpesaPayment.objects.filter(
+            event_id=event_id, timestamp__gte=start, timestamp__lt=start + datetime.timedelta(days=1)
+        )
+    return ManualPayment.objects.filter(
+        Q(event_id=event_id) | Q(event__isnull=True, pledge__event_id=event_id),
+        date=day,
+    )
+
+
+def refresh_bucket(bucket):
+    """Recompute one bucket from the raw payments (used after edits and deletes)."""
+    event_id, day, channel = bucket
+    totals = _bucket_payments(event_id, day, channel).aggregate(total=Sum("amount"), count=Count("id"))
+    rows = DailyEventTotals.objects.filter(event_id=event_id, day=day, channel=channel)
+    if not totals["count"]:
+        rows.delete()
+        return
+    with transaction.atomic():
+        DailyEventTotals.objects.update_or_create(
+            event_id=event_id, day=day, channel=channel,
+            defaults={"total_amount": totals["total"], "payment_count": totals["count"]},
+        )
+
+
+def rebuild_daily_totals(event_ids=None):
+    """Rebuild the rollup from scratch with two GROUP BY queries; returns the number of buckets."""
+    mpesa = MpesaPayment.objects.all()
+    manual = ManualPayment.objects.annotate(bucket_event=Coalesce("event_id", "pledge__event_id"))
+    existing = DailyEventTotals.objects.all()
+    if event_ids is not None:
+        mpesa = mpesa.filter(event_id__in=event_ids)
+        manual = manual.filter(bucket_event__in=event_ids)
+        existing = existing.filter(event_id__in=event_ids)
+
+    grouped = [
+        (DailyEventTotals.CHANNEL_MPESA, mpesa.order_by().values(
+            bucket_event=F("event_id"), bucket_day=TruncDate("timestamp")
+        )),
+        (DailyEventTotals.CHANNEL_MANUAL, manual.exclude(bucket_event__isnull=True).order_by().values(
+            "bucket_event", bucket_day=F("date")
+        )),
+    ]
+
+    created = 0
+    with transaction.atomic():
+        existing.delete()
+        for channel, queryset in grouped:
+            batch = []
+            for row in queryset.annotate(total=Sum("amount"), count=Count("id")).iterator():
+                batch.append(DailyEventTotals(
+                    event_id=row["bucket_event"], day=row["bucket_day"], channel=channel,
+                    total_amount=row["total"], payment_count=row["count"],
+                ))
+                if len(batch) >= BULK_BATCH_SIZE:
+                    DailyEventTotals.objects.bulk_create(batch)
+                    created += len(batch)
+                    batch = []
+            DailyEventTotals.objects.bulk_create(batch)
+            created += len(batch)
+    return created
+
+
+def funding_series(event, start, end):
+    """
+    Dense day-by-day contribution series for `event` between `start` and `end`
+    (inclusive), zero-filled, with a running total that includes earlier days.
+    """
+    rows = DailyEventTotals.objects.filter(event=event, day__gte=start, day__lte=end)
+    by_day = {}
+    for day, channel, total, count in rows.values_list("day", "channel", "total_amount", "payment_count"):
+        bucket = by_day.setdefault(day, {"mpesa": Decimal("0"), "manual": Decimal("0"), "count": 0})
+        bucket[channel] = total
+        bucket["count"] += count
+
+    cumulative = DailyEventTotals.objects.filter(event=event, day__lt=start).aggregate(
+        total=Sum("total_amount")
+    )["total"] or Decimal("0")
+
+    series = []
+    day = start
+    while day <= end:
+        bucket = by_day.get(day, {"mpesa": Decimal("0"), "manual": Decimal("0"), "count": 0})
+        total = bucket["mpesa"] + bucket["manual"]
+        cumulative += total
+        series.append({
+            "date": day.isoformat(),
+            "mpesa": bucket["mpesa"],
+            "manual": bucket["manual"],
+            "total": total,
+            "count": bucket["count"],
+            "cumulative": cumulative,
+        })
+        day += datetime.timedelta(days=1)
+    return series
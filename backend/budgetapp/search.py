@@ -0,0 +1,153 @@
+# search.py
+import logging
+import re
+
+from django.db import transaction
+from django.db.models import Count, Sum
+
+from .models import BudgetItem, Event, Pledge, SearchTrigram, ServiceProvider
+
+
+logger = logging.getLogger(__name__)
+
+BULK_BATCH_SIZE = 2000
+_NON_WORD = re.compile(r"[^0-9a-z]+")
+
+
+class SearchSpec:
+    def __init__(self, model, fields, label):
+        self.model = model
+        # indexed field name -> weight used for ranking
+        self.fields = fields
+        self.label = label
+
+
+SEARCH_SPECS = {
+    "pledge": SearchSpec(Pledge, {"name": 3, "phone_number": 2}, lambda p: f"{p.name} ({p.phone_number})"),
+    "service_provider": SearchSpec(
+        ServiceProvider, {"name": 3, "email": 1}, lambda s: f"{s.name} ({s.service_type})"
+    ),
+    "event": SearchSpec(Event, {"name": 3, "venue": 1}, lambda e: f"{e.name} - {e.event_date}"),
+    "budget_item": SearchSpec(BudgetItem, {"category": 3}, lambda b: b.category),
+}
+KIND_BY_MODEL = {spec.model: kind for kind, spec in SEARCH_SPECS.items()}
+
+
+def tokenize(text):
+    return _NON_WORD.sub(" ", (text or "").lower()).split()
+
+
+def document_trigrams(text):
+    """
+    Trigrams of every word, padded with two leading spaces so short prefixes
+    ("  j", " jo") match the start of a word.
+    """
+    grams = set()
+    for word in tokenize(text):
+        padded = f"  {word}"
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def query_trigrams(text):
+    """
+    Trigrams a document must contain to match `text`: any substring for words of
+    three or more characters, a word prefix for shorter ones.
+    """
+    grams = set()
+    for word in tokenize(text):
+        if len(word) >= 3:
+            grams.update(word[i:i + 3] for i in range(len(word) - 2))
+        else:
+            padded = f"  {word}"
+            grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def _object_rows(kind, spec, obj):
+    weights = {}
+    for field, weight in spec.fields.items():
+        for gram in document_trigrams(getattr(obj, field)):
+            weights[gram] = max(weights.get(gram, 0), weight)
+    return [
+        SearchTrigram(user_id=obj.user_id, kind=kind, object_id=obj.pk, trigram=gram, weight=weight)
+        for gram, weight in weights.items()
+    ]
+
+
+def index_object(obj):
+    kind = KIND_BY_MODEL[type(obj)]
+    with transaction.atomic():
+        SearchTrigram.objects.filter(kind=kind, object_id=obj.pk).delete()
+        SearchTrigram.objects.bulk_create(_object_rows(kind, SEARCH_SPECS[kind], obj), batch_size=BULK_BATCH_SIZE)
+
+
+def remove_object(obj):
+    SearchTrigram.objects.filter(kind=KIND_BY_MODEL[type(obj)], object_id=obj.pk).delete()
+
+
+def rebuild_index(kinds=None, user_ids=None, chunk_size=BULK_BATCH_SIZE):
+    """Rebuild the index for the given kinds/users in primary-key chunks; returns rows written."""
+    written = 0
+    for kind in kinds or SEARCH_SPECS:
+        spec = SEARCH_SPECS[kind]
+        existing = SearchTrigram.objects.filter(kind=kind)
+        objects = spec.model.objects.order_by("pk").only("pk", "user_id", *spec.fields)
+        if user_ids is not None:
+            existing = existing.filter(user_id__in=user_ids)
+            objects = objects.filter(user_id__in=user_ids)
+        existing.delete()
+
+        last_pk = 0
+        while True:
+            batch = list(objects.filter(pk__gt=last_pk)[:chunk_size])
+            if not batch:
+                break
+            rows = [row for obj in batch for row in _object_rows(kind, spec, obj)]
+            SearchTrigram.objects.bulk_create(rows, batch_size=BULK_BATCH_SIZE)
+            written += len(rows)
+            last_pk = batch[-1].pk
+    return written
+
+
+def search(user, text, kinds=None, limit=20):
+    """
+    Ranked matches for `text` among the user's indexed objects.
+
+    An object matches when it contains every query trigram; matches in heavier
+    fields (names) rank above lighter ones (venue, email).
+    """
+    grams = query_trigrams(text)
+    if not grams:
+        return []
+
+    matches = SearchTrigram.objects.filter(user=user, trigram__in=grams)
+    if kinds:
+        matches = matches.filter(kind__in=kinds)
+    matches = list(
+        matches.values("kind", "object_id")
+        .annotate(hits=Count("id"), score=Sum("weight"))
+        .filter(hits=len(grams))
+        .order_by("-score", "-object_id")[:limit]
+    )
+
+    ids_by_kind = {}
+    for match in matches:
+        ids_by_kind.setdefault(match["kind"], []).append(match["object_id"])
+    objects = {
+        kind: SEARCH_SPECS[kind].model.objects.filter(user=user).in_bulk(ids)
+        for kind, ids in ids_by_kind.items()
+    }
+
+    results = []
+    for match in matches:
+        obj = objects[match["kind"]].get(match["object_id"])
+        if obj is None:  # deleted since it was indexed
+            continue
+        results.append({
+            "type": match["kind"],
+            "id": obj.pk,
+            "label": SEARCH_SPECS[match["kind"]].label(obj),
+            "score": match["score"],
+        })
+    return results
@@ -151,6 +151,8 @@ class MpesaPaymentSerializer(serializers.ModelSerializer):
         model = MpesaPayment
         fields = ['id', 'event', 'pledge', 'amount', 'transaction_id', 'timestamp', 'user']
         read_only_fields = ['id', 'timestamp', 'user']
+        # uniqueness is checked once, by the model's full_clean() on save
+        extra_kwargs = {'transaction_id': {'validators': []}}
 
     def create(self, validated_data):
         validated_data['user'] = self.context['request'].user
@@ -273,3 +275,7 @@ class ChangePasswordSerializer(serializers.Serializer):
 class LoginSerializer(serializers.Serializer):
     username = serializers.CharField()
     password = serializers.CharField(write_only=True)
+
+
+class EventShareSerializer(serializers.Serializer):
+    top_contributors = serializers.IntegerField(min_value=0, max_value=20, required=False)
@@ -0,0 +1,85 @@
+# sharing.py
+import secrets
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+from django.utils import timezone
+
+from .cache import get_or_compute, get_version
+from .models import Event, Pledge
+
+
+# Absent from the token cache: token unknown or revoked
+NOT_SHARED = 0
+
+
+def _token_key(token):
+    return f"public_token:{token}"
+
+
+def share(event, top_contributors=None):
+    """Give the event a new public token (replacing any previous one) and return it."""
+    if event.public_token:
+        cache.delete(_token_key(event.public_token))
+    event.public_token = secrets.token_urlsafe(32)
+    fields = ["public_token"]
+    if top_contributors is not None:
+        event.public_top_contributors = top_contributors
+        fields.append("public_top_contributors")
+    event.save(update_fields=fields)
+    return event.public_token
+
+
+def unshare(event):
+    if event.public_token:
+        cache.delete(_token_key(event.public_token))
+        event.public_token = None
+        event.save(update_fields=["public_token"])
+
+
+def event_for_token(token):
+    """Id of the event shared under `token`, or None; unknown tokens are cached too so guessing stays cheap."""
+    key = _token_key(token)
+    event_id = cache.get(key)
+    if event_id is None:
+        event_id = Event.objects.filter(public_token=token).values_list("pk", flat=True).first() or NOT_SHARED
+        cache.set(key, event_id, settings.PUBLIC_TOKEN_TTL)
+    return event_id or None
+
+
+def progress_snapshot(event_id):
+    """The public view of an event: no ids, phone numbers or per-payment data."""
+    event = Event.objects.with_totals().filter(pk=event_id).first()
+    if event is None:
+        return None
+    raised = event.total_received()
+    snapshot = {
+        "name": event.name,
+        "event_date": event.event_date,
+        "target": event.total_budget,
+        "raised": raised,
+        "percentage": round(raised / event.total_budget * 100, 2) if event.total_budget else 0,
+        "contributors": None,
+        "updated_at": timezone.now(),
+    }
+    if event.public_top_contributors:
+        snapshot["contributors"] = list(
+            Pledge.objects.filter(event_id=event_id, total_paid__gt=0)
+            .order_by(F("total_paid").desc(), "pk")
+            .values("name", amount=F("total_paid"))[:event.public_top_contributors]
+        )
+    return snapshot
+
+
+def cached_progress(token):
+    """
+    Snapshot for a public token, or None if it isn't shared. Built once per
+    event version (a payment or edit moves it on) and served from the cache to
+    every viewer in between, so no request but the first touches the database.
+    """
+    event_id = event_for_token(token)
+    if event_id is None:
+        return None
+    key = f"public_progress:{event_id}:{get_version('event', event_id)}"
+    return get_or_compute(key, lambda: progress_snapshot(event_id), ttl=settings.PUBLIC_SNAPSHOT_TTL)
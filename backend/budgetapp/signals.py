@@ -1,12 +1,19 @@
-from django.db.models.signals import post_save, post_delete, pre_delete
+from django.db.models.signals import post_save, post_delete, pre_delete, pre_save
+from django.db import transaction
 from django.dispatch import receiver
+import copy
 import logging
 from .models import (Event, BudgetItem, Pledge, MpesaPayment, ManualPayment, 
                      MpesaInfo, Task, VendorPayment, ServiceProvider, UserSettings)
 from django.conf import settings
+from .rollups import payment_bucket, add_to_bucket, refresh_bucket
+from .cache import bump_version
+from . import jobs, realtime, search, typeahead
+from .metrics import timed_handler
 
 
 @receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@timed_handler
 def create_user_settings(sender, instance, created, **kwargs):
     if created:
         UserSettings.objects.create(user=instance)
@@ -15,35 +22,36 @@ def create_user_settings(sender, instance, created, **kwargs):
 
 @receiver([post_save, post_delete], sender=MpesaPayment)
 @receiver([post_save, post_delete], sender=ManualPayment)
+@timed_handler
 def update_event_funding_status(sender, instance, **kwargs):
+    # Event and budget item totals scan every payment of the event; the worker recomputes them
     event_id = getattr(instance, 'event_id', None)
     if event_id:
         try:
-            event = Event.objects.filter(id=event_id).first()
-            if event:
-             event.update_funding_status()
+            jobs.queue_funding_recompute(event_id)
         except Exception as e:
-            logging.error(f"Error updating funding status for event {event_id}: {e}")
+            logging.error(f"Error queueing funding recompute for event {event_id}: {e}")
 
 
 
 @receiver([post_save, post_delete], sender=VendorPayment)
+@timed_handler
 def update_budget_item_funding_status(sender, instance, **kwargs):
     budget_item_id = getattr(instance, 'budget_item_id', None)
     if budget_item_id:
         try:
-            from budgetapp.models import BudgetItem  # avoid circular import if needed
-            item = BudgetItem.objects.filter(pk=budget_item_id).first()
-            if item:
-                item.update_funding_status()
+            event_id = BudgetItem.objects.filter(pk=budget_item_id).values_list('event_id', flat=True).first()
+            if event_id:
+                jobs.queue_funding_recompute(event_id)
         except Exception as e:
-            logging.error(f"Error updating funding status for budget item {budget_item_id}: {e}")
+            logging.error(f"Error queueing funding recompute for budget item {budget_item_id}: {e}")
 
 
 
 
 @receiver([post_save, post_delete], sender=MpesaPayment)
 @receiver([post_save, post_delete], sender=ManualPayment)
+@timed_handler
 def update_pledge_payment_status(sender, instance, **kwargs):
     # Defensive: ensure instance still has a pledge
     pledge = getattr(instance, 'pledge', None)
@@ -56,21 +64,134 @@ def update_pledge_payment_status(sender, instance, **kwargs):
         logging.error(f"Error updating payment status for pledge {getattr(pledge, 'id', 'unknown')}: {e}")
 
 
+@receiver(pre_save, sender=MpesaPayment)
+@receiver(pre_save, sender=ManualPayment)
+@timed_handler
+def remember_previous_rollup_bucket(sender, instance, raw=False, **kwargs):
+    # Edits can move a payment to another day or event; remember where it was
+    instance._previous_rollup_bucket = None
+    if raw or not instance.pk:
+        return
+    previous = sender.objects.filter(pk=instance.pk).select_related('pledge').first()
+    if previous:
+        instance._previous_rollup_bucket = payment_bucket(previous)
+
+
+@receiver(post_save, sender=MpesaPayment)
 @receiver(post_save, sender=ManualPayment)
-def update_pledge_on_manual_payment(sender, instance, created, **kwargs):
+@timed_handler
+def update_daily_totals(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
     try:
-        if instance.pledge:
-            instance.pledge.update_payment_status()
+        bucket = payment_bucket(instance)
+        if created:
+            if bucket:
+                add_to_bucket(bucket, instance.amount)
+            return
+        previous = getattr(instance, '_previous_rollup_bucket', None)
+        for changed in {bucket, previous} - {None}:
+            refresh_bucket(changed)
     except Exception as e:
-        logging.error(f"Error updating pledge from ManualPayment {instance.id}: {e}")
+        logging.error(f"Error updating daily totals for {sender.__name__} {instance.pk}: {e}")
 
 
-@receiver(post_save, sender=MpesaPayment)
-def update_pledge_on_mpesa_payment(sender, instance, created, **kwargs):
-    if instance.pledge:
-    # Ensure the pledge is updated only if it exists
+@receiver(post_delete, sender=MpesaPayment)
+@receiver(post_delete, sender=ManualPayment)
+@timed_handler
+def remove_from_daily_totals(sender, instance, **kwargs):
+    try:
+        bucket = payment_bucket(instance)
+        if bucket:
+            refresh_bucket(bucket)
+    except Exception as e:
+        logging.error(f"Error updating daily totals for deleted {sender.__name__} {instance.pk}: {e}")
+
+
+@receiver([post_save, post_delete], sender=Event)
+@receiver([post_save, post_delete], sender=Pledge)
+@receiver([post_save, post_delete], sender=MpesaPayment)
+@receiver([post_save, post_delete], sender=ManualPayment)
+@timed_handler
+def bump_event_version(sender, instance, **kwargs):
+    # Anything cached per event version (forecasts, snapshots) goes stale here
+    event_id = instance.pk if sender is Event else getattr(instance, 'event_id', None)
+    if not event_id and getattr(instance, 'pledge_id', None):
+        event_id = Pledge.objects.filter(pk=instance.pledge_id).values_list('event_id', flat=True).first()
+    if event_id:
         try:
-            instance.pledge.update_payment_status()
+            bump_version('event', event_id)
         except Exception as e:
-            logging.error(f"Error updating payment status for pledge {instance.pledge.id}: {e}")
+            logging.error(f"Error bumping cache version for event {event_id}: {e}")
+
 
+@receiver([post_save, post_delete], sender=MpesaPayment)
+@receiver([post_save, post_delete], sender=ManualPayment)
+@timed_handler
+def push_payment_update(sender, instance, created=False, raw=False, signal=None, **kwargs):
+    # Published once the payment commits, so viewers never see a rolled-back payment
+    event_id = getattr(instance, 'event_id', None)
+    if raw or not event_id:
+        return
+    change = "deleted" if signal is post_delete else "created" if created else "updated"
+    transaction.on_commit(lambda: realtime.publish_payment(event_id, instance, change))
+
+
+@receiver(post_save, sender=Pledge)
+@receiver(post_save, sender=ServiceProvider)
+@receiver(post_save, sender=Event)
+@receiver(post_save, sender=BudgetItem)
+@timed_handler
+def update_search_index(sender, instance, update_fields=None, raw=False, **kwargs):
+    indexed = search.SEARCH_SPECS[search.KIND_BY_MODEL[sender]].fields
+    # status-only saves (total_paid, is_funded, ...) don't touch indexed text
+    if raw or (update_fields is not None and not set(update_fields) & set(indexed)):
+        return
+    try:
+        search.index_object(instance)
+    except Exception as e:
+        logging.error(f"Error indexing {sender.__name__} {instance.pk} for search: {e}")
+
+
+@receiver(post_delete, sender=Pledge)
+@receiver(post_delete, sender=ServiceProvider)
+@receiver(post_delete, sender=Event)
+@receiver(post_delete, sender=BudgetItem)
+@timed_handler
+def remove_from_search_index(sender, instance, **kwargs):
+    try:
+        search.remove_object(instance)
+    except Exception as e:
+        logging.error(f"Error removing {sender.__name__} {instance.pk} from search index: {e}")
+
+
+@receiver(post_save, sender=Pledge)
+@receiver(post_save, sender=ServiceProvider)
+@timed_handler
+def update_typeahead(sender, instance, update_fields=None, raw=False, **kwargs):
+    fields = typeahead.TYPEAHEAD_SPECS[typeahead.KIND_BY_MODEL[sender]].fields
+    if raw or (update_fields is not None and not set(update_fields) & set(fields)):
+        return
+
+    # Applied once the row commits, so a rolled-back save never shows up as a suggestion
+    def refresh():
+        try:
+            typeahead.refresh_object(instance)
+        except Exception as e:
+            logging.error(f"Error updating type-ahead for {sender.__name__} {instance.pk}: {e}")
+    transaction.on_commit(refresh)
+
+
+@receiver(post_delete, sender=Pledge)
+@receiver(post_delete, sender=ServiceProvider)
+@timed_handler
+def remove_from_typeahead(sender, instance, **kwargs):
+    # the deletion clears instance.pk before the commit; the copy keeps it
+    deleted = copy.copy(instance)
+
+    def remove():
+        try:
+            typeahead.refresh_object(deleted, deleted=True)
+        except Exception as e:
+            logging.error(f"Error removing {sender.__name__} {deleted.pk} from type-ahead: {e}")
+    transaction.on_commit(remove)
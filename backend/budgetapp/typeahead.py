@@ -0,0 +1,270 @@
+# typeahead.py
+import bisect
+import json
+import logging
+import re
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Pledge, ServiceProvider
+
+
+logger = logging.getLogger(__name__)
+
+MAX_LIMIT = 25
+_SPACES = re.compile(r"\s+")
+# Separates the sort key from the payload inside a member; sorts below any text.
+SEPARATOR = "\x00"
+# How long a build may run before another worker may start over (seconds)
+BUILD_TTL = 300
+
+
+class TypeaheadSpec:
+    def __init__(self, model, fields):
+        self.model = model
+        # fields returned with each suggestion; the first one is matched on
+        self.fields = fields
+
+
+TYPEAHEAD_SPECS = {
+    "pledger": TypeaheadSpec(Pledge, ["name", "phone_number"]),
+    "vendor": TypeaheadSpec(ServiceProvider, ["name", "phone_number", "service_type"]),
+}
+KIND_BY_MODEL = {spec.model: kind for kind, spec in TYPEAHEAD_SPECS.items()}
+
+
+def normalize(text):
+    return _SPACES.sub(" ", (text or "").lower()).strip()
+
+
+def members_for(spec, pk, values):
+    """
+    Sorted-set members for one row: one per word start of the matched field,
+    so "kam" finds "John Kamau" as well as "Kamau Njoroge".
+    """
+    payload = json.dumps([pk] + list(values), separators=(",", ":"))
+    words = normalize(values[0]).split(" ")
+    return sorted({
+        f"{' '.join(words[i:])}{SEPARATOR}{payload}" for i in range(len(words)) if words[i]
+    })
+
+
+def _suggestion(spec, member):
+    pk, *values = json.loads(member.split(SEPARATOR, 1)[1])
+    return {"id": pk, **dict(zip(spec.fields, values))}
+
+
+class RedisTypeaheadStore:
+    """
+    One sorted set per user and kind, all scores 0 so ZRANGEBYLEX answers prefix
+    queries in O(log n), plus a hash of row id -> members for updates and deletes.
+    """
+
+    # KEYS: sorted set, id hash; ARGV: row id, JSON list of its members, the members
+    REPLACE = """
+        local old = redis.call('HGET', KEYS[2], ARGV[1])
+        if old then
+            local members = cjson.decode(old)
+            if #members > 0 then redis.call('ZREM', KEYS[1], unpack(members)) end
+        end
+        if #ARGV > 2 then
+            for i = 3, #ARGV do redis.call('ZADD', KEYS[1], 0, ARGV[i]) end
+            redis.call('HSET', KEYS[2], ARGV[1], ARGV[2])
+        else
+            redis.call('HDEL', KEYS[2], ARGV[1])
+        end
+    """
+    # Rows edited while a build runs are already indexed, and newer than what the build read
+    LOAD = """
+        if redis.call('HSETNX', KEYS[2], ARGV[1], ARGV[2]) == 1 then
+            for i = 3, #ARGV do redis.call('ZADD', KEYS[1], 0, ARGV[i]) end
+        end
+    """
+
+    def __init__(self):
+        from django_redis import get_redis_connection
+        self.redis = get_redis_connection("default")
+        self._replace = self.redis.register_script(self.REPLACE)
+        self._load = self.redis.register_script(self.LOAD)
+
+    def _keys(self, user_id, kind):
+        base = f"typeahead:{user_id}:{kind}"
+        return base, f"{base}:members", f"{base}:ready", f"{base}:building"
+
+    def is_ready(self, user_id, kind):
+        return bool(self.redis.exists(self._keys(user_id, kind)[2]))
+
+    def accepts_writes(self, user_id, kind):
+        return bool(self.redis.exists(*self._keys(user_id, kind)[2:]))
+
+    def start_build(self, user_id, kind):
+        # returns False if another worker is already building this index
+        return bool(self.redis.set(self._keys(user_id, kind)[3], 1, nx=True, ex=BUILD_TTL))
+
+    def finish_build(self, user_id, kind):
+        _, _, ready, building = self._keys(user_id, kind)
+        self.redis.pipeline().set(ready, 1).delete(building).execute()
+
+    def abort_build(self, user_id, kind):
+        self.redis.delete(self._keys(user_id, kind)[3])
+
+    def clear(self, user_id, kind):
+        self.redis.delete(*self._keys(user_id, kind)[:3])
+
+    def replace(self, user_id, kind, pk, members):
+        zset, by_id = self._keys(user_id, kind)[:2]
+        # one script, so concurrent edits of a row can't both remove the same old members
+        self._replace(keys=[zset, by_id], args=[pk, json.dumps(members, ensure_ascii=False), *members])
+
+    def bulk_load(self, user_id, kind, rows):
+        zset, by_id = self._keys(user_id, kind)[:2]
+        pipe = self.redis.pipeline(transaction=False)
+        for pk, members in rows:
+            self._load(keys=[zset, by_id], args=[pk, json.dumps(members, ensure_ascii=False), *members], client=pipe)
+        pipe.execute()
+
+    def lookup(self, user_id, kind, prefix, count):
+        zset = self._keys(user_id, kind)[0]
+        # bounds as bytes: 0xff sorts after every UTF-8 encoded continuation of the prefix
+        start = b"[" + prefix.encode()
+        members = self.redis.zrangebylex(zset, start, start + b"\xff", start=0, num=count)
+        return [m.decode() if isinstance(m, bytes) else m for m in members]
+
+
+class CacheTypeaheadStore:
+    """
+    Fallback for caches without Redis (tests, local runs): a sorted member list
+    kept in the Django cache and searched with bisect.
+    """
+
+    def _key(self, user_id, kind):
+        return f"typeahead:{user_id}:{kind}"
+
+    def _load(self, user_id, kind):
+        return cache.get(self._key(user_id, kind))
+
+    def is_ready(self, user_id, kind):
+        return cache.get(f"{self._key(user_id, kind)}:ready") is not None
+
+    def accepts_writes(self, user_id, kind):
+        key = self._key(user_id, kind)
+        return bool(cache.get_many([f"{key}:ready", f"{key}:building"]))
+
+    def start_build(self, user_id, kind):
+        return cache.add(f"{self._key(user_id, kind)}:building", 1, BUILD_TTL)
+
+    def finish_build(self, user_id, kind):
+        key = self._key(user_id, kind)
+        cache.set(f"{key}:ready", 1, None)
+        cache.delete(f"{key}:building")
+
+    def abort_build(self, user_id, kind):
+        cache.delete(f"{self._key(user_id, kind)}:building")
+
+    def clear(self, user_id, kind):
+        key = self._key(user_id, kind)
+        cache.delete_many([key, f"{key}:ready"])
+
+    def replace(self, user_id, kind, pk, members):
+        index = self._load(user_id, kind) or {"members": [], "by_id": {}}
+        old = set(index["by_id"].pop(str(pk), []))
+        merged = set(index["members"]) - old | set(members)
+        index["members"] = sorted(merged)
+        if members:
+            index["by_id"][str(pk)] = members
+        cache.set(self._key(user_id, kind), index, None)
+
+    def bulk_load(self, user_id, kind, rows):
+        index = self._load(user_id, kind) or {"members": [], "by_id": {}}
+        merged = set(index["members"])
+        for pk, members in rows:
+            # rows written while the build ran are already there, and newer
+            if str(pk) not in index["by_id"]:
+                merged.update(members)
+                index["by_id"][str(pk)] = members
+        index["members"] = sorted(merged)
+        cache.set(self._key(user_id, kind), index, None)
+
+    def lookup(self, user_id, kind, prefix, count):
+        members = (self._load(user_id, kind) or {}).get("members", [])
+        start = bisect.bisect_left(members, prefix)
+        end = bisect.bisect_right(members, f"{prefix}\U0010ffff")
+        return members[start:min(end, start + count)]
+
+
+def get_store():
+    if "django_redis" in settings.CACHES["default"]["BACKEND"]:
+        return RedisTypeaheadStore()
+    return CacheTypeaheadStore()
+
+
+def build(store, user_id, kind):
+    """
+    Load one user's index from the database; False if another worker is already
+    building it. The index only counts as ready once the load has finished, so
+    one that dies halfway is built again after BUILD_TTL.
+    """
+    if not store.start_build(user_id, kind):
+        return False
+    # writes that land during the build are applied as they happen (see refresh_object)
+    spec = TYPEAHEAD_SPECS[kind]
+    try:
+        rows = spec.model.objects.filter(user_id=user_id).values_list("pk", *spec.fields).iterator(chunk_size=2000)
+        store.bulk_load(user_id, kind, ((row[0], members_for(spec, row[0], row[1:])) for row in rows))
+    except Exception:
+        store.abort_build(user_id, kind)
+        raise
+    store.finish_build(user_id, kind)
+    return True
+
+
+def rebuild(kinds=None, user_ids=None):
+    """Drop and rebuild the indexes of `user_ids` (default: every user with rows); returns how many were built."""
+    store = get_store()
+    built = 0
+    for kind in kinds or TYPEAHEAD_SPECS:
+        model = TYPEAHEAD_SPECS[kind].model
+        users = user_ids or model.objects.order_by().values_list("user_id", flat=True).distinct()
+        for user_id in users:
+            store.clear(user_id, kind)
+            built += build(store, user_id, kind)
+    return built
+
+
+def _ensure_built(store, user_id, kind):
+    if not store.is_ready(user_id, kind):
+        build(store, user_id, kind)
+
+
+def suggest(user_id, kind, text, limit=10):
+    """Top `limit` distinct suggestions whose name (or a later word of it) starts with `text`."""
+    prefix = normalize(text)
+    if not prefix:
+        return []
+    spec = TYPEAHEAD_SPECS[kind]
+    store = get_store()
+    _ensure_built(store, user_id, kind)
+
+    results, seen = [], set()
+    # the same person is often stored on several rows; over-fetch to fill `limit` distinct entries
+    for member in store.lookup(user_id, kind, prefix, limit * 4):
+        suggestion = _suggestion(spec, member)
+        identity = tuple(normalize(str(suggestion[f])) for f in spec.fields)
+        if identity in seen:
+            continue
+        seen.add(identity)
+        results.append(suggestion)
+        if len(results) == limit:
+            break
+    return results
+
+
+def refresh_object(obj, deleted=False):
+    kind = KIND_BY_MODEL[type(obj)]
+    store = get_store()
+    if not store.accepts_writes(obj.user_id, kind):
+        return  # built from the database on first lookup
+    spec = TYPEAHEAD_SPECS[kind]
+    members = [] if deleted else members_for(spec, obj.pk, [getattr(obj, f) for f in spec.fields])
+    store.replace(obj.user_id, kind, obj.pk, members)
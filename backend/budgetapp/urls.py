@@ -4,7 +4,8 @@ from .views import (EventViewSet, BudgetItemViewSet, PledgeViewSet,
                      DashboardAPIView, MpesaInfoView, LoginView, 
                      LogoutView, RegisterView, ChangePasswordView,VendorPaymentViewSet, 
                      ManualPaymentViewSet,ServiceProviderViewSet, TaskViewSet, UserSettingsView, MpesaPaymentViewSet
-                     , RecentActivityView
+                     , RecentActivityView, ExportView, FundingSeriesView, ForecastView,
+                     SearchView, TypeaheadView, MetricsView, ProfileTokenView, EventShareView, PublicProgressView
 )
 from drf_spectacular.views import SpectacularAPIView, SpectacularRedocView, SpectacularSwaggerView
 
@@ -15,9 +16,14 @@ urlpatterns = [
     path('pledges/', PledgeViewSet.as_view({'get': 'list', 'post': 'create'}), name='pledge-list'),
     path('manual-payments/', ManualPaymentViewSet.as_view({'get': 'list', 'post': 'create'}), name='manual-payment-list'),
     path('pledges/<int:pledge_id>/manual-payments/', ManualPaymentViewSet.as_view({'get': 'list', 'post': 'create'}), name='pledge-manual-payment-list'),
+    path('events/<int:event_id>/pledges/', PledgeViewSet.as_view({'get': 'list'}), name='event-pledge-list'),
     path('pledges/<int:pk>/', PledgeViewSet.as_view({'get': 'retrieve', 'put': 'update',    'delete': 'destroy'}), name='pledge-detail'),
     path('events/', EventViewSet.as_view({'get': 'list', 'post': 'create'}), name='event-list'),
     path('events/<int:pk>/', EventViewSet.as_view({'get': 'retrieve', 'put': 'update', 'delete': 'destroy'}), name='event-detail'),
+    path('events/<int:pk>/funding-series/', FundingSeriesView.as_view(), name='event-funding-series'),
+    path('events/<int:pk>/forecast/', ForecastView.as_view(), name='event-forecast'),
+    path('events/<int:pk>/share/', EventShareView.as_view(), name='event-share'),
+    path('public/events/<str:token>/', PublicProgressView.as_view(), name='public-progress'),
     path('login/', LoginView.as_view(), name='login'),
     path('logout/', LogoutView.as_view(), name='logout'),
     path('api-auth/', include('rest_framework.urls')), 
@@ -31,12 +37,18 @@ urlpatterns = [
     path('vendor-payments/<int:pk>/', VendorPaymentViewSet.as_view({'get': 'retrieve', 'put': 'update', 'delete': 'destroy'}), name='vendorpayment-detail'),
     path('dashboard/', DashboardAPIView.as_view(), name='general-dashboard'),
     path('dashboard/<int:pk>/', DashboardAPIView.as_view(), name='event-dashboard'),
+    path('budget-items/<int:budget_item_id>/tasks/', TaskViewSet.as_view({'get': 'list'}), name='budget-item-task-list'),
     path('tasks/', TaskViewSet.as_view({'get': 'list', 'post': 'create'}), name='task-list'),
     path('tasks/<int:pk>/', TaskViewSet.as_view({'get': 'retrieve', 'put': 'update', 'delete': 'destroy'}), name='task-detail'),
     path('user-settings/', UserSettingsView.as_view(), name='user-settings'),
     path('mpesa-payments/', MpesaPaymentViewSet.as_view({'get': 'list', 'post': 'create'}), name='mpesa-payment-list'),
     path('mpesa-payments/<int:pk>/', MpesaPaymentViewSet.as_view({'get': 'retrieve', 'put': 'update', 'delete': 'destroy'}), name='mpesa-payment-detail'),
     path('recent-activities/', RecentActivityView.as_view(), name='recent-activities'),
+    path('exports/<str:kind>.<str:fmt>', ExportView.as_view(), name='export'),
+    path('search/', SearchView.as_view(), name='search'),
+    path('metrics/', MetricsView.as_view(), name='metrics'),
+    path('profiling/token/', ProfileTokenView.as_view(), name='profiling-token'),
+    path('typeahead/', TypeaheadView.as_view(), name='typeahead'),
   
     
 ]
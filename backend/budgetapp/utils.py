@@ -1,4 +1,6 @@
 # utils.py
+import re
+
 from rest_framework.views import exception_handler
 
 def custom_exception_handler(exc, context):
@@ -6,3 +8,26 @@ def custom_exception_handler(exc, context):
     if response is not None:
         response.data['status_code'] = response.status_code
     return response
+
+
+_SQL_SAVEPOINTS = re.compile(r"\b(SAVEPOINT)\s+[`\"]?\w+[`\"]?", re.IGNORECASE)
+_SQL_STRINGS = re.compile(r"'(?:[^'\\]|''|\\.)*'")
+_SQL_NUMBERS = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+# DB-API placeholders: the SQL execute_wrapper hooks see is parameterized, not interpolated
+_SQL_PLACEHOLDERS = re.compile(r"%s")
+_SQL_LISTS = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SQL_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_sql(sql):
+    """
+    Reduce a SQL statement to its shape: literals and `%s` placeholders become
+    `?`, IN lists and savepoint names collapse, so the same query with other
+    values, whether interpolated or parameterized, compares equal.
+    """
+    sql = _SQL_SAVEPOINTS.sub(r"\1 ?", sql)
+    sql = _SQL_STRINGS.sub("?", sql)
+    sql = _SQL_NUMBERS.sub("?", sql)
+    sql = _SQL_PLACEHOLDERS.sub("?", sql)
+    sql = _SQL_LISTS.sub("(?)", sql)
+    return _SQL_WHITESPACE.sub(" ", sql).strip()
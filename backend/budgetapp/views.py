@@ -1,7 +1,7 @@
 # views.py
 from rest_framework import viewsets, generics, status
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.permissions import IsAuthenticated, AllowAny, IsAdminUser
 from django.contrib.auth import authenticate
 from rest_framework import serializers
 from rest_framework.views import APIView
@@ -16,7 +16,7 @@ from .serializers import (
     EventSerializer, BudgetItemSerializer, PledgeSerializer, 
     ManualPaymentSerializer, MpesaInfoSerializer, VendorPaymentSerializer, 
     ServiceProviderSerializer, RegisterSerializer, ChangePasswordSerializer, 
-    TaskSerializer, LoginSerializer, UserSettingsSerializer, MpesaPaymentSerializer
+    TaskSerializer, LoginSerializer, UserSettingsSerializer, MpesaPaymentSerializer, EventShareSerializer
 )
 from django.core.exceptions import ValidationError as DjangoValidationError
 from django.contrib.auth import update_session_auth_hash
@@ -24,7 +24,22 @@ from datetime import date, timedelta
 from django.db.models import Sum
 from django.utils import timezone
 from rest_framework.pagination import PageNumberPagination
+from django.conf import settings
 from django.core.cache import cache
+from .cache import get_or_compute
+from .exports import EXPORTS, FORMATS, export_rows
+from .concurrency import ConditionalUpdateMixin
+from .idempotency import IdempotentCreateMixin
+from .rollups import funding_series, MAX_SERIES_DAYS
+from .forecasting import cached_forecast
+from . import metrics, profiling, search, sharing, typeahead
+from .filters import (
+    EventFilter, BudgetItemFilter, TaskFilter, PledgeFilter, MpesaPaymentFilter,
+    ManualPaymentFilter, VendorPaymentFilter, ServiceProviderFilter
+)
+from django.http import HttpResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils.cache import patch_cache_control
 from django.db.models.deletion import ProtectedError
 from rest_framework import status, serializers
 from rest_framework.response import Response
@@ -118,7 +133,7 @@ class EventPagination(PageNumberPagination):
             'results': data
         })
 
-class EventViewSet(viewsets.ModelViewSet):
+class EventViewSet(IdempotentCreateMixin, ConditionalUpdateMixin, viewsets.ModelViewSet):
     """
     CRUD operations for Events.
     Each event is linked to the authenticated user.
@@ -130,6 +145,7 @@ class EventViewSet(viewsets.ModelViewSet):
     throttle_classes = [ScopedRateThrottle]
     throttle_scope = "event"
     pagination_class = EventPagination
+    filterset_class = EventFilter
 
     
 
@@ -144,7 +160,7 @@ class EventViewSet(viewsets.ModelViewSet):
             user = self.request.user
             if not user or not user.is_authenticated:
                 return Event.objects.none()  # return empty queryset instead of crashing
-            return Event.objects.filter(user=user).order_by('-event_date', 'name')
+            return Event.objects.filter(user=user).with_totals().order_by('-event_date', 'name')
         except Exception as e:
             logger.error(f"Error fetching events for user {self.request.user}: {e}")
             return Event.objects.none()
@@ -164,7 +180,7 @@ class EventViewSet(viewsets.ModelViewSet):
             )
         return Response(status=status.HTTP_204_NO_CONTENT)
 
-class BudgetItemViewSet(viewsets.ModelViewSet):
+class BudgetItemViewSet(IdempotentCreateMixin, ConditionalUpdateMixin, viewsets.ModelViewSet):
     """
     CRUD operations for budget items tied to an event.
     Ensures validation errors are properly raised as DRF ValidationErrors.
@@ -173,13 +189,14 @@ class BudgetItemViewSet(viewsets.ModelViewSet):
     authentication_classes = [JWTAuthentication]
     permission_classes = [IsAuthenticated]
     pagination_class = EventPagination
+    filterset_class = BudgetItemFilter
 
 
     def get_queryset(self):
         user = self.request.user
         if not user or not user.is_authenticated:
             return BudgetItem.objects.none()  # return empty queryset instead of crashing
-        return BudgetItem.objects.filter(user=user)
+        return BudgetItem.objects.filter(user=user).with_totals()
 
     def perform_create(self, serializer):
         try:
@@ -203,7 +220,7 @@ class BudgetItemViewSet(viewsets.ModelViewSet):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class TaskViewSet(viewsets.ModelViewSet):
+class TaskViewSet(IdempotentCreateMixin, viewsets.ModelViewSet):
     """
     CRUD operations for tasks linked to budget items and events.
     """
@@ -211,6 +228,7 @@ class TaskViewSet(viewsets.ModelViewSet):
     authentication_classes = [JWTAuthentication]
     permission_classes = [IsAuthenticated]
     pagination_class = EventPagination
+    filterset_class = TaskFilter
 
     def get_queryset(self):
         try:
@@ -227,7 +245,7 @@ class TaskViewSet(viewsets.ModelViewSet):
         
 
 
-class PledgeViewSet(viewsets.ModelViewSet):
+class PledgeViewSet(IdempotentCreateMixin, ConditionalUpdateMixin, viewsets.ModelViewSet):
     """
     CRUD operations for pledges towards events.
     """
@@ -235,6 +253,7 @@ class PledgeViewSet(viewsets.ModelViewSet):
     authentication_classes = [JWTAuthentication]
     permission_classes = [IsAuthenticated]
     pagination_class = EventPagination
+    filterset_class = PledgeFilter
     throttle_classes = [EventScopedThrottle, UserWriteThrottle]
 
     def retrieve(self, request, *args, **kwargs):
@@ -245,12 +264,12 @@ class PledgeViewSet(viewsets.ModelViewSet):
 
     def perform_create(self, serializer):
         """Assign pledge to event and user on create."""
+        # the serializer has already loaded and validated the event
+        event = serializer.validated_data.get('event')
+        if event is None:
+            raise serializers.ValidationError({"event": "Event does not exist."})
         try:
-            event_id = self.request.data.get('event')
-            event = Event.objects.get(id=event_id)
             serializer.save(user=self.request.user, event=event)
-        except Event.DoesNotExist:
-            raise serializers.ValidationError({"event": "Event does not exist."})
         except DjangoValidationError as e:
             raise serializers.ValidationError(e.message_dict)
 
@@ -273,7 +292,7 @@ class PledgeViewSet(viewsets.ModelViewSet):
             })
         return Response(status=status.HTTP_204_NO_CONTENT)
     
-class MpesaPaymentViewSet(viewsets.ModelViewSet):
+class MpesaPaymentViewSet(IdempotentCreateMixin, viewsets.ModelViewSet):
     """
     CRUD for M-Pesa payments made by users.
     """
@@ -281,6 +300,7 @@ class MpesaPaymentViewSet(viewsets.ModelViewSet):
     authentication_classes = [JWTAuthentication]
     permission_classes = [IsAuthenticated]
     pagination_class = EventPagination
+    filterset_class = MpesaPaymentFilter
 
     def get_queryset(self):
         return MpesaPayment.objects.filter(user=self.request.user)
@@ -291,8 +311,14 @@ class MpesaPaymentViewSet(viewsets.ModelViewSet):
         except DjangoValidationError as e:
             raise serializers.ValidationError(e.message_dict)
 
+    def perform_update(self, serializer):
+        try:
+            serializer.save()
+        except DjangoValidationError as e:
+            raise serializers.ValidationError(e.message_dict)
+
 
-class ManualPaymentViewSet(viewsets.ModelViewSet):
+class ManualPaymentViewSet(IdempotentCreateMixin, viewsets.ModelViewSet):
     """
     CRUD for manual (non-M-Pesa) payments linked to pledges.
     """
@@ -300,12 +326,13 @@ class ManualPaymentViewSet(viewsets.ModelViewSet):
     authentication_classes = [JWTAuthentication]
     permission_classes = [IsAuthenticated]
     pagination_class = EventPagination
+    filterset_class = ManualPaymentFilter
 
     def get_queryset(self):
         pledge_id = self.kwargs.get('pledge_id')
         if pledge_id:
-            return ManualPayment.objects.filter(pledge_id=pledge_id, user=self.request.user)
-        return ManualPayment.objects.filter(user=self.request.user)
+            return ManualPayment.objects.filter(pledge_id=pledge_id, user=self.request.user).select_related('pledge')
+        return ManualPayment.objects.filter(user=self.request.user).select_related('pledge')
 
     def perform_create(self, serializer):
         try:
@@ -346,7 +373,7 @@ class MpesaInfoView(viewsets.ModelViewSet):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class VendorPaymentViewSet(viewsets.ModelViewSet):
+class VendorPaymentViewSet(IdempotentCreateMixin, viewsets.ModelViewSet):
     """
     Manage payments to service providers for budget items.
     """
@@ -354,6 +381,7 @@ class VendorPaymentViewSet(viewsets.ModelViewSet):
     authentication_classes = [JWTAuthentication]
     permission_classes = [IsAuthenticated]
     pagination_class = EventPagination
+    filterset_class = VendorPaymentFilter
 
     def get_queryset(self):
         return VendorPayment.objects.filter(user=self.request.user)
@@ -365,7 +393,7 @@ class VendorPaymentViewSet(viewsets.ModelViewSet):
             raise serializers.ValidationError(e.message_dict)
 
 
-class ServiceProviderViewSet(viewsets.ModelViewSet):
+class ServiceProviderViewSet(IdempotentCreateMixin, viewsets.ModelViewSet):
     """
     Manage service providers linked to budget items.
     """
@@ -373,9 +401,10 @@ class ServiceProviderViewSet(viewsets.ModelViewSet):
     authentication_classes = [JWTAuthentication]
     permission_classes = [IsAuthenticated]
     pagination_class = EventPagination
+    filterset_class = ServiceProviderFilter
 
     def get_queryset(self):
-        return ServiceProvider.objects.filter(user=self.request.user)
+        return ServiceProvider.objects.filter(user=self.request.user).with_totals()
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
@@ -497,7 +526,7 @@ class DashboardAPIView(APIView):
         user = request.user
         if pk:
             try:
-                event = Event.objects.get(id=pk, user=user)
+                event = Event.objects.with_totals().get(id=pk, user=user)
                 return Response(self._get_event_data(event))
             except Event.DoesNotExist:
                 return Response({"error": "Event not found"}, status=404)
@@ -514,7 +543,7 @@ class DashboardAPIView(APIView):
                 'outstanding_balance': event.outstanding_balance(),
             },
             'pledges': PledgeSerializer(event.pledges.all(), many=True).data,
-            'budget_items': BudgetItemSerializer(event.budget_items.all(), many=True).data,
+            'budget_items': BudgetItemSerializer(event.budget_items.with_totals(), many=True).data,
             'tasks': TaskSerializer(Task.objects.filter(budget_item__event=event), many=True).data,
             'budget_summary': event.budget_summary(),
         }
@@ -531,7 +560,7 @@ class DashboardAPIView(APIView):
                 'total_budget': events.aggregate(total=Sum('total_budget'))['total'] or 0,
             },
             'upcoming_events': EventSerializer(
-                events.filter(event_date__gte=now.date()).order_by('event_date')[:5],
+                events.with_totals().filter(event_date__gte=now.date()).order_by('event_date')[:5],
                 many=True
             ).data,
         }
@@ -580,11 +609,14 @@ class RecentActivityView(APIView):
 
     def get(self, request):
         user = request.user
-        cache_key = f"recent_activity:{user.id}"
-        data = cache.get(cache_key)
-        if data:
-            return Response(data)
+        data = get_or_compute(
+            f"recent_activity:{user.id}",
+            lambda: self._build_activity(user),
+            ttl=30,
+        )
+        return Response(data)
 
+    def _build_activity(self, user):
         # detect timestamp field per model
         event_ts = self._get_ts_field(Event)
         pledge_ts = self._get_ts_field(Pledge)
@@ -608,8 +640,225 @@ class RecentActivityView(APIView):
 
         # sort by the ISO 'created' string descending and limit total items
         activity.sort(key=lambda x: x.get("created", "1970-01-01T00:00:00"), reverse=True)
-        data = activity[:10]
+        return activity[:10]
 
-        # cache for short period
-        cache.set(cache_key, data, 30)
-        return Response(data)
+
+class ExportView(APIView):
+    """
+    Streams all of the user's pledges, M-Pesa payments, manual payments or
+    vendor payments as CSV or NDJSON, optionally limited to one event
+    (`?event=<id>`). Rows are written as they are read, so memory stays flat
+    and the header goes out before the first query finishes.
+    """
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAuthenticated]
+    throttle_classes = [ScopedRateThrottle]
+    throttle_scope = "export"
+
+    def get(self, request, kind, fmt):
+        spec = EXPORTS.get(kind)
+        if spec is None or fmt not in FORMATS:
+            return Response({"detail": "Unknown export."}, status=status.HTTP_404_NOT_FOUND)
+
+        event_id = request.query_params.get("event")
+        if event_id is not None:
+            if not event_id.isdigit() or not Event.objects.filter(id=event_id, user=request.user).exists():
+                return Response({"error": "Event not found"}, status=status.HTTP_404_NOT_FOUND)
+            event_id = int(event_id)
+
+        content_type, render = FORMATS[fmt]
+        rows = export_rows(spec, request.user, event_id=event_id)
+        response = StreamingHttpResponse(render(spec, rows), content_type=content_type)
+        filename = f"{kind}-event-{event_id}.{fmt}" if event_id else f"{kind}.{fmt}"
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
+
+
+class FundingSeriesView(APIView):
+    """
+    Day-by-day contributions for one event, read from the DailyEventTotals rollup.
+
+    Query params `start` and `end` (YYYY-MM-DD) default to the event's creation
+    date and today. Days without payments are returned with zero totals.
+    """
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk):
+        try:
+            event = Event.objects.get(id=pk, user=request.user)
+        except Event.DoesNotExist:
+            return Response({"error": "Event not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        try:
+            start = date.fromisoformat(request.query_params.get("start", event.created_on.isoformat()))
+            end = date.fromisoformat(request.query_params.get("end", timezone.localdate().isoformat()))
+        except ValueError:
+            return Response({"detail": "Dates must be in YYYY-MM-DD format."}, status=status.HTTP_400_BAD_REQUEST)
+        if start > end:
+            return Response({"detail": "start must not be after end."}, status=status.HTTP_400_BAD_REQUEST)
+        if (end - start).days >= MAX_SERIES_DAYS:
+            return Response(
+                {"detail": f"Date range cannot exceed {MAX_SERIES_DAYS} days."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        return Response({
+            "event": event.id,
+            "start": start,
+            "end": end,
+            "series": funding_series(event, start, end),
+        })
+
+
+class ForecastView(APIView):
+    """
+    Projected collection of an event's outstanding pledges by its event date,
+    based on how the user's past events collected. Cached per event version.
+    """
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk):
+        try:
+            event = Event.objects.get(id=pk, user=request.user)
+        except Event.DoesNotExist:
+            return Response({"error": "Event not found"}, status=status.HTTP_404_NOT_FOUND)
+        return Response(cached_forecast(event))
+
+
+class SearchView(APIView):
+    """
+    Ranked search over the user's pledges, service providers, events and budget items.
+
+    - `q`: search text; words of 3+ characters match anywhere, shorter words match prefixes.
+    - `types`: optional comma separated subset of pledge, service_provider, event, budget_item.
+    - `limit`: max results (default 20, max 100).
+    """
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        text = request.query_params.get("q", "").strip()
+        kinds = [k for k in request.query_params.get("types", "").split(",") if k]
+        unknown = set(kinds) - set(search.SEARCH_SPECS)
+        if unknown:
+            return Response(
+                {"types": f"Unknown types: {', '.join(sorted(unknown))}."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            limit = min(max(int(request.query_params.get("limit", 20)), 1), 100)
+        except ValueError:
+            limit = 20
+        return Response({"query": text, "results": search.search(request.user, text, kinds, limit)})
+
+
+class TypeaheadView(APIView):
+    """
+    Autocomplete for the pledge and vendor-payment forms.
+
+    - `kind`: `pledger` or `vendor`.
+    - `q`: what has been typed so far; matches the start of any word of the name.
+    - `limit`: max suggestions (default 10, max 25).
+    """
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        kind = request.query_params.get("kind", "pledger")
+        if kind not in typeahead.TYPEAHEAD_SPECS:
+            return Response({"kind": "Must be one of: pledger, vendor."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = min(max(int(request.query_params.get("limit", 10)), 1), typeahead.MAX_LIMIT)
+        except ValueError:
+            limit = 10
+        text = request.query_params.get("q", "")
+        return Response({"results": typeahead.suggest(request.user.id, kind, text, limit)})
+
+
+class MetricsView(APIView):
+    """
+    Request, database, throttle, cache and signal metrics of every worker,
+    in the Prometheus text format. Staff only; not throttled so scrapers can poll it.
+    """
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAdminUser]
+    throttle_classes = []
+
+    def get(self, request):
+        return HttpResponse(metrics.registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+class ProfileTokenView(APIView):
+    """
+    Issue a single-use token for profiling one request. Send it as the
+    X-Profile-Token header (or `?_profile=`) on the request to profile; the
+    response's X-Profile header names the .pstats/.json pair written to PROFILE_DIR.
+    """
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAdminUser]
+
+    def post(self, request):
+        return Response({
+            "token": profiling.issue_token(request.user),
+            "expires_in": settings.PROFILE_TOKEN_MAX_AGE,
+        }, status=status.HTTP_201_CREATED)
+
+
+class EventShareView(APIView):
+    """
+    Share an event's progress publicly. POST issues a new unguessable link
+    (revoking any previous one) and optionally sets how many top contributors
+    it lists; DELETE stops sharing.
+    """
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, pk):
+        try:
+            event = Event.objects.get(id=pk, user=request.user)
+        except Event.DoesNotExist:
+            return Response({"error": "Event not found"}, status=status.HTTP_404_NOT_FOUND)
+        serializer = EventShareSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        token = sharing.share(event, serializer.validated_data.get("top_contributors"))
+        return Response({
+            "token": token,
+            "url": request.build_absolute_uri(reverse("public-progress", args=[token])),
+            "top_contributors": event.public_top_contributors,
+        }, status=status.HTTP_201_CREATED)
+
+    def delete(self, request, pk):
+        try:
+            event = Event.objects.get(id=pk, user=request.user)
+        except Event.DoesNotExist:
+            return Response({"error": "Event not found"}, status=status.HTTP_404_NOT_FOUND)
+        sharing.unshare(event)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class PublicProgressView(APIView):
+    """
+    Public, read-only fundraising progress for a shared event: name, target,
+    amount raised and optionally the top contributors. Served from a cached
+    snapshot with shared-cache headers, so nginx/CDN absorb most viewers.
+    """
+    authentication_classes = []
+    permission_classes = [AllowAny]
+    throttle_classes = [ScopedRateThrottle]
+    throttle_scope = "public_progress"
+
+    def get(self, request, token):
+        snapshot = sharing.cached_progress(token)
+        if snapshot is None:
+            response = Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
+        else:
+            response = Response(snapshot)
+        patch_cache_control(
+            response, public=True,
+            max_age=settings.PUBLIC_PROGRESS_MAX_AGE,
+            s_maxage=settings.PUBLIC_PROGRESS_S_MAXAGE,
+            stale_while_revalidate=settings.PUBLIC_PROGRESS_S_MAXAGE,
+        )
+        return response
@@ -1,43 +1,338 @@
-from locust import HttpUser, task, between
+"""
+Load-test workload for the budget API.
 
-ADMIN_USER = {"username": "ben", "password": "ben60367"}
+Personas (by weight):
+- organizer (6): browses dashboards, charts, forecasts, search and type-ahead
+- treasurer (3): records pledges and manual payments, reviews payment lists
+- M-Pesa callback storm (1): bursts of payment confirmations against open pledges
+- bulk importer (1): loads a batch of pledges and payments, then exports them
+
+Every run seeds its own accounts with `manage.py seed_benchmark_data` (a fresh
+seed each time), so runs never share or accumulate data. Run headless against
+a local server:
+
+    THROTTLE_RATE_OVERRIDES="user=1000000/day,user_write=6000/min,pledge_per_event=6000/min,event=6000/min" \\
+        python manage.py runserver
+    locust -f locustfile.py --headless -u 60 -r 10 -t 5m --host http://localhost:8000
+
+The run exits non-zero when an endpoint misses its p95/p99 latency or error-rate
+SLO, or when too many of its requests were throttled. Throttled (429) responses
+are reported under "<name> [throttled]" rather than as errors, but a run full
+of them measures the rate limiter instead of the app.
+
+For distributed runs (or a server whose database this machine can't reach),
+seed once yourself and pass `--accounts-seed <seed>` so every worker uses the
+same accounts.
+"""
+import itertools
+import logging
+import os
+import random
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+import requests
+from locust import HttpUser, between, events, task
+from locust.runners import WorkerRunner
+
+
+logger = logging.getLogger(__name__)
+
+MANAGE_PY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "manage.py")
+ACCOUNTS = int(os.environ.get("LOADTEST_ACCOUNTS", 20))
+PASSWORD = "benchmark"
+
+# "<METHOD> <name>" -> (p95 ms, p99 ms, max error ratio)
+SLOS = {
+    # password hashing is deliberately slow; logins happen once per account per process
+    "POST /api/login/": (2000, 5000, 0.0),
+    "GET /api/dashboard/": (400, 1000, 0.01),
+    "GET /api/dashboard/[id]/": (800, 2000, 0.01),
+    "GET /api/events/": (300, 800, 0.01),
+    "GET /api/events/[id]/": (200, 500, 0.01),
+    "GET /api/events/[id]/funding-series/": (300, 800, 0.01),
+    "GET /api/events/[id]/forecast/": (600, 1500, 0.01),
+    "GET /api/recent-activities/": (200, 500, 0.01),
+    "GET /api/search/": (300, 800, 0.01),
+    "GET /api/typeahead/": (100, 250, 0.01),
+    "GET /api/pledges/": (300, 800, 0.01),
+    "GET /api/pledges/[id]/": (200, 500, 0.01),
+    "GET /api/manual-payments/": (300, 800, 0.01),
+    "GET /api/mpesa-payments/": (300, 800, 0.01),
+    "POST /api/pledges/": (400, 1000, 0.01),
+    "POST /api/pledges/[id]/manual-payments/": (400, 1000, 0.01),
+    "POST /api/mpesa-payments/": (300, 800, 0.005),
+    "GET /api/exports/pledges.csv": (3000, 8000, 0.01),
+    "GET /api/exports/manual-payments.ndjson": (3000, 8000, 0.01),
+}
+DEFAULT_SLO = (500, 1500, 0.01)
+SLO_SCALE = float(os.environ.get("LOADTEST_SLO_SCALE", 1.0))
+MAX_THROTTLED_RATIO = float(os.environ.get("LOADTEST_MAX_THROTTLED", 0.05))
+# below this many requests percentiles are noise; such endpoints are reported, not judged
+MIN_SAMPLES = 20
+THROTTLED_SUFFIX = " [throttled]"
+
+_accounts = []
+_account_cycle = None
+# username -> {"access", "refresh", "events", "pledges"}, shared by every simulated user in this process
+_sessions = {}
+
+
+@events.init_command_line_parser.add_listener
+def add_arguments(parser):
+    parser.add_argument("--accounts-seed", type=int, default=0,
+                        help="Use accounts already seeded with this seed instead of seeding new ones.")
+
+
+@events.test_start.add_listener
+def seed_accounts(environment, **kwargs):
+    global _account_cycle
+    seed = environment.parsed_options.accounts_seed
+    if not seed:
+        if isinstance(environment.runner, WorkerRunner):
+            raise RuntimeError("Workers need --accounts-seed; seed the accounts once before a distributed run.")
+        seed = int(time.time()) % 10 ** 9
+        logger.info(f"Seeding {ACCOUNTS} load-test accounts (seed {seed})")
+        subprocess.run(
+            [sys.executable, MANAGE_PY, "seed_benchmark_data", "--seed", str(seed), "--users", str(ACCOUNTS),
+             "--events-per-user", "3", "--pledges-per-event", "150", "--password", PASSWORD],
+            check=True,
+        )
+    _accounts[:] = [f"bench{seed}_{i}" for i in range(ACCOUNTS)]
+    _account_cycle = itertools.cycle(_accounts)
 
-class BudgetAppUser(HttpUser):
-    wait_time = between(1, 3)
-    token = None
-    user_id = None
+
+class ApiUser(HttpUser):
+    abstract = True
 
     def on_start(self):
-        res = self.client.post("/api/login/", json=ADMIN_USER)
-        if res.status_code == 200:
-            data = res.json()
-            self.token = data["access"]
-            self.user_id = data["user_id"]
-            print("Login successful, token:", self.token)
-        else:
-            print("Login failed:", res.status_code, res.text)
-
-    def auth_headers(self):
-        return {"Authorization": f"Bearer {self.token}"} if self.token else {}
+        self.username = next(_account_cycle)
+        self.session = _sessions.get(self.username) or self._log_in()
 
-    @task
-    def create_event(self):
-        if not self.token:
-            return
-        event_data = {
-            "name": "Load Test Event",
-            "description": "Created by Locust",
-            "venue": "Virtual Hall",
-            "total_budget": 100000,
-            "event_date": "2030-01-01"
+    def _log_in(self):
+        while True:
+            with self.client.post("/api/login/", json={"username": self.username, "password": PASSWORD},
+                                  catch_response=True) as resp:
+                if resp.status_code == 429:
+                    self._throttled(resp)
+                    time.sleep(float(resp.headers.get("Retry-After", 5)))
+                    continue
+                if resp.status_code != 200:
+                    resp.failure(f"login failed: {resp.status_code}")
+                    raise RuntimeError(f"Could not log in as {self.username}")
+                tokens = resp.json()
+                break
+        self.session = _sessions[self.username] = {
+            "access": tokens["access"], "refresh": tokens["refresh"], "events": [], "pledges": {},
         }
-        res = self.client.post("/api/events/", headers=self.auth_headers(), json=event_data)
-        print("Create event:", res.status_code, res.text)
+        events_page = self.api("GET", "/api/events/") or {}
+        self.session["events"] = [event["id"] for event in events_page.get("results", [])]
+        for event_id in self.session["events"]:
+            page = self.api("GET", "/api/pledges/", params={"event": event_id}) or {}
+            self.session["pledges"][event_id] = [pledge["id"] for pledge in page.get("results", [])]
+        return self.session
+
+    def _throttled(self, resp):
+        # reported as its own successful entry so it neither counts as an error nor skews latencies
+        resp.request_meta["name"] += THROTTLED_SUFFIX
+        resp.success()
+
+    def _refresh(self):
+        response = requests.post(f"{self.host}/api/token/refresh/", json={"refresh": self.session["refresh"]})
+        if response.ok:
+            self.session.update({key: value for key, value in response.json().items() if key in ("access", "refresh")})
+
+    def api(self, method, path, name=None, expect_json=True, **kwargs):
+        """Send an authenticated request; `name` groups URLs that differ only by id."""
+        headers = {"Authorization": f"Bearer {self.session['access']}"}
+        with self.client.request(method, path, name=name or path, headers=headers,
+                                 catch_response=True, **kwargs) as resp:
+            if resp.status_code == 429:
+                self._throttled(resp)
+                return None
+            if resp.status_code == 401:
+                self._refresh()
+            if resp.status_code >= 400:
+                resp.failure(f"{resp.status_code}: {resp.text[:200]}")
+                return None
+            return resp.json() if expect_json and resp.content else None
+
+    def event_id(self):
+        return random.choice(self.session["events"]) if self.session["events"] else None
+
+    def pledge_id(self, event_id=None):
+        event_id = event_id or self.event_id()
+        pledges = self.session["pledges"].get(event_id)
+        return random.choice(pledges) if pledges else None
+
+
+class Organizer(ApiUser):
+    weight = 6
+    wait_time = between(2, 5)
+
+    @task(3)
+    def overview(self):
+        self.api("GET", "/api/dashboard/")
+
+    @task(2)
+    def event_dashboard(self):
+        if event_id := self.event_id():
+            self.api("GET", f"/api/dashboard/{event_id}/", name="/api/dashboard/[id]/")
+
+    @task(2)
+    def browse_events(self):
+        self.api("GET", "/api/events/", params=random.choice([{}, {"is_funded": "false"}, {"event_date_after": "2020-01-01"}]))
+
+    @task
+    def event_detail(self):
+        if event_id := self.event_id():
+            self.api("GET", f"/api/events/{event_id}/", name="/api/events/[id]/")
+
+    @task(2)
+    def funding_chart(self):
+        if event_id := self.event_id():
+            self.api("GET", f"/api/events/{event_id}/funding-series/", name="/api/events/[id]/funding-series/")
+
+    @task(2)
+    def forecast(self):
+        if event_id := self.event_id():
+            self.api("GET", f"/api/events/{event_id}/forecast/", name="/api/events/[id]/forecast/")
+
+    @task(2)
+    def recent_activity(self):
+        self.api("GET", "/api/recent-activities/")
 
     @task
-    def get_events(self):
-        if not self.token:
+    def search(self):
+        self.api("GET", "/api/search/", params={"q": random.choice(["kamau", "wedding", "catering", "otieno", "0712"])})
+
+    @task(2)
+    def type_pledger_name(self):
+        # one request per keystroke, as the search box sends them
+        name = random.choice(["Wanjiku", "Achieng", "Kiprono", "Muthoni"])
+        for length in range(1, 5):
+            self.api("GET", "/api/typeahead/", params={"kind": "pledger", "q": name[:length]})
+            time.sleep(0.15)
+
+
+class Treasurer(ApiUser):
+    weight = 3
+    wait_time = between(1, 3)
+
+    @task(3)
+    def record_manual_payment(self):
+        event_id = self.event_id()
+        if pledge_id := self.pledge_id(event_id):
+            self.api("POST", f"/api/pledges/{pledge_id}/manual-payments/", name="/api/pledges/[id]/manual-payments/",
+                     json={"event": event_id, "pledge": pledge_id, "amount": random.randint(100, 5000)})
+
+    @task
+    def record_pledge(self):
+        if event_id := self.event_id():
+            self.api("POST", "/api/pledges/", json={
+                "event": event_id, "amount_pledged": random.randint(1000, 50000),
+                "name": f"Walk-in {random.randint(1, 10 ** 6)}", "phone_number": f"+2547{random.randint(0, 10 ** 8 - 1):08d}",
+            })
+
+    @task(2)
+    def review_pledges(self):
+        if event_id := self.event_id():
+            self.api("GET", "/api/pledges/", params={"event": event_id, "is_fulfilled": random.choice(["true", "false"])})
+
+    @task
+    def pledge_detail(self):
+        if pledge_id := self.pledge_id():
+            self.api("GET", f"/api/pledges/{pledge_id}/", name="/api/pledges/[id]/")
+
+    @task
+    def review_payments(self):
+        if event_id := self.event_id():
+            self.api("GET", random.choice(["/api/manual-payments/", "/api/mpesa-payments/"]), params={"event": event_id})
+
+
+class MpesaCallbackStorm(ApiUser):
+    """Confirmations arriving back to back, as when a harambee closes and everyone pays at once."""
+    weight = 1
+    wait_time = between(0.05, 0.2)
+    _sequence = itertools.count()
+
+    @task
+    def confirm_payment(self):
+        event_id = self.event_id()
+        if pledge_id := self.pledge_id(event_id):
+            self.api("POST", "/api/mpesa-payments/", json={
+                "event": event_id, "pledge": pledge_id, "amount": random.randint(50, 3000),
+                "transaction_id": f"LT{os.getpid()}{time.time_ns()}{next(self._sequence)}",
+            })
+
+
+class BulkImporter(ApiUser):
+    """Loads a contribution sheet: a batch of pledges, a payment for each, then the exports."""
+    weight = 1
+    wait_time = between(20, 40)
+    batch_size = 25
+
+    @task
+    def import_sheet(self):
+        event_id = self.event_id()
+        if not event_id:
             return
-        res = self.client.get("/api/events/", headers=self.auth_headers())
-        print("Get events:", res.status_code)
-        
\ No newline at end of file
+        for _ in range(self.batch_size):
+            pledge = self.api("POST", "/api/pledges/", json={
+                "event": event_id, "amount_pledged": random.randint(1000, 20000),
+                "name": f"Import {random.randint(1, 10 ** 6)}", "phone_number": f"+2547{random.randint(0, 10 ** 8 - 1):08d}",
+            })
+            if pledge:
+                self.api("POST", f"/api/pledges/{pledge['id']}/manual-payments/", name="/api/pledges/[id]/manual-payments/",
+                         json={"event": event_id, "pledge": pledge["id"], "amount": random.randint(100, 1000)})
+        self.api("GET", "/api/exports/pledges.csv", params={"event": event_id}, expect_json=False)
+        self.api("GET", "/api/exports/manual-payments.ndjson", params={"event": event_id}, expect_json=False)
+
+
+@events.quitting.add_listener
+def check_slos(environment, **kwargs):
+    """Fail the run (exit code 1) when any endpoint misses its SLO."""
+    if isinstance(environment.runner, WorkerRunner):
+        return
+    throttled = defaultdict(int)
+    for (name, method), entry in environment.stats.entries.items():
+        if name.endswith(THROTTLED_SUFFIX):
+            throttled[f"{method} {name[:-len(THROTTLED_SUFFIX)]}"] += entry.num_requests
+
+    violations = []
+    rows = []
+    for (name, method), entry in sorted(environment.stats.entries.items(), key=lambda item: item[0]):
+        if name.endswith(THROTTLED_SUFFIX) or not entry.num_requests:
+            continue
+        name = f"{method} {name}"
+        p95_limit, p99_limit, max_errors = SLOS.get(name, DEFAULT_SLO)
+        p95, p99 = entry.get_response_time_percentile(0.95), entry.get_response_time_percentile(0.99)
+        error_ratio = entry.num_failures / entry.num_requests
+        throttled_ratio = throttled[name] / (entry.num_requests + throttled[name])
+
+        problems = []
+        if entry.num_requests >= MIN_SAMPLES:
+            if p95 > p95_limit * SLO_SCALE:
+                problems.append(f"p95 {p95:.0f}ms > {p95_limit * SLO_SCALE:.0f}ms")
+            if p99 > p99_limit * SLO_SCALE:
+                problems.append(f"p99 {p99:.0f}ms > {p99_limit * SLO_SCALE:.0f}ms")
+        if error_ratio > max_errors:
+            problems.append(f"errors {error_ratio:.1%} > {max_errors:.1%}")
+        if throttled_ratio > MAX_THROTTLED_RATIO:
+            problems.append(f"throttled {throttled_ratio:.1%} > {MAX_THROTTLED_RATIO:.1%}")
+        violations += [f"{name}: {problem}" for problem in problems]
+        status = "FAIL" if problems else ("ok" if entry.num_requests >= MIN_SAMPLES else "few samples")
+        rows.append(f"{name:<48} {entry.num_requests:>7} {p95:>7.0f} {p99:>7.0f} {error_ratio:>7.1%} "
+                    f"{throttled_ratio:>7.1%}  {status}")
+
+    print(f"\n{'endpoint':<48} {'reqs':>7} {'p95':>7} {'p99':>7} {'errors':>7} {'429s':>7}")
+    print("\n".join(rows))
+    if not rows:
+        violations.append("no requests were made")
+    if violations:
+        print("\nSLO violations:\n  " + "\n  ".join(violations))
+        environment.process_exit_code = 1
+    else:
+        print("\nAll endpoints met their SLOs.")
@@ -1,4 +1,5 @@
 import factory
+import factory.fuzzy
 from faker import Faker
 from django.contrib.auth import get_user_model
 from budgetapp.models import (
@@ -9,11 +10,18 @@ from budgetapp.models import (
 faker = Faker()
 User = get_user_model()
 
+# Small pools drawn once from Faker: per-object Faker calls dominate the cost of
+# building tens of thousands of rows for the bulk helpers below.
+NAMES = [faker.name()[:25] for _ in range(500)]
+WORDS = [faker.word() for _ in range(200)]
+SENTENCES = [faker.sentence(nb_words=4) for _ in range(200)]
+COMPANIES = [faker.company()[:200] for _ in range(200)]
+
 class UserFactory(factory.django.DjangoModelFactory):
     class Meta:
         model = User
 
-    username = factory.Faker("user_name")
+    username = factory.Sequence(lambda n: f"user{n}")
     email = factory.Faker("email")
     password = factory.PostGenerationMethodCall("set_password", "testpass123")
 
@@ -24,11 +32,9 @@ class EventFactory(factory.django.DjangoModelFactory):
 
     user = factory.SubFactory(UserFactory)
     name = factory.Faker("sentence", nb_words=3)
-    date = factory.LazyFunction(lambda: faker.date_object())
-    time = factory.Faker("time")
+    event_date = factory.LazyFunction(lambda: faker.future_date(end_date="+365d"))
     venue = factory.Faker("city")
-    total_budget = factory.Faker("pydecimal", left_digits=5, right_digits=2, positive=True)
-    created_by = factory.SelfAttribute("user")
+    total_budget = factory.Faker("pydecimal", left_digits=7, right_digits=2, positive=True)
     description = factory.Faker("paragraph")
 
 
@@ -36,23 +42,23 @@ class BudgetItemFactory(factory.django.DjangoModelFactory):
     class Meta:
         model = BudgetItem
 
-    user = factory.SubFactory(UserFactory)
     event = factory.SubFactory(EventFactory)
-    category = factory.Faker("word")
-    estimated_budget = factory.Faker("pydecimal", left_digits=5, right_digits=2, positive=True)
-    is_funded = factory.Faker("boolean")
+    user = factory.SelfAttribute("event.user")
+    category = factory.Iterator(WORDS)
+    estimated_budget = factory.fuzzy.FuzzyDecimal(100, 999)
+    is_funded = False
 
 
 class PledgeFactory(factory.django.DjangoModelFactory):
     class Meta:
         model = Pledge
 
-    user = factory.SubFactory(UserFactory)
     event = factory.SubFactory(EventFactory)
-    amount_pledged = factory.Faker("pydecimal", left_digits=5, right_digits=2, positive=True)
-    name = factory.Faker("name")
-    phone_number = factory.Faker("phone_number")
-    total_paid = factory.Faker("pydecimal", left_digits=5, right_digits=2, positive=True)
+    user = factory.SelfAttribute("event.user")
+    amount_pledged = factory.fuzzy.FuzzyDecimal(100, 99999)
+    name = factory.Iterator(NAMES)
+    phone_number = factory.Sequence(lambda n: f"+2547{n:08d}")
+    total_paid = 0
 
 
 class MpesaPaymentFactory(factory.django.DjangoModelFactory):
@@ -60,8 +66,10 @@ class MpesaPaymentFactory(factory.django.DjangoModelFactory):
         model = MpesaPayment
 
     pledge = factory.SubFactory(PledgeFactory)
-    amount = factory.Faker("pydecimal", left_digits=5, right_digits=2, positive=True)
-    transaction_id = factory.Faker("uuid4")
+    event = factory.SelfAttribute("pledge.event")
+    user = factory.SelfAttribute("pledge.user")
+    amount = factory.fuzzy.FuzzyDecimal(1, 99)
+    transaction_id = factory.Sequence(lambda n: f"MP{n:010d}")
 
 
 class ManualPaymentFactory(factory.django.DjangoModelFactory):
@@ -69,30 +77,33 @@ class ManualPaymentFactory(factory.django.DjangoModelFactory):
         model = ManualPayment
 
     pledge = factory.SubFactory(PledgeFactory)
-    amount = factory.Faker("pydecimal", left_digits=5, right_digits=2, positive=True)
+    event = factory.SelfAttribute("pledge.event")
+    user = factory.SelfAttribute("pledge.user")
+    amount = factory.fuzzy.FuzzyDecimal(1, 99)
+    date = factory.LazyFunction(lambda: faker.date_this_year())
 
 
 class MpesaInfoFactory(factory.django.DjangoModelFactory):
     class Meta:
         model = MpesaInfo
 
-    checkout_request_id = factory.Faker("uuid4")
-    merchant_request_id = factory.Faker("uuid4")
-    response_code = factory.Faker("random_element", elements=["0", "1", "500"])
-    response_description = factory.Faker("sentence")
-    customer_message = factory.Faker("sentence")
-    phone_number = factory.Faker("phone_number")
+    user = factory.SubFactory(UserFactory)
+    paybill_number = factory.Faker("numerify", text="######")
+    till_number = factory.Faker("numerify", text="######")
+    account_name = factory.Faker("company")
+    phone_number = factory.Sequence(lambda n: f"+2547{n:08d}")
 
 
 class ServiceProviderFactory(factory.django.DjangoModelFactory):
     class Meta:
         model = ServiceProvider
 
-    user = factory.SubFactory(UserFactory)
-    name = factory.Faker("company")
-    service_type = factory.Faker("word")
-    phone_number = factory.Faker("phone_number")
-    event = factory.SubFactory(EventFactory)
+    budget_item = factory.SubFactory(BudgetItemFactory)
+    user = factory.SelfAttribute("budget_item.user")
+    name = factory.Sequence(lambda n: f"{COMPANIES[n % len(COMPANIES)]} {n}")
+    service_type = factory.Iterator(WORDS)
+    phone_number = factory.Sequence(lambda n: f"+2547{n:08d}")
+    amount_charged = factory.SelfAttribute("budget_item.estimated_budget")
 
 
 class VendorPaymentFactory(factory.django.DjangoModelFactory):
@@ -100,17 +111,65 @@ class VendorPaymentFactory(factory.django.DjangoModelFactory):
         model = VendorPayment
 
     service_provider = factory.SubFactory(ServiceProviderFactory)
-    amount = factory.Faker("pydecimal", left_digits=5, right_digits=2, positive=True)
-    date = factory.LazyFunction(lambda: faker.date_object())
+    budget_item = factory.SelfAttribute("service_provider.budget_item")
+    user = factory.SelfAttribute("service_provider.user")
+    payment_method = factory.Iterator(["mpesa", "bank", "cash"])
+    transaction_code = factory.Sequence(lambda n: f"VP{n:010d}")
+    amount = factory.fuzzy.FuzzyDecimal(1, 99)
 
 
 class TaskFactory(factory.django.DjangoModelFactory):
     class Meta:
         model = Task
 
-    event = factory.SubFactory(EventFactory)
-    title = factory.Faker("sentence", nb_words=4)
-    description = factory.Faker("paragraph")
-    deadline = factory.LazyFunction(lambda: faker.future_date())
-    assigned_to = factory.Faker("name")
-    completed = factory.Faker("boolean")
+    budget_item = factory.SubFactory(BudgetItemFactory)
+    user = factory.SelfAttribute("budget_item.user")
+    title = factory.Iterator(SENTENCES)
+    description = factory.Iterator(SENTENCES)
+    allocated_amount = 0
+    amount_paid = 0
+
+
+def bulk_create_batch(factory_class, size, batch_size=1000, **kwargs):
+    """
+    Build `size` objects with `factory_class` and insert them with bulk_create.
+
+    Skips save(), full_clean() and signals, so pass every foreign key explicitly
+    (otherwise each object builds its own unsaved parents) and keep derived
+    fields such as Pledge.total_paid consistent yourself.
+    """
+    objects = factory_class.build_batch(size, **kwargs)
+    return factory_class._meta.model.objects.bulk_create(objects, batch_size=batch_size)
+
+
+def seed_event(user, children, **event_kwargs):
+    """
+    Create one event for `user` with `children` rows of every related model:
+    budget items, service providers, vendor payments, tasks, pledges and
+    M-Pesa and manual payments (one of each per pledge).
+    """
+    event = EventFactory(user=user, **event_kwargs)
+    # parents are re-read after bulk_create: MySQL doesn't return the new primary keys
+    bulk_create_batch(BudgetItemFactory, children, event=event, user=user)
+    items = list(BudgetItem.objects.filter(event=event).order_by("pk"))
+    ServiceProvider.objects.bulk_create([
+        ServiceProviderFactory.build(budget_item=item, user=user) for item in items
+    ], batch_size=1000)
+    providers = ServiceProvider.objects.filter(budget_item__event=event).select_related("budget_item")
+    VendorPayment.objects.bulk_create([
+        VendorPaymentFactory.build(service_provider=provider, budget_item=provider.budget_item, user=user)
+        for provider in providers
+    ], batch_size=1000)
+    Task.objects.bulk_create([
+        TaskFactory.build(budget_item=item, user=user) for item in items
+    ], batch_size=1000)
+
+    bulk_create_batch(PledgeFactory, children, event=event, user=user)
+    pledges = list(Pledge.objects.filter(event=event).order_by("pk"))
+    MpesaPayment.objects.bulk_create([
+        MpesaPaymentFactory.build(pledge=pledge, event=event, user=user) for pledge in pledges
+    ], batch_size=1000)
+    ManualPayment.objects.bulk_create([
+        ManualPaymentFactory.build(pledge=pledge, event=event, user=user) for pledge in pledges
+    ], batch_size=1000)
+    return event
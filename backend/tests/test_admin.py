@@ -0,0 +1,137 @@
+from unittest import mock
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from budgetapp.admin import (
+    BudgetItemAdmin, EventAdmin, ServiceProviderAdmin, VendorPaymentAdmin, EstimatedCountPaginator
+)
+from budgetapp.models import BudgetItem, Event, Pledge, ServiceProvider, Task, VendorPayment
+from tests.factories import EventFactory, ServiceProviderFactory, seed_event
+
+
+# admin -> (model, {sortable column: value the rows should be ordered by})
+CHANGELISTS = {
+    EventAdmin: (Event, {
+        "total_pledged": lambda obj: obj.total_pledged(),
+        "total_received": lambda obj: obj.total_received(),
+        "percentage_covered": lambda obj: obj.percentage_covered(),
+        "outstanding_balance": lambda obj: obj.outstanding_balance(),
+        "excess_amount": lambda obj: obj.overpaid_amount(),
+    }),
+    BudgetItemAdmin: (BudgetItem, {
+        "total_vendor_payments": lambda obj: obj.total_vendor_payments,
+        "remaining_budget": lambda obj: obj.remaining_budget,
+    }),
+    VendorPaymentAdmin: (VendorPayment, {
+        "total_paid": lambda obj: obj.total_paid,
+    }),
+    ServiceProviderAdmin: (ServiceProvider, {
+        "total_received": lambda obj: obj.total_received,
+        "balance_due": lambda obj: obj.balance_due,
+    }),
+}
+
+
+class AdminChangelistTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(username="root", email="root@example.com", password="pw")
+        self.client.force_login(self.admin)
+        self.owner = User.objects.create_user(username="owner", password="pw")
+
+    def changelist(self, model, **params):
+        url = reverse(f"admin:budgetapp_{model._meta.model_name}_changelist")
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_query_count_does_not_grow_with_rows(self):
+        seed_event(self.owner, 2)
+        counts = {}
+        for model, _ in CHANGELISTS.values():
+            with CaptureQueriesContext(connection) as few:
+                self.changelist(model)
+            counts[model] = len(few)
+
+        for _ in range(4):
+            seed_event(self.owner, 5)
+        for model, _ in CHANGELISTS.values():
+            with self.subTest(model=model.__name__), CaptureQueriesContext(connection) as many:
+                self.changelist(model)
+            self.assertEqual(len(many), counts[model], model.__name__)
+
+    def test_computed_columns_sort(self):
+        for _ in range(3):
+            seed_event(self.owner, 3)
+        for admin_class, (model, columns) in CHANGELISTS.items():
+            for column, value in columns.items():
+                # the changelist puts the action checkbox in front of list_display
+                index = admin_class.list_display.index(column) + 1
+                for prefix, reverse_order in (("", False), ("-", True)):
+                    with self.subTest(model=model.__name__, column=f"{prefix}{column}"):
+                        rows = list(self.changelist(model, o=f"{prefix}{index}").context["cl"].result_list)
+                        values = [value(row) for row in rows]
+                        self.assertEqual(values, sorted(values, reverse=reverse_order), f"{model.__name__}.{prefix}{column}")
+
+
+class AdminScalingTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(username="root", email="root@example.com", password="pw")
+        self.client.force_login(self.admin)
+        self.owner = User.objects.create_user(username="owner", password="pw")
+        self.other = User.objects.create_user(username="other", password="pw")
+
+    def test_no_full_result_count_anywhere(self):
+        for model, model_admin in admin.site._registry.items():
+            if model._meta.app_label == "budgetapp":
+                with self.subTest(model=model.__name__):
+                    self.assertFalse(model_admin.show_full_result_count)
+                    self.assertIs(model_admin.paginator, EstimatedCountPaginator)
+
+    def test_unfiltered_big_tables_use_the_estimate(self):
+        EventFactory.create_batch(3, user=self.owner)
+        with mock.patch("budgetapp.admin.estimated_row_count", return_value=5_000_000):
+            self.assertEqual(EstimatedCountPaginator(Event.objects.all(), 100).count, 5_000_000)
+            self.assertEqual(EstimatedCountPaginator(Event.objects.filter(user=self.owner), 100).count, 3)
+        with mock.patch("budgetapp.admin.estimated_row_count", return_value=50):
+            self.assertEqual(EstimatedCountPaginator(Event.objects.all(), 100).count, 3)
+        # SQLite has no estimate: exact count
+        self.assertEqual(EstimatedCountPaginator(Event.objects.all(), 100).count, 3)
+
+    def test_input_filters_replace_distinct_scans(self):
+        mine = EventFactory(user=self.owner)
+        EventFactory(user=self.other)
+        url = reverse("admin:budgetapp_event_changelist")
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, {"username": "owner"})
+        self.assertEqual(list(response.context["cl"].result_list), [Event.objects.with_totals().get(pk=mine.pk)])
+        self.assertContains(response, 'name="username" value="owner"')
+        self.assertFalse([q for q in queries if "DISTINCT" in q["sql"]])
+
+        ServiceProviderFactory(user=self.owner, name="Baraka Caterers",
+                               budget_item__event=mine, budget_item__user=self.owner)
+        ServiceProviderFactory(user=self.owner, name="Zawadi Sounds",
+                               budget_item__event=mine, budget_item__user=self.owner)
+        response = self.client.get(reverse("admin:budgetapp_serviceprovider_changelist"), {"name": "Bar", "q": "B"})
+        self.assertEqual([p.name for p in response.context["cl"].result_list], ["Baraka Caterers"])
+        # the other active parameters are carried by the filter form
+        self.assertContains(response, '<input type="hidden" name="q" value="B">')
+
+    def test_search_matches_prefixes(self):
+        EventFactory(user=self.owner, name="Harambee Night")
+        EventFactory(user=self.owner, name="Night Harambee")
+        response = self.client.get(reverse("admin:budgetapp_event_changelist"), {"q": "Haram"})
+        self.assertEqual([e.name for e in response.context["cl"].result_list], ["Harambee Night"])
+
+    def test_foreign_keys_use_autocomplete(self):
+        for model in (Pledge, Task, VendorPayment, ServiceProvider, BudgetItem):
+            with self.subTest(model=model.__name__):
+                response = self.client.get(reverse(f"admin:budgetapp_{model._meta.model_name}_add"))
+                self.assertEqual(response.status_code, 200)
+                self.assertContains(response, "admin-autocomplete")
+        response = self.client.get(reverse("admin:autocomplete"), {
+            "app_label": "budgetapp", "model_name": "pledge", "field_name": "event", "term": "x",
+        })
+        self.assertEqual(response.status_code, 200)
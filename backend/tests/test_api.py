@@ -231,6 +231,32 @@ class PledgeAPITests(AuthSetupMixin, APITestCase):
 
     
         
+class MpesaPaymentAPITests(AuthSetupMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.event = Event.objects.create(
+            user=self.user,
+            name="Payment Event",
+            total_budget=Decimal('10000.00'),
+            event_date="2030-12-31"
+        )
+        self.first = MpesaPayment.objects.create(
+            event=self.event, user=self.user, amount=100, transaction_id="TXN001"
+        )
+        self.second = MpesaPayment.objects.create(
+            event=self.event, user=self.user, amount=200, transaction_id="TXN002"
+        )
+
+    def test_update_with_duplicate_transaction_id(self):
+        url = reverse('mpesa-payment-detail', kwargs={'pk': self.second.id})
+        data = {"event": self.event.id, "amount": "200.00", "transaction_id": "TXN001"}
+        response = self.client.put(url, data)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('transaction_id', response.data)
+        self.second.refresh_from_db()
+        self.assertEqual(self.second.transaction_id, "TXN002")
+
+
 class MpesaInfoAPITests(AuthSetupMixin, APITestCase):
     def setUp(self):
         super().setUp()
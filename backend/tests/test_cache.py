@@ -0,0 +1,95 @@
+import datetime
+from decimal import Decimal
+from unittest import mock
+from django.core.cache import cache
+from django.test import TestCase
+from budgetapp.cache import get_or_compute, MsgPackSerializer, ThresholdCompressor
+
+
+class GetOrComputeTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.calls = 0
+
+    def compute(self):
+        self.calls += 1
+        return {"value": self.calls}
+
+    def test_cold_miss_computes_once_then_serves_cache(self):
+        first = get_or_compute("k", self.compute, ttl=30)
+        second = get_or_compute("k", self.compute, ttl=30)
+        self.assertEqual(first, {"value": 1})
+        self.assertEqual(second, {"value": 1})
+        self.assertEqual(self.calls, 1)
+
+    def test_empty_result_is_cached(self):
+        def compute_empty():
+            self.calls += 1
+            return []
+
+        self.assertEqual(get_or_compute("empty", compute_empty, ttl=30), [])
+        self.assertEqual(get_or_compute("empty", compute_empty, ttl=30), [])
+        self.assertEqual(self.calls, 1)
+
+    def test_expired_value_is_served_stale_while_locked(self):
+        get_or_compute("k", self.compute, ttl=30)
+        value, _, delta = cache.get("k")
+        cache.set("k", (value, 0, delta), 300)  # logically expired
+        cache.add("lock:k", 1, 10)  # another worker is recomputing
+
+        self.assertEqual(get_or_compute("k", self.compute, ttl=30), {"value": 1})
+        self.assertEqual(self.calls, 1)
+
+    def test_expired_value_is_refreshed_by_lock_holder(self):
+        get_or_compute("k", self.compute, ttl=30)
+        value, _, delta = cache.get("k")
+        cache.set("k", (value, 0, delta), 300)
+
+        self.assertEqual(get_or_compute("k", self.compute, ttl=30), {"value": 2})
+        self.assertIsNone(cache.get("lock:k"))
+
+    def test_slow_compute_leaves_a_newer_lock_alone(self):
+        def slow_compute():
+            # the lock timed out meanwhile and another worker took it
+            cache.set("lock:slow", "other-worker", 10)
+            return self.compute()
+
+        self.assertEqual(get_or_compute("slow", slow_compute, ttl=30), {"value": 1})
+        self.assertEqual(cache.get("lock:slow"), "other-worker")
+
+    def test_early_refresh_near_expiry(self):
+        get_or_compute("k", self.compute, ttl=30)
+        value, expires_at, _ = cache.get("k")
+        # a slow computation one second before expiry is almost always refreshed early
+        cache.set("k", (value, expires_at - 29, 5.0), 300)
+        with mock.patch("budgetapp.cache.random.random", return_value=0.9):
+            self.assertEqual(get_or_compute("k", self.compute, ttl=30), {"value": 2})
+
+
+class CacheCodecTests(TestCase):
+    payload = {
+        "total": Decimal("1234.50"),
+        "event_date": datetime.date(2030, 1, 1),
+        "created": datetime.datetime(2030, 1, 1, 12, 30, tzinfo=datetime.timezone.utc),
+        "pledges": [{"id": 1, "amount": Decimal("10.00"), "fulfilled": True}],
+        "tags": {"a"},
+    }
+
+    def test_msgpack_round_trips_decimal_and_dates(self):
+        serializer = MsgPackSerializer({})
+        self.assertEqual(serializer.loads(serializer.dumps(self.payload)), self.payload)
+
+    def test_small_payloads_are_not_compressed(self):
+        compressor = ThresholdCompressor({"COMPRESS_MIN_LENGTH": 1024})
+        data = MsgPackSerializer({}).dumps(self.payload)
+        stored = compressor.compress(data)
+        self.assertEqual(stored[1:], data)
+        self.assertEqual(compressor.decompress(stored), data)
+
+    def test_large_payloads_are_compressed(self):
+        for algorithm in ("zlib", "brotli"):
+            compressor = ThresholdCompressor({"COMPRESS_MIN_LENGTH": 16, "COMPRESS_ALGORITHM": algorithm})
+            data = MsgPackSerializer({}).dumps([self.payload] * 50)
+            stored = compressor.compress(data)
+            self.assertLess(len(stored), len(data))
+            self.assertEqual(compressor.decompress(stored), data)
@@ -0,0 +1,95 @@
+from decimal import Decimal
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+from budgetapp.concurrency import NO_MATCH, parse_if_match
+from budgetapp.models import Event, MpesaPayment, Pledge, VersionConflict
+
+
+class VersionedModelTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="organizer", password="pw")
+        self.event = Event.objects.create(user=self.user, name="Harambee", event_date="2030-01-01",
+                                          total_budget=Decimal("1000.00"))
+
+    def test_second_stale_save_conflicts(self):
+        first = Event.objects.get(pk=self.event.pk)
+        second = Event.objects.get(pk=self.event.pk)
+        first.name = "First"
+        first.save()
+        self.assertEqual(first.version, 2)
+
+        second.name = "Second"
+        with self.assertRaises(VersionConflict), transaction.atomic():
+            second.save()
+        self.assertEqual(second.version, 1)
+        self.assertEqual(Event.objects.get(pk=self.event.pk).name, "First")
+
+    def test_check_is_part_of_the_update(self):
+        self.event.name = "Renamed"
+        with CaptureQueriesContext(connection) as queries:
+            self.event.save()
+        updates = [q["sql"] for q in queries if q["sql"].startswith("UPDATE")]
+        self.assertEqual(len(updates), 1)
+        self.assertIn('"version" = 1', updates[0].replace("%s", "1"))
+
+    def test_derived_saves_leave_the_version_alone(self):
+        pledge = Pledge.objects.create(user=self.user, event=self.event, name="Donor", phone_number="0700000000",
+                                       amount_pledged=Decimal("100.00"))
+        MpesaPayment.objects.create(user=self.user, event=self.event, pledge=pledge, amount=Decimal("100.00"),
+                                    transaction_id="T1")
+        self.event.update_funding_status()
+        pledge.refresh_from_db()
+        self.event.refresh_from_db()
+        self.assertTrue(pledge.is_fulfilled)
+        self.assertEqual((pledge.version, self.event.version), (1, 1))
+
+
+class IfMatchTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="organizer", password="pw")
+        self.client.force_authenticate(self.user)
+        self.event = Event.objects.create(user=self.user, name="Harambee", event_date="2030-01-01",
+                                          total_budget=Decimal("1000.00"))
+        self.url = reverse("event-detail", args=[self.event.pk])
+
+    def put(self, name, if_match=None):
+        headers = {"HTTP_IF_MATCH": if_match} if if_match is not None else {}
+        return self.client.put(self.url, {"name": name, "total_budget": "1000.00", "event_date": "2030-01-01"},
+                               format="json", **headers)
+
+    def test_etag_and_if_match(self):
+        self.assertEqual(self.client.get(self.url)["ETag"], '"v1"')
+
+        response = self.put("Edited", '"v1"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["ETag"], '"v2"')
+
+        stale = self.put("Lost update", '"v1"')
+        self.assertEqual(stale.status_code, 412)
+        self.event.refresh_from_db()
+        self.assertEqual((self.event.name, self.event.version), ("Edited", 2))
+
+    def test_without_if_match_or_with_star(self):
+        self.assertEqual(self.put("One").status_code, 200)
+        self.assertEqual(self.put("Two", "*").status_code, 200)
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.version, 3)
+
+    def test_unparseable_if_match_never_matches(self):
+        self.assertEqual(self.put("Nope", "garbage").status_code, 412)
+
+    def test_weak_if_match_never_matches(self):
+        self.assertEqual(self.put("Weak", 'W/"v1"').status_code, 412)
+        self.event.refresh_from_db()
+        self.assertEqual((self.event.name, self.event.version), ("Harambee", 1))
+
+    def test_parse_if_match(self):
+        self.assertEqual(parse_if_match('W/"v7"'), NO_MATCH)
+        self.assertEqual(parse_if_match('"v3", "v4"'), 3)
+        self.assertIsNone(parse_if_match("*"))
+        self.assertEqual(parse_if_match('"abc"'), NO_MATCH)
@@ -0,0 +1,225 @@
+from unittest import mock
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections, transaction
+from django.http import HttpResponse
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.test.client import RequestFactory
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+from budgetapp import db_router
+from budgetapp.middleware import ReplicaRoutingMiddleware
+from budgetapp.models import Event
+
+REPLICAS = override_settings(REPLICA_DATABASES=["replica1", "replica2"])
+
+
+@REPLICAS
+class ReplicaRouterTests(SimpleTestCase):
+    def setUp(self):
+        self.router = db_router.ReplicaRouter()
+        patcher = mock.patch.object(db_router, "replica_ok", return_value=True)
+        self.replica_ok = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def read(self):
+        return self.router.db_for_read(Event)
+
+    def test_reads_outside_a_request_use_the_primary(self):
+        self.assertEqual(self.read(), "default")
+
+    def test_safe_request_reads_from_a_replica(self):
+        _, token = db_router.start(True)
+        try:
+            self.assertIn(self.read(), ["replica1", "replica2"])
+        finally:
+            db_router.stop(token)
+
+    def test_reads_after_a_write_use_the_primary(self):
+        state, token = db_router.start(True)
+        try:
+            self.assertEqual(self.router.db_for_write(Event), "default")
+            self.assertTrue(state.wrote)
+            self.assertEqual(self.read(), "default")
+        finally:
+            db_router.stop(token)
+
+    def test_one_replica_per_request(self):
+        _, token = db_router.start(True)
+        try:
+            self.assertEqual(len({self.read() for _ in range(20)}), 1)
+        finally:
+            db_router.stop(token)
+
+    def test_unhealthy_replicas_are_skipped(self):
+        self.replica_ok.side_effect = lambda alias: alias == "replica2"
+        for _ in range(10):
+            _, token = db_router.start(True)
+            try:
+                self.assertEqual(self.read(), "replica2")
+            finally:
+                db_router.stop(token)
+        self.replica_ok.side_effect = None
+        self.replica_ok.return_value = False
+        _, token = db_router.start(True)
+        try:
+            self.assertEqual(self.read(), "default")
+        finally:
+            db_router.stop(token)
+
+    def test_replicas_are_not_migrated(self):
+        self.assertTrue(self.router.allow_migrate("default", "budgetapp"))
+        self.assertFalse(self.router.allow_migrate("replica1", "budgetapp"))
+
+
+@REPLICAS
+class ReplicaRoutingTransactionTests(TestCase):
+    def test_reads_inside_a_transaction_use_the_primary(self):
+        _, token = db_router.start(True)
+        try:
+            with mock.patch.object(db_router, "replica_ok", return_value=True), transaction.atomic():
+                self.assertEqual(db_router.ReplicaRouter().db_for_read(Event), "default")
+        finally:
+            db_router.stop(token)
+
+
+class ReplicaHealthTests(SimpleTestCase):
+    databases = {"default"}
+
+    def setUp(self):
+        db_router.reset_health()
+        self.addCleanup(db_router.reset_health)
+
+    def test_reachable_database_is_healthy(self):
+        self.assertTrue(db_router.replica_ok("default"))
+
+    def test_unreachable_replica_is_unhealthy(self):
+        with self.assertLogs("budgetapp.db_router", "WARNING"):
+            self.assertFalse(db_router.replica_ok("missing"))
+
+    @override_settings(REPLICA_MAX_LAG=2)
+    def test_lagging_replica_is_unhealthy(self):
+        with mock.patch.object(db_router, "_replica_lag", return_value=30), \
+                self.assertLogs("budgetapp.db_router", "WARNING"):
+            self.assertFalse(db_router.replica_ok("replica1"))
+
+    def test_result_is_reused_within_the_check_interval(self):
+        with mock.patch.object(db_router, "_replica_lag", return_value=0) as lag:
+            db_router.replica_ok("replica1")
+            db_router.replica_ok("replica1")
+        self.assertEqual(lag.call_count, 1)
+
+
+@REPLICAS
+class ReplicaRoutingMiddlewareTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+        self.user = User.objects.create_user(username="organizer", password="pw")
+        self.auth = {"HTTP_AUTHORIZATION": f"Bearer {AccessToken.for_user(self.user)}"}
+        self.seen = []
+
+    def middleware(self, write=False, status=200):
+        def view(request):
+            self.seen.append(db_router._state.get().use_replica)
+            if write:
+                db_router.ReplicaRouter().db_for_write(Event)
+            return HttpResponse(status=status)
+        return ReplicaRoutingMiddleware(view)
+
+    def test_not_loaded_without_replicas(self):
+        with override_settings(REPLICA_DATABASES=[]), self.assertRaises(MiddlewareNotUsed):
+            self.middleware()
+
+    def test_get_uses_replicas_and_state_is_cleared(self):
+        self.middleware()(self.factory.get("/api/events/", **self.auth))
+        self.assertEqual(self.seen, [True])
+        self.assertIsNone(db_router._state.get())
+
+    def test_client_is_pinned_after_a_write(self):
+        self.middleware()(self.factory.post("/api/events/", **self.auth))
+        self.middleware()(self.factory.get("/api/events/", **self.auth))
+        self.assertEqual(self.seen, [False, False])
+        # other clients still read from replicas
+        self.middleware()(self.factory.get("/api/events/"))
+        self.assertEqual(self.seen[-1], True)
+
+    def test_failed_write_does_not_pin(self):
+        self.middleware(status=400)(self.factory.post("/api/events/", **self.auth))
+        self.middleware()(self.factory.get("/api/events/", **self.auth))
+        self.assertEqual(self.seen, [False, True])
+
+    def test_write_during_a_get_pins(self):
+        self.middleware(write=True)(self.factory.get("/api/events/", **self.auth))
+        self.middleware()(self.factory.get("/api/events/", **self.auth))
+        self.assertEqual(self.seen, [True, False])
+
+    def test_identity(self):
+        self.assertEqual(db_router.client_identity(self.factory.get("/", **self.auth)), f"user:{self.user.pk}")
+        bad = self.factory.get("/", HTTP_AUTHORIZATION="Bearer junk", REMOTE_ADDR="10.0.0.1")
+        self.assertEqual(db_router.client_identity(bad), "addr:10.0.0.1")
+
+
+
+@override_settings(REPLICA_DATABASES=["replica1"])
+class ReplicaRoutingEndToEndTests(TransactionTestCase):
+    """
+    Real requests against a real second alias: `replica1` from DB_REPLICAS when
+    configured, else one added here as a mirror of the test database (a
+    separate connection to it, as a replica would be). Not a TestCase, so the
+    primary's writes are committed where the replica connection can see them.
+    """
+    databases = {"default", "replica1"}
+
+    @classmethod
+    def setUpClass(cls):
+        cls.added_alias = "replica1" not in connections.settings
+        if cls.added_alias:
+            connections.settings["replica1"] = {
+                **connections["default"].settings_dict, "TEST": {"MIRROR": "default"},
+            }
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        if cls.added_alias:
+            connections["replica1"].close()
+            del connections["replica1"]
+            del connections.settings["replica1"]
+
+    def setUp(self):
+        cache.clear()
+        db_router.reset_health()
+        self.user = User.objects.create_user(username="organizer", password="pw")
+        Event.objects.create(user=self.user, name="Harambee", event_date="2030-01-01", total_budget=1000)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.user)}")
+
+    def request(self, method, *args, **kwargs):
+        with CaptureQueriesContext(connections["default"]) as primary, \
+                CaptureQueriesContext(connections["replica1"]) as replica:
+            response = getattr(self.client, method)(*args, **kwargs)
+        return response, [q["sql"] for q in primary], [q["sql"] for q in replica]
+
+    def test_reads_are_served_by_the_replica_until_the_client_writes(self):
+        response, primary, replica = self.request("get", reverse("event-list"))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(any("budgetapp_event" in sql for sql in replica))
+        self.assertEqual(primary, [])
+
+        response, primary, replica = self.request("post", reverse("event-list"), {
+            "name": "Wedding", "total_budget": 500, "event_date": "2030-06-01",
+        })
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(any(sql.startswith("INSERT") for sql in primary))
+        self.assertEqual(replica, [])
+
+        # pinned: the read that follows the write sees it on the primary
+        response, primary, replica = self.request("get", reverse("event-list"))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(any("budgetapp_event" in sql for sql in primary))
+        self.assertEqual(replica, [])
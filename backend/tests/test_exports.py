@@ -0,0 +1,94 @@
+import csv
+import io
+import json
+from decimal import Decimal
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase, APIClient
+from django.contrib.auth.models import User
+from budgetapp.exports import EXPORTS, export_rows
+from budgetapp.models import Event, Pledge, MpesaPayment
+
+
+class ExportAPITests(APITestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='exporter', password='testpass123')
+        self.other_user = User.objects.create_user(username='other', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+        self.event = Event.objects.create(
+            name="Export Event", user=self.user, total_budget=10000, event_date="2030-12-31"
+        )
+        self.other_event = Event.objects.create(
+            name="Other Event", user=self.user, total_budget=10000, event_date="2030-12-31"
+        )
+        for i in range(5):
+            Pledge.objects.create(
+                event=self.event, user=self.user, amount_pledged=100 + i,
+                name=f"Donor {i}", phone_number=f"+25470000000{i}"
+            )
+        Pledge.objects.create(
+            event=self.other_event, user=self.user, amount_pledged=50,
+            name="Elsewhere", phone_number="+254711111111"
+        )
+        Pledge.objects.create(
+            event=Event.objects.create(name="Foreign", user=self.other_user, total_budget=1, event_date="2030-12-31"),
+            user=self.other_user, amount_pledged=1, name="Not Mine", phone_number="+254722222222"
+        )
+
+    def _content(self, response):
+        return b"".join(response.streaming_content).decode()
+
+    def test_csv_export_for_event(self):
+        url = reverse('export', kwargs={'kind': 'pledges', 'fmt': 'csv'})
+        response = self.client.get(url, {'event': self.event.id})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        rows = list(csv.reader(io.StringIO(self._content(response))))
+        self.assertEqual(rows[0], EXPORTS['pledges'].headers)
+        self.assertEqual(len(rows), 6)
+        self.assertEqual({r[3] for r in rows[1:]}, {f"Donor {i}" for i in range(5)})
+
+    def test_csv_neutralizes_formulas(self):
+        Pledge.objects.create(
+            event=self.event, user=self.user, amount_pledged=1,
+            name='=HYPERLINK("http://evil.example","x")', phone_number="+254733333333"
+        )
+        url = reverse('export', kwargs={'kind': 'pledges', 'fmt': 'csv'})
+        rows = list(csv.reader(io.StringIO(self._content(self.client.get(url, {'event': self.event.id})))))
+        names = {r[3] for r in rows[1:]}
+        self.assertIn('\'=HYPERLINK("http://evil.example","x")', names)
+        self.assertIn("Donor 0", names)
+        # numbers are left alone
+        self.assertEqual(rows[1][5], "100.00")
+
+    def test_ndjson_export_for_user(self):
+        MpesaPayment.objects.create(event=self.event, user=self.user, amount=Decimal("25.50"), transaction_id="EXP1")
+        url = reverse('export', kwargs={'kind': 'mpesa-payments', 'fmt': 'ndjson'})
+        response = self.client.get(url)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = [json.loads(line) for line in self._content(response).splitlines()]
+        self.assertEqual(len(lines), 1)
+        self.assertEqual(lines[0]['transaction_id'], "EXP1")
+        self.assertEqual(Decimal(lines[0]['amount']), Decimal("25.50"))
+
+    def test_export_scoped_to_user(self):
+        url = reverse('export', kwargs={'kind': 'pledges', 'fmt': 'csv'})
+        rows = list(csv.reader(io.StringIO(self._content(self.client.get(url)))))
+        self.assertEqual(len(rows), 7)
+        self.assertNotIn("Not Mine", {r[3] for r in rows})
+
+    def test_unknown_export_or_foreign_event(self):
+        self.assertEqual(
+            self.client.get(reverse('export', kwargs={'kind': 'users', 'fmt': 'csv'})).status_code,
+            status.HTTP_404_NOT_FOUND
+        )
+        foreign = Event.objects.get(name="Foreign")
+        url = reverse('export', kwargs={'kind': 'pledges', 'fmt': 'csv'})
+        self.assertEqual(self.client.get(url, {'event': foreign.id}).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_rows_batched_by_primary_key(self):
+        rows = list(export_rows(EXPORTS['pledges'], self.user, chunk_size=2))
+        self.assertEqual(len(rows), 6)
+        ids = [row[0] for row in rows]
+        self.assertEqual(ids, sorted(ids))
@@ -0,0 +1,119 @@
+from django.urls import reverse
+from rest_framework.request import Request
+from rest_framework.test import APITestCase, APIClient, APIRequestFactory, force_authenticate
+from django.contrib.auth.models import User
+from budgetapp.models import Event, BudgetItem, Pledge, ServiceProvider, Task
+from budgetapp.views import (
+    EventViewSet, BudgetItemViewSet, TaskViewSet, PledgeViewSet, MpesaPaymentViewSet,
+    ManualPaymentViewSet, VendorPaymentViewSet, ServiceProviderViewSet
+)
+
+
+# (viewset, query string, index that must back it)
+FILTER_CASES = [
+    (EventViewSet, {'event_date_after': '2030-01-01', 'event_date_before': '2030-12-31'}, 'event_user_date'),
+    (EventViewSet, {'is_funded': 'false'}, 'event_user_funded_date'),
+    (EventViewSet, {'min_budget': '500'}, 'event_user_budget'),
+    (BudgetItemViewSet, {'event': '{event}', 'is_funded': 'false'}, 'budgetitem_user_event_funded'),
+    (BudgetItemViewSet, {'is_funded': 'true'}, 'budgetitem_user_funded'),
+    (BudgetItemViewSet, {'min_budget': '100', 'max_budget': '900'}, 'budgetitem_user_estimate'),
+    (TaskViewSet, {'budget_item': '{item}'}, 'task_user_item_title'),
+    (PledgeViewSet, {'event': '{event}', 'is_fulfilled': 'false'}, 'pledge_user_event_fulfilled'),
+    (PledgeViewSet, {'is_fulfilled': 'true'}, 'pledge_user_fulfilled'),
+    (PledgeViewSet, {'min_amount': '100'}, 'pledge_user_amount'),
+    (MpesaPaymentViewSet, {'event': '{event}'}, 'mpesa_user_event_time'),
+    (MpesaPaymentViewSet, {'pledge': '{pledge}'}, 'mpesa_user_pledge_time'),
+    (MpesaPaymentViewSet, {'timestamp_after': '2030-01-01T00:00:00'}, 'mpesa_user_time'),
+    (MpesaPaymentViewSet, {'min_amount': '100', 'max_amount': '200'}, 'mpesa_user_amount'),
+    (ManualPaymentViewSet, {'event': '{event}'}, 'manual_user_event_date'),
+    (ManualPaymentViewSet, {'pledge': '{pledge}', 'date_after': '2030-01-01'}, 'manual_user_pledge_date'),
+    (ManualPaymentViewSet, {'date_after': '2030-01-01', 'date_before': '2030-02-01'}, 'manual_user_date'),
+    (ManualPaymentViewSet, {'min_amount': '100'}, 'manual_user_amount'),
+    (VendorPaymentViewSet, {'budget_item': '{item}'}, 'vendorpay_user_item_date'),
+    (VendorPaymentViewSet, {'service_provider': '{provider}'}, 'vendorpay_user_provider_date'),
+    (VendorPaymentViewSet, {'confirmed': 'false'}, 'vendorpay_user_confirmed_date'),
+    (VendorPaymentViewSet, {'date_paid_after': '2030-01-01T00:00:00'}, 'vendorpay_user_date'),
+    (VendorPaymentViewSet, {'min_amount': '100'}, 'vendorpay_user_amount'),
+    (ServiceProviderViewSet, {'budget_item': '{item}'}, 'provider_user_item_name'),
+    (ServiceProviderViewSet, {'service_type': 'Food'}, 'provider_user_type_name'),
+]
+
+
+class FilterTestData:
+    def create_data(self):
+        self.user = User.objects.create_user(username='filterer', password='testpass123')
+        self.event = Event.objects.create(
+            name="Harambee", user=self.user, total_budget=1000, event_date="2030-06-01"
+        )
+        self.item = BudgetItem.objects.create(
+            event=self.event, user=self.user, category="Tents", estimated_budget=400
+        )
+        self.provider = ServiceProvider.objects.create(
+            budget_item=self.item, user=self.user, service_type="Food", name="Tent Hire Ltd",
+            phone_number="+254700000001", amount_charged=300
+        )
+        self.pledge = Pledge.objects.create(
+            event=self.event, user=self.user, amount_pledged=500, name="Achieng", phone_number="+254711111111"
+        )
+
+
+class FilterIndexTests(FilterTestData, APITestCase):
+    """Every filter combination must be answered from one of the composite indexes."""
+
+    def setUp(self):
+        self.create_data()
+        self.factory = APIRequestFactory()
+
+    def _filtered_queryset(self, viewset, params):
+        ids = {'event': self.event.id, 'item': self.item.id, 'provider': self.provider.id, 'pledge': self.pledge.id}
+        params = {key: value.format(**ids) for key, value in params.items()}
+        request = self.factory.get('/', params)
+        force_authenticate(request, user=self.user)
+        view = viewset(request=Request(request), kwargs={}, format_kwarg=None, action='list')
+        view.request.user = self.user
+        return view.filter_queryset(view.get_queryset())
+
+    def test_each_filter_uses_its_index(self):
+        for viewset, params, index in FILTER_CASES:
+            with self.subTest(viewset=viewset.__name__, params=params):
+                plan = self._filtered_queryset(viewset, params).explain()
+                self.assertIn(index, plan)
+
+
+class FilterApiTests(FilterTestData, APITestCase):
+    def setUp(self):
+        self.create_data()
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        other_event = Event.objects.create(
+            name="Graduation", user=self.user, total_budget=5000, event_date="2031-01-15"
+        )
+        self.other_pledge = Pledge.objects.create(
+            event=other_event, user=self.user, amount_pledged=50, name="Otieno", phone_number="+254722222222"
+        )
+
+    def _ids(self, response):
+        return [row['id'] for row in response.data['results']]
+
+    def test_filters_by_parent_status_and_amount(self):
+        response = self.client.get(reverse('pledge-list'), {'event': self.event.id})
+        self.assertEqual(self._ids(response), [self.pledge.id])
+        response = self.client.get(reverse('pledge-list'), {'max_amount': 100})
+        self.assertEqual(self._ids(response), [self.other_pledge.id])
+        response = self.client.get(reverse('pledge-list'), {'is_fulfilled': 'true'})
+        self.assertEqual(self._ids(response), [])
+
+    def test_date_range_filter(self):
+        response = self.client.get(reverse('event-list'), {'event_date_after': '2031-01-01'})
+        self.assertEqual([row['name'] for row in response.data['results']], ["Graduation"])
+
+    def test_nested_routes_scope_to_parent(self):
+        response = self.client.get(reverse('event-pledge-list', args=[self.event.id]))
+        self.assertEqual(self._ids(response), [self.pledge.id])
+        Task.objects.create(budget_item=self.item, user=self.user, title="Pitch tents", allocated_amount=100)
+        response = self.client.get(reverse('budget-item-task-list', args=[self.item.id]))
+        self.assertEqual([row['title'] for row in response.data['results']], ["Pitch tents"])
+
+    def test_invalid_filter_value_is_rejected(self):
+        response = self.client.get(reverse('pledge-list'), {'min_amount': 'lots'})
+        self.assertEqual(response.status_code, 400)
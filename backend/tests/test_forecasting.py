@@ -0,0 +1,73 @@
+import datetime
+from decimal import Decimal
+from django.core.cache import cache
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase, APIClient
+from django.contrib.auth.models import User
+from budgetapp.forecasting import forecast_event
+from budgetapp.models import Event, Pledge, ManualPayment
+
+
+class ForecastTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='forecaster', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+        self.today = timezone.localdate()
+
+        # a past event that collected half its pledges 10 days out and 30% more on the day
+        past_date = self.today - datetime.timedelta(days=100)
+        past = Event.objects.create(name="Past", user=self.user, total_budget=10000, event_date=past_date)
+        Pledge.objects.create(event=past, user=self.user, amount_pledged=1000, name="Old", phone_number="+254700000001")
+        for days_before, amount in ((10, 500), (0, 300), (-5, 100)):
+            ManualPayment.objects.create(
+                event=past, user=self.user, amount=amount,
+                date=past_date - datetime.timedelta(days=days_before)
+            )
+
+        self.event = Event.objects.create(
+            name="Upcoming", user=self.user, total_budget=10000,
+            event_date=self.today + datetime.timedelta(days=5)
+        )
+        Pledge.objects.create(event=self.event, user=self.user, amount_pledged=1000, name="A", phone_number="+254700000002")
+        Pledge.objects.create(
+            event=self.event, user=self.user, amount_pledged=1000, total_paid=400,
+            name="B", phone_number="+254700000003"
+        )
+
+    def test_projection_uses_past_collection_curve(self):
+        result = forecast_event(self.event, self.today)
+        # 50% was collected 5 days out and 80% by the event: 60% of the unpaid remainder
+        self.assertEqual(result['collection_rate'], Decimal("0.6000"))
+        self.assertEqual(result['outstanding'], Decimal("1600.00"))
+        self.assertEqual(result['projected_collection'], Decimal("960.00"))
+        self.assertEqual(result['projected_total_paid'], Decimal("1360.00"))
+        self.assertEqual(len(result['series']), 5)
+        self.assertEqual(result['series'][-1]['projected_collected'], Decimal("960.00"))
+        # cents, like every other amount the API returns
+        self.assertEqual(str(result['outstanding']), "1600.00")
+        self.assertEqual(str(result['projected_total_paid']), "1360.00")
+
+    def test_no_history_gives_no_projection(self):
+        other = User.objects.create_user(username='newbie', password='testpass123')
+        event = Event.objects.create(
+            name="First", user=other, total_budget=100, event_date=self.today + datetime.timedelta(days=3)
+        )
+        result = forecast_event(event, self.today)
+        self.assertIsNone(result['projected_collection'])
+        self.assertEqual(result['basis']['method'], "no_history")
+
+    def test_endpoint_is_cached_until_event_changes(self):
+        url = reverse('event-forecast', args=[self.event.id])
+        first = self.client.get(url)
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        with self.assertNumQueries(1):  # ownership check only
+            cached = self.client.get(url)
+        self.assertEqual(cached.data['projected_collection'], first.data['projected_collection'])
+
+        Pledge.objects.create(event=self.event, user=self.user, amount_pledged=400, name="C", phone_number="+254700000004")
+        updated = self.client.get(url)
+        self.assertEqual(updated.data['outstanding'], Decimal("2000.00"))
@@ -0,0 +1,86 @@
+import hashlib
+from decimal import Decimal
+from unittest import mock
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+from budgetapp.models import Event, ManualPayment, Pledge
+
+
+class IdempotencyKeyTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="treasurer", password="pw")
+        self.client.force_authenticate(self.user)
+        self.event = Event.objects.create(user=self.user, name="Harambee", event_date="2030-01-01",
+                                          total_budget=Decimal("1000.00"))
+        self.url = reverse("pledge-list")
+        self.data = {"event": self.event.pk, "amount_pledged": "300.00", "name": "Donor",
+                     "phone_number": "+254711111111"}
+
+    def post(self, key, data=None, url=None):
+        return self.client.post(url or self.url, data or self.data, format="json", HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_retry_replays_without_writing(self):
+        first = self.post("k1")
+        self.assertEqual(first.status_code, 201)
+        with self.assertNumQueries(0):
+            retry = self.post("k1")
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry.data, first.data)
+        self.assertEqual(retry["Idempotent-Replayed"], "true")
+        self.assertEqual(Pledge.objects.count(), 1)
+
+        self.assertEqual(self.post("k2").status_code, 201)
+        self.assertEqual(Pledge.objects.count(), 2)
+
+    def test_without_key_nothing_changes(self):
+        self.client.post(self.url, self.data, format="json")
+        self.client.post(self.url, self.data, format="json")
+        self.assertEqual(Pledge.objects.count(), 2)
+
+    def test_key_reused_for_different_request(self):
+        self.post("k1")
+        response = self.post("k1", {**self.data, "amount_pledged": "999.00"})
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Pledge.objects.count(), 1)
+
+    def test_retry_while_first_is_in_flight(self):
+        key = f"idempotency:{self.user.pk}:{self.url}:{hashlib.sha256(b'k1').hexdigest()}"
+        with mock.patch("budgetapp.idempotency._fingerprint", return_value="fp"):
+            cache.add(key, {"state": "in_flight", "fingerprint": "fp"}, 60)
+            response = self.post("k1")
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response["Retry-After"], "1")
+        self.assertFalse(Pledge.objects.exists())
+
+    def test_failed_request_releases_key(self):
+        response = self.post("k1", {**self.data, "amount_pledged": "-5"})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.post("k1").status_code, 201)
+        self.assertEqual(Pledge.objects.count(), 1)
+
+    def test_keys_are_per_user(self):
+        self.post("k1")
+        other = User.objects.create_user(username="other", password="pw")
+        event = Event.objects.create(user=other, name="Other", event_date="2030-01-01", total_budget=Decimal("10"))
+        self.client.force_authenticate(other)
+        self.assertEqual(self.post("k1", {**self.data, "event": event.pk}).status_code, 201)
+        self.assertEqual(Pledge.objects.count(), 2)
+
+    def test_manual_payments(self):
+        pledge = Pledge.objects.create(user=self.user, event=self.event, name="Donor", phone_number="+254711111111",
+                                       amount_pledged=Decimal("300.00"))
+        url = reverse("pledge-manual-payment-list", args=[pledge.pk])
+        data = {"event": self.event.pk, "amount": "100.00"}
+        self.assertEqual(self.post("pay-1", data, url).status_code, 201)
+        self.assertEqual(self.post("pay-1", data, url).status_code, 201)
+        self.assertEqual(ManualPayment.objects.count(), 1)
+        pledge.refresh_from_db()
+        self.assertEqual(pledge.total_paid, Decimal("100.00"))
+
+    def test_rejects_oversized_key(self):
+        self.assertEqual(self.post("k" * 256).status_code, 400)
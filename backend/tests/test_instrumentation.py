@@ -0,0 +1,53 @@
+import re
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+from budgetapp import instrumentation
+from tests.factories import EventFactory
+
+
+class ServerTimingMiddlewareTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="timer", password="pw")
+        self.client.force_authenticate(user=self.user)
+
+    def _timings(self, response):
+        header = response["Server-Timing"]
+        return {name: params for name, params in (
+            (metric.split(";", 1)[0], metric.split(";", 1)[1]) for metric in header.split(", ")
+        )}
+
+    def test_header_reports_queries_and_timings(self):
+        EventFactory.create_batch(3, user=self.user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/events/")
+        self.assertEqual(response.status_code, 200)
+        timings = self._timings(response)
+        self.assertIn(f'desc="{len(queries)} queries"', timings["db"])
+        for name in ("db", "render", "total"):
+            self.assertRegex(timings[name], r"dur=\d+\.\d")
+        total = float(re.search(r"dur=([\d.]+)", timings["total"]).group(1))
+        db = float(re.search(r"dur=([\d.]+)", timings["db"]).group(1))
+        self.assertLessEqual(db, total)
+
+    def test_cache_hits_and_misses_are_counted(self):
+        first = self._timings(self.client.get("/api/recent-activities/"))
+        second = self._timings(self.client.get("/api/recent-activities/"))
+        self.assertEqual(first["cache"], 'desc="0 hits 1 misses"')
+        self.assertEqual(second["cache"], 'desc="1 hits 0 misses"')
+
+    def test_logs_one_line_per_request_tagged_with_view(self):
+        with self.assertLogs("budgetapp.timing", level="INFO") as logs:
+            self.client.get("/api/events/")
+            self.client.get("/api/no-such-endpoint/")
+        self.assertEqual(len(logs.records), 2)
+        self.assertRegex(logs.output[0], r"view=event-list method=GET status=200 total_ms=[\d.]+ db_queries=\d+ ")
+        self.assertIn("view=- method=GET status=404", logs.output[1])
+
+    def test_collection_stops_after_the_request(self):
+        self.client.get("/api/events/")
+        self.assertIsNone(instrumentation.current())
+        instrumentation.record_cache(hit=True)  # outside a request: ignored
@@ -0,0 +1,116 @@
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from budgetapp import jobs, metrics
+from budgetapp.models import BudgetItem, Event, Job, MpesaPayment, ServiceProvider, VendorPayment
+
+
+calls = []
+
+
+@jobs.handler("test_echo")
+def echo(payload):
+    if payload.get("fail"):
+        raise RuntimeError("boom")
+    calls.append(payload)
+
+
+@override_settings(JOBS_EAGER=False)
+class JobQueueTests(TestCase):
+    def setUp(self):
+        calls.clear()
+        self.user = User.objects.create_user(username="treasurer", password="pw")
+        self.event = Event.objects.create(user=self.user, name="Wedding", event_date="2030-01-01",
+                                          total_budget=Decimal("1000.00"))
+
+    def pay(self, amount, transaction_id):
+        return MpesaPayment.objects.create(user=self.user, event=self.event, amount=Decimal(amount),
+                                           transaction_id=transaction_id)
+
+    def test_funding_recompute_is_deferred_and_deduplicated(self):
+        self.pay("600.00", "T1")
+        self.pay("600.00", "T2")
+        self.assertEqual(Job.objects.filter(kind="recompute_funding").count(), 1)
+        self.event.refresh_from_db()
+        self.assertFalse(self.event.is_funded)
+
+        call_command("run_jobs", once=True, stdout=StringIO())
+        self.event.refresh_from_db()
+        self.assertTrue(self.event.is_funded)
+        self.assertFalse(Job.objects.exists())
+
+    def test_claimed_job_no_longer_absorbs_new_writes(self):
+        self.pay("100.00", "T1")
+        claimed = jobs.claim("w1")
+        self.assertEqual(len(claimed), 1)
+        self.pay("100.00", "T2")
+        self.assertEqual(Job.objects.filter(status=Job.QUEUED).count(), 1)
+        second = jobs.claim("w2")
+        self.assertEqual(len(second), 1)
+        self.assertNotEqual(second[0].pk, claimed[0].pk)
+
+    def test_vendor_payment_queues_its_event(self):
+        item = BudgetItem.objects.create(user=self.user, event=self.event, category="Venue",
+                                         estimated_budget=Decimal("500.00"))
+        provider = ServiceProvider.objects.create(user=self.user, budget_item=item, service_type="Venue",
+                                                  name="Hall", phone_number="0700000000",
+                                                  amount_charged=Decimal("500.00"))
+        VendorPayment.objects.create(user=self.user, budget_item=item, service_provider=provider,
+                                     payment_method="cash", amount=Decimal("500.00"))
+        self.assertEqual(Job.objects.get().payload, {"event": self.event.pk})
+        jobs.run(jobs.claim("w1"))
+        item.refresh_from_db()
+        self.assertTrue(item.is_funded)
+
+    def test_batch_handler_gets_every_payload(self):
+        seen = []
+        jobs.HANDLERS["test_batch"] = (seen.append, True)
+        try:
+            for n in range(3):
+                jobs.enqueue("test_batch", {"n": n})
+            jobs.run(jobs.claim("w1"))
+        finally:
+            del jobs.HANDLERS["test_batch"]
+        self.assertEqual(seen, [[{"n": 0}, {"n": 1}, {"n": 2}]])
+
+    def test_failures_back_off_then_fail(self):
+        job = jobs.enqueue("test_echo", {"fail": True}, max_attempts=2)
+        jobs.run(jobs.claim("w1"))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.QUEUED, 1))
+        self.assertGreater(job.run_after, timezone.now() + timedelta(seconds=5))
+        self.assertIn("RuntimeError: boom", job.last_error)
+        self.assertEqual(jobs.claim("w1"), [])
+
+        Job.objects.filter(pk=job.pk).update(run_after=timezone.now())
+        with self.assertLogs("budgetapp.jobs", "ERROR"):
+            jobs.run(jobs.claim("w1"))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 2))
+
+    def test_stale_running_jobs_are_requeued(self):
+        jobs.enqueue("test_echo", {"n": 1})
+        jobs.claim("dead-worker")
+        Job.objects.update(locked_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(jobs.requeue_stale(), 1)
+        jobs.run(jobs.claim("w1"))
+        self.assertEqual(calls, [{"n": 1}])
+
+    def test_queue_depth_is_visible(self):
+        jobs.enqueue("test_echo", {"n": 1})
+        jobs.enqueue("test_echo", {"n": 2}, delay=60)
+        self.assertEqual(jobs.queue_stats()["counts"], {"test_echo": {"queued": 2}})
+        self.assertIn('budget_jobs{kind="test_echo",status="queued"} 2', metrics.registry.render())
+        out = StringIO()
+        call_command("run_jobs", stats=True, stdout=out)
+        self.assertIn('"test_echo"', out.getvalue())
+
+    @override_settings(JOBS_EAGER=True)
+    def test_eager_runs_inline(self):
+        self.assertIsNone(jobs.enqueue("test_echo", {"n": 1}))
+        self.assertEqual(calls, [{"n": 1}])
+        self.assertFalse(Job.objects.exists())
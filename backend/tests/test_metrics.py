@@ -0,0 +1,86 @@
+from unittest import mock
+from django.contrib.auth.models import User
+from django.test import TestCase
+from rest_framework.test import APITestCase
+from budgetapp import metrics
+from budgetapp.instrumentation import RequestMetrics
+from tests.factories import EventFactory, PledgeFactory
+
+
+def sample_lines(text, prefix):
+    return [line for line in text.splitlines() if line.startswith(prefix)]
+
+
+class RegistryTests(TestCase):
+    def setUp(self):
+        self.registry = metrics.Registry()
+        self.registry._backend = metrics.LocalBackend()
+
+    def test_histogram_renders_every_bucket_cumulatively(self):
+        histogram = metrics.Histogram(self.registry, "h_seconds", "help", ("view",), (0.1, 1.0))
+        histogram.observe(0.05, "a")
+        histogram.observe(0.5, "a")
+        self.assertEqual(sample_lines(self.registry.render(), "h_seconds"), [
+            'h_seconds_bucket{view="a",le="0.1"} 1',
+            'h_seconds_bucket{view="a",le="1.0"} 2',
+            'h_seconds_bucket{view="a",le="+Inf"} 2',
+            'h_seconds_sum{view="a"} 0.55',
+            'h_seconds_count{view="a"} 2',
+        ])
+
+    def test_label_values_are_escaped(self):
+        counter = metrics.Counter(self.registry, "c_total", "help", ("view",))
+        counter.inc('a"b\\c')
+        self.assertIn('c_total{view="a\\"b\\\\c"} 1', self.registry.render())
+
+    def test_failed_flush_keeps_samples(self):
+        counter = metrics.Counter(self.registry, "c_total", "help")
+        counter.inc(amount=3)
+        with mock.patch.object(self.registry._backend, "add", side_effect=ConnectionError("down")):
+            self.registry.flush()
+        counter.inc()
+        self.assertIn("c_total 4", self.registry.render())
+
+
+class MetricsEndpointTests(APITestCase):
+    def setUp(self):
+        metrics.registry.clear()
+        self.staff = User.objects.create_user(username="ops", password="pw", is_staff=True)
+        self.user = User.objects.create_user(username="member", password="pw")
+
+    def scrape(self):
+        self.client.force_authenticate(user=self.staff)
+        response = self.client.get("/api/metrics/")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain; version=0.0.4"))
+        return response.content.decode()
+
+    def test_staff_only(self):
+        self.client.force_authenticate(user=self.user)
+        self.assertEqual(self.client.get("/api/metrics/").status_code, 403)
+        self.client.force_authenticate(user=None)
+        self.assertEqual(self.client.get("/api/metrics/").status_code, 401)
+
+    def test_requests_are_counted_per_view(self):
+        self.client.force_authenticate(user=self.user)
+        EventFactory(user=self.user)
+        self.client.get("/api/events/")
+        self.client.get("/api/events/")
+        text = self.scrape()
+        self.assertIn('budget_http_requests_total{view="event-list",method="GET",status="200"} 2', text)
+        self.assertIn('budget_http_request_duration_seconds_count{view="event-list"} 2', text)
+        self.assertIn('budget_http_request_db_queries_bucket{view="event-list",le="+Inf"} 2', text)
+
+    def test_throttled_requests_and_cache_ratio(self):
+        request_metrics = RequestMetrics()
+        request_metrics.cache_hits, request_metrics.cache_misses = 3, 1
+        metrics.observe_request("export", "GET", 429, 0.01, request_metrics)
+        text = self.scrape()
+        self.assertIn('budget_http_throttled_total{view="export"} 1', text)
+        self.assertIn("budget_cache_hit_ratio 0.75", text)
+
+    def test_signal_handlers_are_timed(self):
+        PledgeFactory(user=self.user, event=EventFactory(user=self.user))
+        text = self.scrape()
+        self.assertIn('budget_signal_handler_duration_seconds_count{handler="budgetapp.signals.update_typeahead"} 1',
+                      text)
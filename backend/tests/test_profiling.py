@@ -0,0 +1,91 @@
+import json
+import pstats
+import shutil
+import tempfile
+from pathlib import Path
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import override_settings
+from rest_framework.test import APITestCase
+from tests.factories import EventFactory
+
+
+class ProfilingTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.profile_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.profile_dir)
+        override = override_settings(PROFILE_DIR=self.profile_dir)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.staff = User.objects.create_user(username="ops", password="pw", is_staff=True)
+        self.user = User.objects.create_user(username="member", password="pw")
+        EventFactory.create_batch(2, user=self.user)
+
+    def issue_token(self):
+        self.client.force_authenticate(user=self.staff)
+        response = self.client.post("/api/profiling/token/")
+        self.assertEqual(response.status_code, 201)
+        self.client.force_authenticate(user=self.user)
+        return response.data["token"]
+
+    def test_only_staff_can_get_tokens(self):
+        self.client.force_authenticate(user=self.user)
+        self.assertEqual(self.client.post("/api/profiling/token/").status_code, 403)
+
+    def test_profiles_request_with_view_and_sql_timeline(self):
+        response = self.client.get("/api/events/", HTTP_X_PROFILE_TOKEN=self.issue_token())
+        self.assertEqual(response.status_code, 200)
+        name = response["X-Profile"]
+        self.assertIn("event-list", name)
+
+        stats = pstats.Stats(str(Path(self.profile_dir) / f"{name}.pstats"))
+        self.assertTrue(stats.total_calls)
+        with open(Path(self.profile_dir) / f"{name}.json") as f:
+            sidecar = json.load(f)
+        self.assertEqual(sidecar["view"], "event-list")
+        self.assertEqual(sidecar["status"], 200)
+        self.assertEqual(sidecar["requested_by"], self.staff.pk)
+        self.assertEqual(sidecar["sql_count"], len(sidecar["sql"]))
+        self.assertTrue(any("budgetapp_event" in query["sql"] for query in sidecar["sql"]))
+
+    def test_query_flag_is_left_out_of_the_recorded_path(self):
+        response = self.client.get(f"/api/events/?is_funded=false&_profile={self.issue_token()}")
+        with open(Path(self.profile_dir) / f"{response['X-Profile']}.json") as f:
+            self.assertEqual(json.load(f)["path"], "/api/events/?is_funded=false")
+
+    def test_invalid_and_reused_tokens_are_not_profiled(self):
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get("/api/events/", HTTP_X_PROFILE_TOKEN="forged")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["X-Profile"], "invalid")
+
+        token = self.issue_token()
+        self.client.get("/api/events/", HTTP_X_PROFILE_TOKEN=token)
+        cache.delete("profiling:slot")
+        self.assertEqual(self.client.get("/api/events/", HTTP_X_PROFILE_TOKEN=token)["X-Profile"], "invalid")
+        self.assertEqual(len(list(Path(self.profile_dir).glob("*.pstats"))), 1)
+
+    def test_profiling_is_rate_limited(self):
+        self.client.get("/api/events/", HTTP_X_PROFILE_TOKEN=self.issue_token())
+        token = self.issue_token()
+        response = self.client.get("/api/events/", HTTP_X_PROFILE_TOKEN=token)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["X-Profile"], "rate-limited")
+
+        # the rate-limited request left the token usable
+        cache.delete("profiling:slot")
+        self.assertIn("event-list", self.client.get("/api/events/", HTTP_X_PROFILE_TOKEN=token)["X-Profile"])
+
+    @override_settings(PROFILE_KEEP=2)
+    def test_old_profiles_are_pruned(self):
+        for _ in range(3):
+            cache.delete("profiling:slot")
+            self.client.get("/api/events/", HTTP_X_PROFILE_TOKEN=self.issue_token())
+        self.assertEqual(len(list(Path(self.profile_dir).glob("*.pstats"))), 2)
+        self.assertEqual(len(list(Path(self.profile_dir).glob("*.json"))), 2)
+
+    def test_requests_without_token_are_untouched(self):
+        response = self.client.get("/api/events/")
+        self.assertNotIn("X-Profile", response)
+        self.assertEqual(list(Path(self.profile_dir).iterdir()), [])
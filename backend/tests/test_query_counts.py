@@ -0,0 +1,145 @@
+import math
+from collections import Counter
+from datetime import date, timedelta
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APITestCase, APIClient
+from django.contrib.auth.models import User
+from budgetapp.exports import CHUNK_SIZE
+from budgetapp.models import BudgetItem, MpesaPayment, Pledge, ServiceProvider, Task, VendorPayment
+from budgetapp.rollups import rebuild_daily_totals
+from budgetapp.search import index_object
+from budgetapp.utils import normalize_sql
+from tests.factories import seed_event
+
+
+# Children of every kind seeded under the measured event.
+SIZES = (10, 1000, 10000)
+# Streaming exports read in primary-key batches, so their batch query repeats by design.
+BATCHED = {f"export-{kind}": CHUNK_SIZE for kind in ("pledges", "mpesa-payments", "manual-payments", "vendor-payments")}
+TRANSACTION_CONTROL = ("SAVEPOINT", "RELEASE SAVEPOINT", "ROLLBACK TO SAVEPOINT")
+
+
+def endpoints(event, ids):
+    """(label, method, url, payload) for every endpoint in budgetapp/urls.py that reads or writes event data."""
+    get = lambda label, name, *args, params=None: (label, "get", reverse(name, args=args), params)
+    return [
+        get("event-list", "event-list"),
+        get("event-detail", "event-detail", event.id),
+        get("event-pledge-list", "event-pledge-list", event.id),
+        get("event-funding-series", "event-funding-series", event.id),
+        get("event-forecast", "event-forecast", event.id),
+        get("budget-item-list", "budget-item-list"),
+        get("budget-item-detail", "budget-item-detail", ids["item"]),
+        get("budget-item-task-list", "budget-item-task-list", ids["item"]),
+        get("pledge-list", "pledge-list"),
+        get("pledge-list-filtered", "pledge-list", params={"event": event.id, "is_fulfilled": "false"}),
+        get("pledge-detail", "pledge-detail", ids["pledge"]),
+        get("manual-payment-list", "manual-payment-list"),
+        get("pledge-manual-payment-list", "pledge-manual-payment-list", ids["pledge"]),
+        get("mpesa-payment-list", "mpesa-payment-list"),
+        get("mpesa-payment-detail", "mpesa-payment-detail", ids["mpesa"]),
+        get("mpesa-info-list", "mpesa-info-list"),
+        get("service-provider-list", "service-provider-list"),
+        get("service-provider-detail", "service-provider-detail", ids["provider"]),
+        get("vendorpayment-list", "vendorpayment-list"),
+        get("vendorpayment-detail", "vendorpayment-detail", ids["vendor_payment"]),
+        get("task-list", "task-list"),
+        get("task-detail", "task-detail", ids["task"]),
+        get("general-dashboard", "general-dashboard"),
+        get("event-dashboard", "event-dashboard", event.id),
+        get("recent-activities", "recent-activities"),
+        get("search", "search", params={"q": "harambee"}),
+        get("typeahead", "typeahead", params={"kind": "pledger", "q": ids["pledger_prefix"]}),
+        *[
+            (label, "get", reverse("export", args=[label.split("-", 1)[1], "csv"]), {"event": event.id})
+            for label in BATCHED
+        ],
+        ("pledge-create", "post", reverse("pledge-list"), {
+            "event": event.id, "amount_pledged": "500.00", "name": "New Pledger", "phone_number": "+254799000001",
+        }),
+        ("pledge-manual-payment-create", "post", reverse("pledge-manual-payment-list", args=[ids["pledge"]]), {
+            "event": event.id, "amount": "10.00",
+        }),
+        ("mpesa-payment-create", "post", reverse("mpesa-payment-list"), {
+            "event": event.id, "pledge": ids["pledge"], "amount": "10.00", "transaction_id": "QC00000001",
+        }),
+    ]
+
+
+class QueryCountTests(APITestCase):
+    """
+    Every endpoint must run the same queries whether the event has 10 or
+    10,000 children: a query that repeats per row fails here first.
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='counter', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+
+    def _request(self, method, url, payload):
+        if method == "get":
+            response = self.client.get(url, payload)
+        else:
+            response = self.client.post(url, payload, format="json")
+        if response.streaming:
+            b"".join(response.streaming_content)
+        return response
+
+    def _profile(self, size):
+        """Seed `size` children, call every endpoint and return {label: [normalized sql, ...]}."""
+        profiles = {}
+        with transaction.atomic():
+            cache.clear()
+            # a finished event gives the forecast a history to build its curve from
+            seed_event(self.user, 10, event_date=date.today() - timedelta(days=30))
+            event = seed_event(self.user, size, name="Harambee Fundraiser", event_date=date.today() + timedelta(days=30))
+            rebuild_daily_totals()
+            index_object(event)
+            pledge = Pledge.objects.filter(event=event).first()
+            ids = {
+                "item": BudgetItem.objects.filter(event=event).first().id,
+                "pledge": pledge.id,
+                "pledger_prefix": pledge.name[:2],
+                "mpesa": MpesaPayment.objects.filter(event=event).first().id,
+                "provider": ServiceProvider.objects.filter(budget_item__event=event).first().id,
+                "vendor_payment": VendorPayment.objects.filter(budget_item__event=event).first().id,
+                "task": Task.objects.filter(budget_item__event=event).first().id,
+            }
+
+            for label, method, url, payload in endpoints(event, ids):
+                with CaptureQueriesContext(connection) as queries:
+                    response = self._request(method, url, payload)
+                self.assertLess(response.status_code, 400, f"{label}: {response.status_code}")
+                profiles[label] = [normalize_sql(query["sql"]) for query in queries.captured_queries]
+            transaction.set_rollback(True)
+        return profiles
+
+    def test_query_count_and_shapes_do_not_grow_with_children(self):
+        profiles = {size: self._profile(size) for size in SIZES}
+        baseline = profiles[SIZES[0]]
+
+        for label, shapes in baseline.items():
+            for size in SIZES[1:]:
+                with self.subTest(endpoint=label, size=size):
+                    other = profiles[size][label]
+                    self.assertEqual(set(other), set(shapes), "query shapes changed with the number of rows")
+                    if label in BATCHED:
+                        batches = math.ceil(size / BATCHED[label]) + 1
+                        self.assertLessEqual(max(Counter(other).values()), batches)
+                    else:
+                        self.assertEqual(len(other), len(shapes), "query count changed with the number of rows")
+
+    def test_no_query_shape_repeats_within_a_request(self):
+        for label, shapes in self._profile(SIZES[0]).items():
+            if label in BATCHED:
+                continue
+            with self.subTest(endpoint=label):
+                repeated = {
+                    shape: count for shape, count in Counter(shapes).items()
+                    if count > 1 and not shape.upper().startswith(TRANSACTION_CONTROL)
+                }
+                self.assertEqual(repeated, {})
@@ -0,0 +1,93 @@
+import json
+import os
+import tempfile
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase, override_settings
+from rest_framework.test import APITestCase
+from budgetapp.models import Event
+from budgetapp.querywatch import QueryWatchViolation, watch_queries
+from budgetapp.serializers import EventSerializer
+from budgetapp.utils import normalize_sql
+from tests.factories import EventFactory
+
+
+class WatchQueriesTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="watcher", password="pw")
+        EventFactory.create_batch(6, user=self.user)
+
+    def test_flags_per_row_aggregates_with_their_origin(self):
+        with self.assertRaises(QueryWatchViolation) as raised:
+            with watch_queries(slow_ms=float("inf")):
+                EventSerializer(Event.objects.filter(user=self.user), many=True).data
+        self.assertRegex(str(raised.exception), r"repeated \d+x .* at budgetapp/models.py:\d+ in total_pledged")
+
+        with watch_queries(slow_ms=float("inf"), fail=False) as watcher:
+            EventSerializer(Event.objects.filter(user=self.user), many=True).data
+        repeated = watcher.last_report["repeated"]
+        self.assertTrue(repeated)
+        origins = {item["origin"] for item in repeated}
+        self.assertTrue(any(origin.startswith("budgetapp/models.py") for origin in origins), origins)
+        self.assertTrue(any("budgetapp/serializers.py" in frame for item in repeated for frame in item["stack"]))
+        self.assertTrue(all(item["explain"] for item in repeated))
+
+    def test_annotated_queryset_passes(self):
+        with watch_queries(slow_ms=float("inf")) as watcher:
+            EventSerializer(Event.objects.filter(user=self.user).with_totals(), many=True).data
+        self.assertEqual(watcher.last_report["repeated"], [])
+
+    def test_flags_slow_queries_with_plan(self):
+        with watch_queries(slow_ms=0, fail=False) as watcher:
+            list(Event.objects.filter(user=self.user))
+        slow = watcher.last_report["slow"]
+        self.assertEqual(len(slow), 1)
+        self.assertIn("budgetapp_event", slow[0]["sql"])
+        self.assertTrue(slow[0]["origin"].startswith("tests/test_querywatch.py"))
+        self.assertTrue(slow[0]["explain"])
+
+
+class NormalizeSqlTests(TestCase):
+    def test_parameterized_in_lists_share_a_shape(self):
+        seen = []
+
+        def capture(execute, sql, params, many, context):
+            seen.append(sql)
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(capture):
+            list(Event.objects.filter(pk__in=[1, 2]))
+            list(Event.objects.filter(pk__in=[1, 2, 3]))
+        self.assertIn("%s, %s, %s", seen[1])
+        self.assertEqual(normalize_sql(seen[0]), normalize_sql(seen[1]))
+        self.assertIn("IN (?)", normalize_sql(seen[1]))
+
+
+@override_settings(QUERYWATCH_ENABLED=True, QUERYWATCH_REPEAT_THRESHOLD=3, QUERYWATCH_SLOW_MS=10_000)
+class QueryWatchMiddlewareTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="watcher", password="pw")
+        self.client.force_authenticate(user=self.user)
+        self.event = EventFactory(user=self.user)
+
+    def test_clean_requests_are_untouched(self):
+        response = self.client.get("/api/events/")
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("X-Query-Watch", response)
+
+    def test_reports_repeated_shapes(self):
+        report_file = os.path.join(tempfile.mkdtemp(), "querywatch.jsonl")
+        with override_settings(QUERYWATCH_REPEAT_THRESHOLD=1, QUERYWATCH_REPORT_FILE=report_file), \
+                self.assertLogs("budgetapp.querywatch", level="WARNING"):
+            response = self.client.get("/api/events/")
+        self.assertRegex(response["X-Query-Watch"], r"repeated=\d+ slow=0")
+        with open(report_file) as f:
+            entry = json.loads(f.readline())
+        self.assertEqual(entry["view"], "event-list")
+        self.assertTrue(entry["repeated"])
+
+    @override_settings(QUERYWATCH_RAISE=True)
+    def test_raise_mode_fails_the_request(self):
+        with override_settings(QUERYWATCH_REPEAT_THRESHOLD=1), self.assertLogs("budgetapp.querywatch"), \
+                self.assertRaises(QueryWatchViolation):
+            self.client.get("/api/events/")
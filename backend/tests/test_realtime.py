@@ -0,0 +1,175 @@
+import asyncio
+import json
+from decimal import Decimal
+from unittest import mock
+from asgiref.sync import async_to_sync, sync_to_async
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from rest_framework_simplejwt.tokens import AccessToken
+from budgetapp import realtime
+from budgetapp.models import Event, MpesaPayment, Pledge
+
+
+class FakeSocket:
+    """Both ends of an ASGI WebSocket connection, driven by the test."""
+
+    def __init__(self):
+        self.incoming = asyncio.Queue()
+        self.sent = asyncio.Queue()
+
+    async def receive(self):
+        return await self.incoming.get()
+
+    async def send(self, message):
+        await self.sent.put(message)
+
+    async def next(self):
+        return await asyncio.wait_for(self.sent.get(), 5)
+
+
+class FakePubSub:
+    """Stands in for a redis.asyncio PubSub; `listen()` ends once nothing is subscribed, or fails if `broken`."""
+
+    def __init__(self, broken=False):
+        self.broken = broken
+        self.channels = set()
+        self.closed = False
+
+    async def subscribe(self, *channels):
+        self.channels.update(channels)
+
+    async def unsubscribe(self, *channels):
+        self.channels.difference_update(channels)
+
+    async def listen(self):
+        while self.channels:
+            await asyncio.sleep(0.01)
+            if self.broken:
+                raise ConnectionError("connection lost")
+        return
+        yield
+
+    async def aclose(self):
+        self.closed = True
+
+
+class RealtimeTests(TestCase):
+    def setUp(self):
+        # each test runs its connections on a new event loop
+        realtime.hub.reset()
+        self.addCleanup(realtime.hub.reset)
+        self.user = User.objects.create_user(username="organizer", password="pw")
+        self.event = Event.objects.create(user=self.user, name="Harambee", event_date="2030-01-01",
+                                          total_budget=Decimal("1000.00"))
+        self.pledge = Pledge.objects.create(user=self.user, event=self.event, name="Aunt",
+                                            phone_number="0700000000", amount_pledged=Decimal("500.00"))
+
+    def scope(self, path=None, token=None):
+        token = token if token is not None else str(AccessToken.for_user(self.user))
+        return {"type": "websocket", "path": path or f"/ws/events/{self.event.pk}/",
+                "query_string": f"token={token}".encode()}
+
+    def pay(self, amount, transaction_id):
+        with self.captureOnCommitCallbacks(execute=True):
+            MpesaPayment.objects.create(user=self.user, event=self.event, pledge=self.pledge,
+                                        amount=Decimal(amount), transaction_id=transaction_id)
+
+    def connect(self, scope, during=None):
+        """Open a connection, run `during` (sync) while it's open, and return everything sent to the client."""
+        async def scenario():
+            socket = FakeSocket()
+            await socket.incoming.put({"type": "websocket.connect"})
+            task = asyncio.ensure_future(realtime.websocket_application(scope, socket.receive, socket.send))
+            sent = [await socket.next()]
+            if sent[0]["type"] == "websocket.accept":
+                sent.append(await socket.next())
+                for step in during or []:
+                    await sync_to_async(step)()
+                    sent.append(await socket.next())
+                await socket.incoming.put({"type": "websocket.disconnect", "code": 1000})
+            await asyncio.wait_for(task, 5)
+            return sent
+        return async_to_sync(scenario)()
+
+    def test_snapshot_then_payment_deltas(self):
+        sent = self.connect(self.scope(), during=[
+            lambda: self.pay("200.00", "T1"),
+            lambda: self.pay("300.00", "T2"),
+        ])
+        accept, snapshot, first, second = sent
+        self.assertEqual(accept["type"], "websocket.accept")
+        snapshot = json.loads(snapshot["text"])
+        self.assertEqual(snapshot["type"], "snapshot")
+        self.assertEqual(Decimal(snapshot["metrics"]["total_received"]), 0)
+
+        first = json.loads(first["text"])
+        self.assertEqual(first["type"], "payment.created")
+        self.assertEqual(first["payment"]["channel"], "mpesa")
+        self.assertEqual(Decimal(first["metrics"]["total_received"]), Decimal("200.00"))
+        self.assertFalse(first["pledge"]["is_fulfilled"])
+
+        second = json.loads(second["text"])
+        self.assertEqual(Decimal(second["metrics"]["total_received"]), Decimal("500.00"))
+        self.assertEqual(second["pledge"], {"id": self.pledge.pk, "total_paid": "500.00", "is_fulfilled": True})
+        self.assertEqual(realtime.hub.viewers, {})
+
+    def test_rejects_bad_token_and_other_users_events(self):
+        self.assertEqual(self.connect(self.scope(token="nope")),
+                         [{"type": "websocket.close", "code": realtime.CLOSE_UNAUTHORIZED}])
+        other = User.objects.create_user(username="intruder", password="pw")
+        self.assertEqual(self.connect(self.scope(token=str(AccessToken.for_user(other)))),
+                         [{"type": "websocket.close", "code": realtime.CLOSE_NOT_FOUND}])
+        self.assertEqual(self.connect(self.scope(path="/ws/nothing/")),
+                         [{"type": "websocket.close", "code": realtime.CLOSE_NOT_FOUND}])
+        self.assertEqual(realtime.hub.viewers, {})
+
+    def test_nothing_is_queried_without_viewers(self):
+        payment = MpesaPayment(event=self.event, amount=Decimal("1.00"))
+        with self.assertNumQueries(0):
+            realtime.publish_payment(self.event.pk, payment, "created")
+
+    def test_slow_viewer_is_told_to_resync(self):
+        async def scenario():
+            queue = await realtime.hub.join(self.event.pk)
+            try:
+                for n in range(realtime.QUEUE_SIZE + 1):
+                    realtime.hub.fan_out(self.event.pk, str(n))
+                return [queue.get_nowait() for _ in range(queue.qsize())]
+            finally:
+                await realtime.hub.leave(self.event.pk, queue)
+        self.assertEqual(async_to_sync(scenario)(), [realtime.RESYNC])
+
+    def test_subscription_is_rebuilt_after_a_failure_and_on_a_new_loop(self):
+        pubsubs = []
+
+        def new_pubsub(**kwargs):
+            pubsubs.append(FakePubSub(broken=not pubsubs))
+            return pubsubs[-1]
+
+        async def first_loop():
+            queue = await realtime.hub.join(1)
+            self.assertEqual(await asyncio.wait_for(queue.get(), 5), realtime.RESYNC)
+            self.assertIsNone(realtime.hub.pubsub)
+            # the next viewer resubscribes every watched event on a new connection
+            other = await realtime.hub.join(2)
+            self.assertEqual(pubsubs[1].channels, {realtime.channel(1), realtime.channel(2)})
+            await realtime.hub.leave(1, queue)
+            await realtime.hub.leave(2, other)
+            await asyncio.wait_for(realtime.hub.reader, 5)
+
+        async def second_loop():
+            queue = await realtime.hub.join(3)
+            self.assertIs(realtime.hub.pubsub, pubsubs[2])
+            await realtime.hub.leave(3, queue)
+            await asyncio.wait_for(realtime.hub.reader, 5)
+
+        with mock.patch.object(realtime, "_uses_redis", return_value=True), \
+                mock.patch("redis.asyncio.from_url") as from_url, \
+                override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+                                                      "LOCATION": "redis://redis:6379/1"}}):
+            from_url.return_value.pubsub.side_effect = new_pubsub
+            with self.assertLogs("budgetapp.realtime", "ERROR"):
+                async_to_sync(first_loop)()
+            self.assertTrue(pubsubs[0].closed)
+            async_to_sync(second_loop)()
+        self.assertEqual(len(pubsubs), 3)
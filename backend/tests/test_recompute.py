@@ -0,0 +1,173 @@
+from decimal import Decimal
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from django.urls import reverse
+from budgetapp import recompute
+from budgetapp.cache import get_version
+from budgetapp.models import BudgetItem, Event, Pledge, VendorPayment
+from tests.factories import seed_event
+
+
+def drift(event):
+    """Corrupt every stored derived value under `event` without going through save()."""
+    Pledge.objects.filter(event=event).update(total_paid=Decimal("1.00"), is_fulfilled=True)
+    Event.objects.filter(pk=event.pk).update(is_funded=True)
+    BudgetItem.objects.filter(event=event).update(is_funded=True)
+
+
+class RecomputeTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="treasurer", password="pw")
+        self.events = [seed_event(self.user, 4, total_budget=Decimal("99999999.00")) for _ in range(3)]
+
+    def snapshot(self):
+        return (
+            sorted(Pledge.objects.values_list("pk", "total_paid", "is_fulfilled")),
+            sorted(Event.objects.values_list("pk", "is_funded")),
+            sorted(BudgetItem.objects.values_list("pk", "is_funded")),
+        )
+
+    def expected(self):
+        """What the model methods (one object at a time) compute."""
+        for pledge in Pledge.objects.all():
+            pledge.update_payment_status()
+        for event in Event.objects.all():
+            event.update_funding_status()
+        for item in BudgetItem.objects.all():
+            item.update_funding_status()
+        return self.snapshot()
+
+    def test_recompute_all_matches_model_methods(self):
+        correct = self.expected()
+        for event in self.events:
+            drift(event)
+        fixed = recompute.recompute_all(chunk_size=3)
+        self.assertEqual(self.snapshot(), correct)
+        self.assertEqual(fixed, {"pledges": 12, "events": 3, "budget-items": 12})
+        # nothing left to fix
+        self.assertEqual(recompute.recompute_all(chunk_size=3), {"pledges": 0, "events": 0, "budget-items": 0})
+
+    def test_selection_only_touches_selected_rows(self):
+        correct = self.expected()
+        for event in self.events:
+            drift(event)
+        self.assertEqual(recompute.recompute("pledges", queryset=Pledge.objects.filter(event=self.events[0])), 4)
+        self.assertTrue(Pledge.objects.filter(event=self.events[1], total_paid=Decimal("1.00")).exists())
+        self.assertEqual(
+            sorted(Pledge.objects.filter(event=self.events[0]).values_list("pk", "total_paid", "is_fulfilled")),
+            [row for row in correct[0] if row[0] in set(self.events[0].pledges.values_list("pk", flat=True))],
+        )
+
+    def test_fixed_events_get_a_new_cache_version(self):
+        self.expected()
+        drift(self.events[0])
+        before = [get_version("event", event.pk) for event in self.events]
+        recompute.recompute("pledges")
+        after = [get_version("event", event.pk) for event in self.events]
+        self.assertNotEqual(after[0], before[0])
+        self.assertEqual(after[1:], before[1:])
+
+    def test_command(self):
+        correct = self.expected()
+        for event in self.events:
+            drift(event)
+        out = StringIO()
+        call_command("recompute_derived", event=[self.events[0].pk], stdout=out)
+        self.assertIn("Fixed 4 pledges, 1 events, 4 budget-items", out.getvalue())
+        call_command("recompute_derived", kinds=["pledges", "events", "budget-items"], chunk_size=2, stdout=out)
+        self.assertEqual(self.snapshot(), correct)
+
+    def test_admin_actions(self):
+        correct = self.expected()
+        for event in self.events:
+            drift(event)
+        admin = User.objects.create_superuser(username="root", email="root@example.com", password="pw")
+        self.client.force_login(admin)
+        response = self.client.post(reverse("admin:budgetapp_event_changelist"), {
+            "action": "recompute_derived", "_selected_action": [event.pk for event in self.events],
+        }, follow=True)
+        self.assertContains(response, "Fixed 3 events, 12 pledges and 12 budget items.")
+        self.assertEqual(self.snapshot(), correct)
+
+        VendorPayment.objects.update(confirmed=False)
+        payments = list(VendorPayment.objects.values_list("pk", flat=True)[:5])
+        response = self.client.post(reverse("admin:budgetapp_vendorpayment_changelist"), {
+            "action": "confirm_payments", "_selected_action": payments,
+        }, follow=True)
+        self.assertContains(response, "Confirmed 5 vendor payments.")
+        self.assertEqual(set(VendorPayment.objects.filter(confirmed=True).values_list("pk", flat=True)), set(payments))
+
+
+class VerifyTotalsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="treasurer", password="pw")
+        self.events = [seed_event(self.user, 4, total_budget=Decimal("99999999.00")) for _ in range(3)]
+        recompute.recompute_all()
+        directory = tempfile.mkdtemp()
+        self.state_file = os.path.join(directory, "state.json")
+        self.report = os.path.join(directory, "report.jsonl")
+
+    def verify(self, **options):
+        out = StringIO()
+        call_command("verify_totals", state_file=self.state_file, stdout=out, stderr=StringIO(), **options)
+        return out.getvalue()
+
+    def test_clean_data_passes(self):
+        self.assertIn("0 discrepancies, 0 repaired", self.verify(chunk_size=2))
+        self.assertFalse(os.path.exists(self.state_file))
+
+    def test_reports_drift_and_fails(self):
+        pledge = Pledge.objects.filter(event=self.events[1]).first()
+        Pledge.objects.filter(pk=pledge.pk).update(total_paid=Decimal("1.00"))
+        with self.assertRaisesMessage(CommandError, "1 discrepancies, 0 repaired"):
+            self.verify(report=self.report)
+        with open(self.report) as f:
+            rows = [json.loads(line) for line in f]
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]["kind"], "pledges")
+        self.assertEqual(rows[0]["id"], pledge.pk)
+        self.assertEqual(Decimal(rows[0]["stored"]["total_paid"]), Decimal("1.00"))
+        self.assertEqual(Decimal(rows[0]["expected"]["total_paid"]), pledge.total_paid)
+
+    def test_repair(self):
+        correct = sorted(Pledge.objects.values_list("pk", "total_paid", "is_fulfilled"))
+        drift(self.events[0])
+        self.assertIn("9 discrepancies, 9 repaired", self.verify(repair=True))
+        self.assertEqual(sorted(Pledge.objects.values_list("pk", "total_paid", "is_fulfilled")), correct)
+        self.assertIn("0 discrepancies", self.verify())
+
+    def test_resumes_after_interruption(self):
+        for event in self.events:
+            drift(event)
+        calls = []
+
+        def interrupted(kind, **kwargs):
+            if len(calls) == 2:
+                raise KeyboardInterrupt
+            calls.append(kwargs["id_range"])
+            return recompute.discrepancies(kind, **kwargs)
+
+        with mock.patch("budgetapp.management.commands.verify_totals.discrepancies", side_effect=interrupted):
+            with self.assertRaises(KeyboardInterrupt):
+                self.verify(kinds=["pledges"], chunk_size=4)
+        with open(self.state_file) as f:
+            state = json.load(f)
+        self.assertEqual(state["next"], {"pledges": calls[-1][1]})
+
+        checked = []
+        with mock.patch("budgetapp.management.commands.verify_totals.discrepancies",
+                        side_effect=lambda kind, **kwargs: checked.append(kwargs["id_range"]) or []):
+            # counts found before the interruption are carried over
+            with self.assertRaisesMessage(CommandError, "8 discrepancies"):
+                self.verify(kinds=["pledges"], chunk_size=4)
+        self.assertEqual(checked[0][0], calls[-1][1])
+        self.assertFalse(os.path.exists(self.state_file))
+
+        with self.assertRaisesMessage(CommandError, "12 discrepancies"):
+            self.verify(kinds=["pledges"], restart=True)
@@ -0,0 +1,89 @@
+import datetime
+from decimal import Decimal
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase, APIClient
+from django.contrib.auth.models import User
+from budgetapp.models import Event, Pledge, MpesaPayment, ManualPayment, DailyEventTotals
+from budgetapp.rollups import rebuild_daily_totals
+
+
+class DailyEventTotalsTests(APITestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='charts', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+        self.event = Event.objects.create(
+            name="Chart Event", user=self.user, total_budget=100000, event_date="2030-12-31"
+        )
+        self.pledge = Pledge.objects.create(
+            event=self.event, user=self.user, amount_pledged=5000, name="Donor", phone_number="+254700000000"
+        )
+        self.today = timezone.localdate()
+
+    def _totals(self):
+        return {
+            (row.day, row.channel): (row.total_amount, row.payment_count)
+            for row in DailyEventTotals.objects.filter(event=self.event)
+        }
+
+    def test_payments_are_rolled_up_per_day_and_channel(self):
+        MpesaPayment.objects.create(event=self.event, user=self.user, amount=100, transaction_id="R1")
+        MpesaPayment.objects.create(event=self.event, user=self.user, amount=50, transaction_id="R2")
+        ManualPayment.objects.create(pledge=self.pledge, user=self.user, amount=30, date=self.today)
+
+        self.assertEqual(self._totals(), {
+            (self.today, "mpesa"): (Decimal("150.00"), 2),
+            (self.today, "manual"): (Decimal("30.00"), 1),
+        })
+
+    def test_edit_and_delete_move_amounts_between_buckets(self):
+        payment = ManualPayment.objects.create(event=self.event, user=self.user, amount=30, date=self.today)
+        yesterday = self.today - datetime.timedelta(days=1)
+        payment.date = yesterday
+        payment.amount = 40
+        payment.save()
+        self.assertEqual(self._totals(), {(yesterday, "manual"): (Decimal("40.00"), 1)})
+
+        payment.delete()
+        self.assertEqual(self._totals(), {})
+
+    def test_rebuild_matches_incremental_rollup(self):
+        MpesaPayment.objects.create(event=self.event, user=self.user, amount=100, transaction_id="R1")
+        ManualPayment.objects.create(pledge=self.pledge, user=self.user, amount=30, date=self.today)
+        ManualPayment.objects.create(
+            event=self.event, user=self.user, amount=20, date=self.today - datetime.timedelta(days=3)
+        )
+        incremental = self._totals()
+
+        DailyEventTotals.objects.all().delete()
+        self.assertEqual(rebuild_daily_totals(), 3)
+        self.assertEqual(self._totals(), incremental)
+
+    def test_funding_series_is_dense_and_cumulative(self):
+        start = self.today - datetime.timedelta(days=4)
+        ManualPayment.objects.create(
+            event=self.event, user=self.user, amount=20, date=start - datetime.timedelta(days=1)
+        )
+        ManualPayment.objects.create(
+            event=self.event, user=self.user, amount=30, date=start + datetime.timedelta(days=2)
+        )
+        MpesaPayment.objects.create(event=self.event, user=self.user, amount=100, transaction_id="R1")
+
+        url = reverse('event-funding-series', args=[self.event.id])
+        response = self.client.get(url, {'start': start.isoformat(), 'end': self.today.isoformat()})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        series = response.data['series']
+        self.assertEqual(len(series), 5)
+        self.assertEqual([point['total'] for point in series], [0, 0, Decimal("30.00"), 0, Decimal("100.00")])
+        self.assertEqual(series[0]['cumulative'], Decimal("20.00"))
+        self.assertEqual(series[-1]['cumulative'], Decimal("150.00"))
+
+    def test_funding_series_validates_range(self):
+        url = reverse('event-funding-series', args=[self.event.id])
+        self.assertEqual(
+            self.client.get(url, {'start': '2030-01-02', 'end': '2030-01-01'}).status_code,
+            status.HTTP_400_BAD_REQUEST
+        )
+        self.assertEqual(self.client.get(url, {'start': 'yesterday'}).status_code, status.HTTP_400_BAD_REQUEST)
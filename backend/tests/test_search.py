@@ -0,0 +1,161 @@
+from unittest import mock
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import transaction
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase, APIClient
+from django.contrib.auth.models import User
+from budgetapp.models import Event, BudgetItem, Pledge, ServiceProvider, SearchTrigram
+from budgetapp.search import rebuild_index, search
+from budgetapp.typeahead import get_store
+
+
+class SearchTests(APITestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='searcher', password='testpass123')
+        self.other_user = User.objects.create_user(username='other', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+        self.event = Event.objects.create(
+            name="Wanjiku Wedding", venue="Karen Gardens", user=self.user,
+            total_budget=10000, event_date="2030-12-31"
+        )
+        self.item = BudgetItem.objects.create(
+            event=self.event, user=self.user, category="Catering", estimated_budget=5000
+        )
+        self.provider = ServiceProvider.objects.create(
+            budget_item=self.item, user=self.user, service_type="Food", name="Mama Oliech Caterers",
+            phone_number="+254700000000", email="orders@oliech.co.ke", amount_charged=3000
+        )
+        self.pledge = Pledge.objects.create(
+            event=self.event, user=self.user, amount_pledged=2000,
+            name="John Kamau", phone_number="+254712345678"
+        )
+        other_event = Event.objects.create(
+            name="Kamau Reunion", user=self.other_user, total_budget=100, event_date="2030-12-31"
+        )
+        Pledge.objects.create(
+            event=other_event, user=self.other_user, amount_pledged=10, name="Jane Kamau", phone_number="+254799999999"
+        )
+
+    def _hits(self, text, kinds=None):
+        return [(r['type'], r['id']) for r in search(self.user, text, kinds)]
+
+    def test_partial_name_and_phone_match(self):
+        self.assertEqual(self._hits("kama"), [("pledge", self.pledge.id)])
+        self.assertEqual(self._hits("1234567"), [("pledge", self.pledge.id)])
+        self.assertEqual(self._hits("jo ka"), [("pledge", self.pledge.id)])
+
+    def test_results_are_scoped_to_user(self):
+        self.assertNotIn("Jane Kamau", [r['label'] for r in search(self.user, "kamau")])
+        self.assertEqual(search(self.other_user, "reunion")[0]['label'].split(" - ")[0], "Kamau Reunion")
+
+    def test_name_matches_rank_above_secondary_fields(self):
+        Event.objects.create(name="Oliech Fundraiser", user=self.user, total_budget=100, event_date="2030-12-31")
+        results = search(self.user, "oliech")
+        self.assertEqual(len(results), 2)
+        self.assertEqual(results[0]['type'], "event")  # name match outranks the provider's email match
+        self.assertEqual(self._hits("oliech", ["service_provider"]), [("service_provider", self.provider.id)])
+
+    def test_index_follows_updates_and_deletes(self):
+        self.pledge.name = "Peter Otieno"
+        self.pledge.save()
+        self.assertEqual(self._hits("kamau"), [])
+        self.assertEqual(self._hits("otieno"), [("pledge", self.pledge.id)])
+
+        self.pledge.delete()
+        self.assertEqual(self._hits("otieno"), [])
+        self.assertFalse(SearchTrigram.objects.filter(kind="pledge", object_id=self.pledge.id).exists())
+
+    def test_rebuild_matches_incremental_index(self):
+        incremental = set(SearchTrigram.objects.values_list("kind", "object_id", "trigram", "weight"))
+        SearchTrigram.objects.all().delete()
+        rebuild_index(chunk_size=1)
+        self.assertEqual(set(SearchTrigram.objects.values_list("kind", "object_id", "trigram", "weight")), incremental)
+
+    def test_search_endpoint(self):
+        response = self.client.get(reverse('search'), {'q': 'cater', 'types': 'budget_item,service_provider'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            {(r['type'], r['id']) for r in response.data['results']},
+            {("budget_item", self.item.id), ("service_provider", self.provider.id)}
+        )
+        bad = self.client.get(reverse('search'), {'q': 'x', 'types': 'users'})
+        self.assertEqual(bad.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class TypeaheadTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='typist', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+        self.event = Event.objects.create(name="Harambee", user=self.user, total_budget=10000, event_date="2030-12-31")
+        for name, phone in (("John Kamau", "+254712345678"), ("Kamande Njoroge", "+254700000001"),
+                            ("Mary Wambui", "+254700000002"), ("John Kamau", "+254712345678")):
+            Pledge.objects.create(event=self.event, user=self.user, amount_pledged=100, name=name, phone_number=phone)
+        self.url = reverse('typeahead')
+
+    def _names(self, text, kind='pledger'):
+        response = self.client.get(self.url, {'kind': kind, 'q': text})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [r['name'] for r in response.data['results']]
+
+    def test_prefix_matches_any_word_and_dedupes(self):
+        self.assertEqual(self._names("kam"), ["Kamande Njoroge", "John Kamau"])  # alphabetical by matched word
+        self.assertEqual(self._names("jo"), ["John Kamau"])
+        self.assertEqual(self._names("x"), [])
+
+    def test_updates_after_first_lookup_are_incremental(self):
+        self.assertEqual(self._names("wam"), ["Mary Wambui"])
+        pledge = Pledge.objects.get(name="Mary Wambui")
+        pledge.name = "Mary Atieno"
+        with self.captureOnCommitCallbacks(execute=True):
+            pledge.save()
+        self.assertEqual(self._names("wam"), [])
+        self.assertEqual(self._names("ati"), ["Mary Atieno"])
+        with self.captureOnCommitCallbacks(execute=True):
+            pledge.delete()
+        self.assertEqual(self._names("mary"), [])
+
+    def test_rolled_back_saves_do_not_reach_index(self):
+        self._names("jo")
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            Pledge.objects.create(event=self.event, user=self.user, amount_pledged=100,
+                                  name="Otieno Phantom", phone_number="+254700000009")
+            raise RuntimeError("rolled back")
+        self.assertEqual(self._names("oti"), [])
+
+    def test_status_saves_do_not_touch_index(self):
+        self._names("jo")
+        with mock.patch("budgetapp.typeahead.refresh_object") as refresh:
+            Pledge.objects.get(name="Mary Wambui").update_payment_status()
+        refresh.assert_not_called()
+
+    def test_failed_build_is_retried(self):
+        with mock.patch("budgetapp.typeahead.members_for", side_effect=RuntimeError("db gone")):
+            with self.assertRaises(RuntimeError):
+                self._names("jo")
+        self.assertFalse(get_store().is_ready(self.user.id, "pledger"))
+        self.assertEqual(self._names("jo"), ["John Kamau"])
+        self.assertTrue(get_store().is_ready(self.user.id, "pledger"))
+
+    def test_rebuild_command(self):
+        self._names("jo")
+        # a change the signals never saw
+        Pledge.objects.filter(name="Mary Wambui").update(name="Mary Atieno")
+        self.assertEqual(self._names("ati"), [])
+        call_command("rebuild_typeahead", "--kind", "pledger", stdout=mock.Mock())
+        self.assertEqual(self._names("ati"), ["Mary Atieno"])
+        self.assertEqual(self._names("wam"), [])
+
+    def test_vendor_kind_and_validation(self):
+        item = BudgetItem.objects.create(event=self.event, user=self.user, category="Sound", estimated_budget=500)
+        ServiceProvider.objects.create(
+            budget_item=item, user=self.user, service_type="DJ", name="Sauti Sol Sounds",
+            phone_number="+254700000003", amount_charged=100
+        )
+        response = self.client.get(self.url, {'kind': 'vendor', 'q': 'sou'})
+        self.assertEqual(response.data['results'][0]['service_type'], "DJ")
+        self.assertEqual(self.client.get(self.url, {'kind': 'users', 'q': 'a'}).status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,92 @@
+import datetime
+from io import StringIO
+from django.core.exceptions import ValidationError
+from django.core.management import CommandError, call_command
+from django.db.models import Sum
+from django.test import TestCase
+from django.contrib.auth.models import User
+from budgetapp.models import (
+    Event, BudgetItem, ServiceProvider, VendorPayment, Task, Pledge,
+    MpesaPayment, ManualPayment, UserSettings, DailyEventTotals
+)
+
+
+SEED_OPTIONS = dict(
+    users=2, events_per_user=2, items_per_event=3, providers_per_item=2, vendor_payments_per_provider=2,
+    tasks_per_item=2, pledges_per_event=6, mpesa_per_pledge=2, manual_per_pledge=1,
+    anchor_date=datetime.date(2030, 6, 1), workers=1, chunk_size=50,
+)
+MODELS = [Event, BudgetItem, ServiceProvider, VendorPayment, Task, Pledge, MpesaPayment, ManualPayment]
+
+
+class SeedBenchmarkDataTests(TestCase):
+    def _seed(self, seed=7, **options):
+        call_command("seed_benchmark_data", seed=seed, stdout=StringIO(), **{**SEED_OPTIONS, **options})
+
+    def _snapshot(self):
+        """Every generated row without its keys, in generation order."""
+        exclude = {"id", "user", "event", "pledge", "budget_item", "service_provider", "transaction_id",
+                   "transaction_code"}
+        return {
+            model.__name__: [
+                tuple(getattr(obj, f.attname) for f in model._meta.concrete_fields if f.name not in exclude)
+                for obj in model.objects.order_by("pk")
+            ]
+            for model in MODELS
+        }
+
+    def test_row_counts_follow_the_options(self):
+        self._seed()
+        self.assertEqual(User.objects.filter(username__startswith="bench7_").count(), 2)
+        self.assertEqual(UserSettings.objects.count(), 2)
+        self.assertEqual(Event.objects.count(), 4)
+        self.assertEqual(BudgetItem.objects.count(), 12)
+        self.assertEqual(ServiceProvider.objects.count(), 24)
+        self.assertEqual(VendorPayment.objects.count(), 48)
+        self.assertEqual(Task.objects.count(), 24)
+        self.assertEqual(Pledge.objects.count(), 24)
+        self.assertEqual(MpesaPayment.objects.count(), 48)
+        self.assertEqual(ManualPayment.objects.count(), 24)
+        self.assertTrue(DailyEventTotals.objects.exists())
+
+    def test_rows_pass_model_validation_and_derived_fields_match(self):
+        self._seed()
+        for model in MODELS:
+            for obj in model.objects.all():
+                with self.subTest(model=model.__name__, pk=obj.pk):
+                    try:
+                        obj.full_clean()
+                    except ValidationError as e:
+                        self.fail(f"{obj!r}: {e}")
+
+        for pledge in Pledge.objects.all():
+            paid = (pledge.payments.aggregate(total=Sum("amount"))["total"] or 0) + \
+                   (pledge.manual_payments.aggregate(total=Sum("amount"))["total"] or 0)
+            self.assertEqual(pledge.total_paid, paid)
+            self.assertEqual(pledge.is_fulfilled, paid >= pledge.amount_pledged)
+        for event in Event.objects.all():
+            self.assertEqual(event.is_funded, event.total_received() >= event.total_budget)
+        anchor = SEED_OPTIONS["anchor_date"]
+        self.assertFalse(MpesaPayment.objects.filter(timestamp__date__gt=anchor).exists())
+        self.assertFalse(ManualPayment.objects.filter(date__gt=anchor).exists())
+
+    def test_same_seed_generates_same_data(self):
+        self._seed()
+        first = self._snapshot()
+        for model in reversed(MODELS):
+            model.objects.all().delete()
+        User.objects.all().delete()
+
+        self._seed()
+        self.assertEqual(self._snapshot(), first)
+
+    def test_different_seed_generates_different_data(self):
+        self._seed(seed=1)
+        first = self._snapshot()["Pledge"]
+        self._seed(seed=2)
+        self.assertNotEqual(self._snapshot()["Pledge"][len(first):], first)
+
+    def test_refuses_to_reseed_existing_users(self):
+        self._seed()
+        with self.assertRaises(CommandError):
+            self._seed()
@@ -0,0 +1,99 @@
+from decimal import Decimal
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+from budgetapp.models import Event, MpesaPayment, Pledge
+
+
+class PublicProgressTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="organizer", password="pw")
+        self.event = Event.objects.create(user=self.user, name="Harambee", event_date="2030-01-01",
+                                          total_budget=Decimal("1000.00"))
+        self.pledges = [
+            Pledge.objects.create(user=self.user, event=self.event, name=name, phone_number="0700000000",
+                                  amount_pledged=Decimal("500.00"))
+            for name in ("Amina", "Baraka", "Chebet")
+        ]
+        self.client.force_authenticate(self.user)
+
+    def pay(self, pledge, amount, transaction_id):
+        MpesaPayment.objects.create(user=self.user, event=self.event, pledge=pledge, amount=Decimal(amount),
+                                    transaction_id=transaction_id)
+
+    def share(self, **data):
+        response = self.client.post(reverse("event-share", args=[self.event.pk]), data, format="json")
+        self.assertEqual(response.status_code, 201)
+        return response.data["token"]
+
+    def public(self, token):
+        client = APIClient()
+        return client.get(reverse("public-progress", args=[token]))
+
+    def test_snapshot_is_public_and_cacheable(self):
+        self.pay(self.pledges[0], "250.00", "T1")
+        token = self.share()
+        self.assertGreaterEqual(len(token), 40)
+
+        response = self.public(token)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["name"], "Harambee")
+        self.assertEqual(response.data["target"], Decimal("1000.00"))
+        self.assertEqual(response.data["raised"], Decimal("250.00"))
+        self.assertEqual(response.data["percentage"], Decimal("25.00"))
+        self.assertIsNone(response.data["contributors"])
+        cache_control = response["Cache-Control"]
+        self.assertIn("public", cache_control)
+        self.assertIn("s-maxage=15", cache_control)
+        self.assertNotIn("no-store", cache_control)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.public(token).data["raised"], Decimal("250.00"))
+
+    def test_payments_show_up_on_the_next_request(self):
+        token = self.share()
+        self.assertEqual(self.public(token).data["raised"], 0)
+        self.pay(self.pledges[1], "400.00", "T1")
+        self.assertEqual(self.public(token).data["raised"], Decimal("400.00"))
+
+    def test_top_contributors(self):
+        self.pay(self.pledges[0], "100.00", "T1")
+        self.pay(self.pledges[1], "300.00", "T2")
+        self.pay(self.pledges[2], "200.00", "T3")
+        token = self.share(top_contributors=2)
+        contributors = self.public(token).data["contributors"]
+        self.assertEqual([(c["name"], c["amount"]) for c in contributors],
+                         [("Baraka", Decimal("300.00")), ("Chebet", Decimal("200.00"))])
+        self.assertEqual(set(contributors[0]), {"name", "amount"})
+
+        response = self.client.post(reverse("event-share", args=[self.event.pk]), {"top_contributors": 50},
+                                    format="json")
+        self.assertEqual(response.status_code, 400)
+
+    def test_rotating_and_revoking(self):
+        old = self.share()
+        self.assertEqual(self.public(old).status_code, 200)
+        new = self.share()
+        self.assertEqual(self.public(old).status_code, 404)
+        self.assertEqual(self.public(new).status_code, 200)
+
+        response = self.client.delete(reverse("event-share", args=[self.event.pk]))
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.public(new).status_code, 404)
+        self.assertEqual(self.public("not-a-token").status_code, 404)
+
+    def test_only_the_owner_can_share(self):
+        other = User.objects.create_user(username="intruder", password="pw")
+        self.client.force_authenticate(other)
+        response = self.client.post(reverse("event-share", args=[self.event.pk]), {}, format="json")
+        self.assertEqual(response.status_code, 404)
+        self.event.refresh_from_db()
+        self.assertIsNone(self.event.public_token)
+
+    def test_private_endpoints_still_uncached(self):
+        response = self.client.get(reverse("event-list"))
+        self.assertIn("no-store", response["Cache-Control"])